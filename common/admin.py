@@ -0,0 +1,96 @@
+"""
+Admin-Unit Index on the Cell Lattice
+
+Burns the kelurahan/kecamatan polygons onto the level-12 lattice once, so
+the admin unit of a cell is an array lookup instead of a
+`sjoin(predicate='within')`:
+- admin raster: code of the unit containing each cell's center (same rule
+  as the centroid join), 0 outside every unit
+- boundary raster: cells any admin boundary line passes through, i.e. cells
+  that straddle two units or the region edge
+- codes are 1..n over the sorted unique `admin_col` values, so per-unit
+  sums are a `np.bincount` away
+
+Shared by the Phase 3 grid assignment, the building store (common/
+footprints.py) and densified sparse grids (common/sparse.py), so all of
+them put a cell in the same unit.
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import lattice
+from .burn import burn, label_dtype
+
+
+class AdminIndex:
+    """Admin code + boundary rasters for one set of admin polygons"""
+
+    def __init__(self, codes, boundary, names, admin_col):
+        self.codes = codes
+        self.boundary = boundary
+        self.names = names
+        self.admin_col = admin_col
+
+    def assign(self, grid_ids):
+        """
+        Admin code and straddle flag per grid ID.
+
+        Returns:
+        - (codes, straddles): int array (0 = no unit) and bool array
+        """
+        ix, iy, level = lattice.gid_to_index(np.asarray(grid_ids))
+        if level != self.codes.level:
+            raise ValueError(f"Grid IDs are level {level}, admin index is level {self.codes.level}")
+        return self.codes.lookup_index(ix, iy), self.boundary.lookup_index(ix, iy).astype(bool)
+
+    def name_of(self, codes):
+        """Admin names for codes (None for 0)"""
+        table = np.concatenate([[None], self.names.to_numpy(dtype=object)])
+        return table[np.asarray(codes)]
+
+    def derived_columns(self):
+        """
+        {column: f(ix, iy)} giving the admin name and code of any lattice
+        cell, for filling in cells that were not stored (sparse.densify)
+        """
+        def codes(ix, iy):
+            return self.codes.lookup_index(ix, iy).astype('int64')
+
+        return {
+            self.admin_col: lambda ix, iy: self.name_of(codes(ix, iy)),
+            'admin_code': codes,
+        }
+
+
+def build_admin_index(admin, admin_col, level=lattice.GRID_LEVEL):
+    """
+    Burn admin polygons onto the lattice.
+
+    Parameters:
+    - admin: GeoDataFrame of kelurahan/kecamatan polygons
+    - admin_col: column with the unit name (e.g. 'kelurahan')
+    - level: Geosquare level (12 = 50m)
+
+    Returns:
+    - AdminIndex
+    """
+    admin = admin.to_crs('EPSG:4326')
+    codes, names = pd.factorize(admin[admin_col], sort=True)
+    names = pd.Index(names, name=admin_col)
+    codes = codes + 1  # 0 = outside every unit (also for missing names)
+    codes[admin[admin_col].isna().to_numpy()] = 0
+
+    bounds = admin.total_bounds
+    geoms = admin.geometry.values
+
+    code_raster = burn(zip(geoms, codes), bounds, level=level, dtype=label_dtype(len(names)))
+    boundary_raster = burn(((geom.boundary, 1) for geom in geoms if geom is not None),
+                           bounds, level=level, all_touched=True, dtype='uint8')
+
+    return AdminIndex(code_raster, boundary_raster, names, admin_col)
+
+
+def region_admin_index(region, level=lattice.GRID_LEVEL):
+    """AdminIndex of a registered region (common/regions.py), on `admin_level` names"""
+    return build_admin_index(region.load_admin(), region.admin_level, level=level)
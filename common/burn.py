@@ -0,0 +1,100 @@
+"""
+Lattice-Aligned Rasters
+
+Burns vector geometries onto the Geosquare lattice: one raster pixel is
+exactly one grid cell, so a per-cell attribute becomes an array lookup by
+the cell's (ix, iy) instead of a point-in-polygon join. Used by the RTRW
+zoning index (common/zoning.py) and the admin index (common/admin.py).
+"""
+
+import numpy as np
+
+from . import lattice
+
+
+class LatticeRaster:
+    """
+    Label raster on the lattice.
+
+    labels[iy - iy0, ix - ix0] is the value of lattice cell (ix, iy); rows
+    run south to north like the lattice.
+    """
+
+    def __init__(self, labels, ix0, iy0, level):
+        self.labels = labels
+        self.ix0 = int(ix0)
+        self.iy0 = int(iy0)
+        self.level = int(level)
+
+    @property
+    def shape(self):
+        return self.labels.shape
+
+    def lookup_index(self, ix, iy):
+        """Value of lattice cells (0 outside the raster)"""
+        row = np.asarray(iy, dtype='int64') - self.iy0
+        col = np.asarray(ix, dtype='int64') - self.ix0
+        inside = (row >= 0) & (row < self.shape[0]) & (col >= 0) & (col < self.shape[1])
+
+        out = np.zeros(len(row), dtype=self.labels.dtype)
+        out[inside] = self.labels[row[inside], col[inside]]
+        return out
+
+    def lookup(self, grid_ids):
+        """Value of each grid ID (cells must be at the raster level)"""
+        ix, iy, level = lattice.gid_to_index(np.asarray(grid_ids))
+        if level != self.level:
+            raise ValueError(f"Grid IDs are level {level}, raster is level {self.level}")
+        return self.lookup_index(ix, iy)
+
+    def lookup_lonlat(self, lons, lats):
+        """Value of the cells containing lon/lat points"""
+        ix, iy = lattice.lonlat_to_index(lons, lats, self.level)
+        return self.lookup_index(ix, iy)
+
+
+def lattice_window(bounds, level=lattice.GRID_LEVEL):
+    """(ix0, iy0, ix1, iy1) of the cells covering lon/lat `bounds` (inclusive)"""
+    minx, miny, maxx, maxy = bounds
+    (ix0, ix1), (iy0, iy1) = lattice.lonlat_to_index(np.array([minx, maxx]), np.array([miny, maxy]), level)
+    return int(ix0), int(iy0), int(ix1), int(iy1)
+
+
+def burn(shapes, bounds, level=lattice.GRID_LEVEL, all_touched=False, dtype='uint16'):
+    """
+    Rasterize (geometry, value) pairs (EPSG:4326) onto the lattice.
+
+    Parameters:
+    - shapes: iterable of (geometry, value); later shapes overwrite earlier
+    - bounds: lon/lat extent to cover (minx, miny, maxx, maxy)
+    - level: Geosquare level (12 = 50m)
+    - all_touched: burn every cell a geometry touches; default burns cells
+      whose center falls inside the geometry
+    - dtype: raster dtype
+
+    Returns:
+    - LatticeRaster (0 where nothing was burned)
+    """
+    from rasterio import features
+    from rasterio.transform import from_origin
+
+    ix0, iy0, ix1, iy1 = lattice_window(bounds, level)
+    width, height = ix1 - ix0 + 1, iy1 - iy0 + 1
+
+    size = lattice.cell_size(level)
+    transform = from_origin(lattice.ORIGIN_LON + ix0 * size, lattice.ORIGIN_LAT + (iy1 + 1) * size, size, size)
+
+    shapes = [(geom, value) for geom, value in shapes if geom is not None and not geom.is_empty]
+    if not shapes:
+        return LatticeRaster(np.zeros((height, width), dtype=dtype), ix0, iy0, level)
+
+    labels = features.rasterize(shapes, out_shape=(height, width), transform=transform,
+                                fill=0, all_touched=all_touched, dtype=dtype)
+
+    # rasterio rows run north to south; flip to lattice order
+    return LatticeRaster(labels[::-1].copy(), ix0, iy0, level)
+
+
+def label_dtype(n_labels):
+    """Smallest unsigned dtype that holds labels 0..n_labels"""
+    return 'uint16' if n_labels < np.iinfo('uint16').max else 'int32'
@@ -0,0 +1,198 @@
+"""
+Resumable, Conditional Downloads
+
+Large inputs (the ~1.6 GB Geofabrik Indonesia PBF) are fetched so that
+neither a network drop nor a re-run costs a full transfer:
+- bytes go to `<file>.part`; after a drop the transfer resumes with an HTTP
+  `Range` request (`If-Range` makes the server send the whole file instead
+  if it changed in between)
+- the finished file is checked against the published MD5 (Geofabrik serves
+  `<url>.md5`) before it replaces the cached copy
+- ETag / Last-Modified of the cached copy are kept in `<file>.meta.json`;
+  re-runs send `If-None-Match` / `If-Modified-Since` (the file's mtime for a
+  copy without metadata), so an unchanged file costs one bodiless 304
+  response and a changed one is streamed from that same response
+"""
+
+import hashlib
+import json
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+import requests
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+RETRIES = 5
+TIMEOUT = 60  # seconds without data before a retry
+
+
+class DownloadError(Exception):
+    """Transfer failed after all retries, or the file failed verification"""
+
+
+def meta_path(path):
+    return path.with_name(path.name + '.meta.json')
+
+
+def read_meta(path):
+    """Validators stored for a downloaded file ({} if none)"""
+    try:
+        return json.loads(meta_path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_meta(path, meta):
+    meta_path(path).write_text(json.dumps(meta, indent=2))
+
+
+def file_md5(path, chunk_size=CHUNK_SIZE):
+    """Hex MD5 of a file, read in chunks"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fetch_md5(md5_url, session=None, timeout=TIMEOUT):
+    """Published MD5 (first token of an `md5sum`-style file)"""
+    response = (session or requests).get(md5_url, timeout=timeout)
+    response.raise_for_status()
+    return response.text.split()[0].lower()
+
+
+def _validators(response):
+    return {key: response.headers[header]
+            for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'))
+            if header in response.headers}
+
+
+def conditional_headers(path):
+    """
+    If-None-Match / If-Modified-Since for a cached file: the stored
+    validators, else the file's mtime (copies without `.meta.json`)
+    """
+    meta = read_meta(path)
+    headers = {}
+    if 'etag' in meta:
+        headers['If-None-Match'] = meta['etag']
+    if 'last_modified' in meta:
+        headers['If-Modified-Since'] = meta['last_modified']
+    elif not headers:
+        headers['If-Modified-Since'] = formatdate(path.stat().st_mtime, usegmt=True)
+    return headers
+
+
+def _transfer(session, url, part, cached, chunk_size, timeout, progress):
+    """
+    One GET into `part`: resumes from its current size when possible,
+    otherwise asks only for a version newer than the cached copy.
+
+    Parameters:
+    - cached: current copy of the file (None = nothing cached)
+
+    Returns:
+    - validators of the transferred representation, or None when the
+      server answered 304 (cached copy is current)
+    """
+    offset = part.stat().st_size if part.exists() else 0
+    part_meta = read_meta(part)
+    validator = part_meta.get('etag') or part_meta.get('last_modified')
+    if offset and validator:
+        # Resume only if the file is still the one the part belongs to
+        headers = {'Range': f'bytes={offset}-', 'If-Range': validator}
+    elif cached is not None:
+        headers = conditional_headers(cached)
+    else:
+        headers = {}
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304 and 'Range' not in headers:
+            return None
+        if response.status_code == 416 and 'Range' in headers:
+            return part_meta  # Part already holds the whole file
+        response.raise_for_status()
+        if response.status_code != 206:
+            offset = 0  # Full body (also the answer to a conditional GET): start over
+        validators = _validators(response)
+        write_meta(part, validators)
+
+        total = offset + int(response.headers.get('Content-Length', 0))
+        bar = _progress_bar(total, offset) if progress else None
+        with open(part, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                if bar is not None:
+                    bar.update(len(chunk))
+        if bar is not None:
+            bar.close()
+
+        if total > offset and part.stat().st_size < total:
+            raise requests.ConnectionError(f"Transfer ended at {part.stat().st_size:,} of {total:,} bytes")
+    return validators
+
+
+def _progress_bar(total, initial):
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        return None
+    return tqdm(total=total or None, initial=initial, unit='B', unit_scale=True, desc="Downloading")
+
+
+def download(url, path, md5_url=None, retries=RETRIES, chunk_size=CHUNK_SIZE, timeout=TIMEOUT,
+             session=None, progress=True):
+    """
+    Download `url` to `path`, resuming and skipping unchanged files.
+
+    Parameters:
+    - url: file URL
+    - path: target file (a cached copy is refreshed only if the server
+      reports a change)
+    - md5_url: published checksum to verify against (None = no check)
+    - retries: attempts after network errors (each resumes the transfer)
+    - session: requests.Session (default: a new one)
+
+    Returns:
+    - 'unchanged' (cached copy is current) or 'downloaded'
+
+    Raises DownloadError when all attempts fail or the MD5 does not match.
+    """
+    path = Path(path)
+    part = path.with_name(path.name + '.part')
+    session = session or requests.Session()
+
+    # A cached copy makes the request conditional: 304 = nothing to transfer,
+    # 200 = the new version, streamed straight into the part file
+    for attempt in range(1, retries + 1):
+        try:
+            validators = _transfer(session, url, part, path if path.exists() else None,
+                                   chunk_size, timeout, progress)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == retries:
+                raise DownloadError(f"{url}: {e} (partial file kept for the next run)") from e
+            print(f"⚠ Download interrupted ({e}); resuming, attempt {attempt + 1}/{retries}")
+            time.sleep(min(2 ** attempt, 30))
+
+    if validators is None:
+        # Stale part of an abandoned transfer is of no use any more
+        part.unlink(missing_ok=True)
+        meta_path(part).unlink(missing_ok=True)
+        return 'unchanged'
+
+    if md5_url is not None:
+        expected = fetch_md5(md5_url, session, timeout)
+        actual = file_md5(part, chunk_size)
+        if actual != expected:
+            part.unlink()
+            meta_path(part).unlink(missing_ok=True)
+            raise DownloadError(f"{path.name}: MD5 {actual} does not match published {expected}")
+        validators['md5'] = actual
+
+    part.replace(path)
+    meta_path(part).unlink(missing_ok=True)
+    write_meta(path, validators)
+    return 'downloaded'
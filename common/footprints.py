@@ -0,0 +1,290 @@
+"""
+Building Footprints: Cell Apportionment and GeoParquet Store
+
+Exact-area apportionment splits every footprint over the lattice cells it
+overlaps, so a building straddling four cells contributes its area once in
+total instead of once per touched cell:
+1. candidate cells per building come from its bounds on the lattice (cells
+   are lattice-aligned, so no spatial index is needed)
+2. buildings inside a single cell keep their full area (the vast majority)
+3. the rest are intersected with their candidate cell boxes in vectorized
+   batches; piece area = building area (UTM) x intersection share
+4. batches are bounded by `max_pairs` building/cell pairs and can run in a
+   process pool
+
+The building store (`osm_buildings_<region>.parquet`, written by the OSM
+stage) keeps that work instead of redoing it on every run. One row per
+building, EPSG:4326 GeoParquet sorted by cell with a bbox covering column:
+- area_m2 (UTM), centroid_lon / centroid_lat
+- grid_id: level-12 cell of the centroid
+- cell_ids / cell_area_m2: every overlapped cell and the footprint area
+  inside it (lists; sum = area_m2)
+- admin_code + admin name: unit of the centroid's cell, looked up in the
+  burned admin index (common/admin.py), so a building always falls in the
+  same unit as its cell in the Phase 3 grid (0 = outside)
+
+Readers pick columns (per-cell areas need no geometry at all) and can
+filter by bbox.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import shapely
+
+from . import lattice
+
+UTM_CRS = 'EPSG:32748'  # UTM Zone 48S
+DEFAULT_MAX_PAIRS = 1_000_000
+ROW_GROUP_SIZE = 50_000
+
+# OSM attributes carried into the store (id + osm_type identify the source
+# object for incremental updates)
+STORE_ATTRIBUTES = ['id', 'osm_type', 'name', 'building', 'amenity']
+
+
+def _candidate_ranges(geoms, level):
+    """Lattice column/row range covered by each geometry's bounds"""
+    bounds = shapely.bounds(geoms)
+    ix0, iy0 = lattice.lonlat_to_index(bounds[:, 0], bounds[:, 1], level)
+    ix1, iy1 = lattice.lonlat_to_index(bounds[:, 2], bounds[:, 3], level)
+    return ix0, iy0, ix1, iy1
+
+
+def _apportion_chunk(geoms, building_ids, level):
+    """
+    Intersection shares of multi-cell buildings with their candidate cells.
+
+    Returns (building id, cell key, share) arrays.
+    """
+    ix0, iy0, ix1, iy1 = _candidate_ranges(geoms, level)
+    nx = ix1 - ix0 + 1
+    ny = iy1 - iy0 + 1
+    n = nx * ny
+
+    # One row per (building, candidate cell)
+    rep = np.repeat(np.arange(len(geoms)), n)
+    offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    cx = ix0[rep] + offset % nx[rep]
+    cy = iy0[rep] + offset // nx[rep]
+
+    minx, miny, maxx, maxy = lattice.index_to_bounds(cx, cy, level)
+    boxes = shapely.box(minx, miny, maxx, maxy)
+
+    shares = shapely.area(shapely.intersection(geoms[rep], boxes)) / shapely.area(geoms)[rep]
+    keep = shares > 0
+
+    return building_ids[rep][keep], lattice.index_key(cx, cy, level)[keep], shares[keep]
+
+
+def apportion_buildings(buildings, level=lattice.GRID_LEVEL, crs=UTM_CRS,
+                        max_pairs=DEFAULT_MAX_PAIRS, workers=1, area_m2=None):
+    """
+    Split building footprints over lattice cells by exact overlap area.
+
+    Parameters:
+    - buildings: GeoDataFrame of footprint polygons
+    - level: Geosquare level of the cells (12 = 50m)
+    - crs: projected CRS for footprint areas
+    - max_pairs: building/cell pairs per batch (bounds memory)
+    - workers: process pool size for the batches (1 = in-process)
+    - area_m2: precomputed footprint areas (skips the projection)
+
+    Returns:
+    - DataFrame with one row per piece: `building` (row position), cell
+      `key` (lattice.index_key) and `area_m2`
+    """
+    empty = pd.DataFrame({'building': np.empty(0, 'int64'), 'key': np.empty(0, 'int64'),
+                          'area_m2': np.empty(0, 'float64')})
+    if len(buildings) == 0:
+        return empty
+
+    if area_m2 is None:
+        area_m2 = buildings.geometry.to_crs(crs).area.to_numpy()
+    area_m2 = np.asarray(area_m2, dtype='float64')
+    geoms = buildings.geometry.to_crs('EPSG:4326').values
+    geoms = np.asarray(geoms)
+    invalid = ~shapely.is_valid(geoms)
+    if invalid.any():
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+
+    ids = np.arange(len(geoms))
+    ix0, iy0, ix1, iy1 = _candidate_ranges(geoms, level)
+    single = (ix0 == ix1) & (iy0 == iy1)
+
+    # Buildings inside one cell: whole footprint, no geometry work
+    parts = [(ids[single], lattice.index_key(ix0[single], iy0[single], level), np.ones(single.sum()))]
+
+    # Multi-cell buildings: batches of at most max_pairs candidate pairs
+    multi = np.flatnonzero(~single)
+    n_pairs = ((ix1 - ix0 + 1) * (iy1 - iy0 + 1))[multi]
+    batch_of = np.cumsum(n_pairs) // max(1, max_pairs)
+    batches = [multi[batch_of == b] for b in np.unique(batch_of)]
+
+    if workers == 1 or len(batches) <= 1:
+        parts += [_apportion_chunk(geoms[sel], sel, level) for sel in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(_apportion_chunk, geoms[sel], sel, level) for sel in batches]
+            parts += [future.result() for future in futures]
+
+    building = np.concatenate([p[0] for p in parts]).astype('int64')
+    keys = np.concatenate([p[1] for p in parts]).astype('int64')
+    shares = np.concatenate([p[2] for p in parts])
+
+    if len(building) == 0:
+        return empty
+    return pd.DataFrame({'building': building, 'key': keys, 'area_m2': shares * area_m2[building]})
+
+
+def admin_codes_at(lons, lats, index):
+    """
+    Admin code of the lattice cell containing each point (0 = outside),
+    from an AdminIndex (common/admin.py)
+    """
+    ix, iy = lattice.lonlat_to_index(lons, lats, index.codes.level)
+    return index.codes.lookup_index(ix, iy).astype('int64')
+
+
+def build_building_store(buildings, admin_index=None, level=lattice.GRID_LEVEL,
+                         crs=UTM_CRS, workers=1, max_pairs=DEFAULT_MAX_PAIRS):
+    """
+    One-row-per-building table with area, centroid, cells and admin unit.
+
+    Parameters:
+    - buildings: footprint GeoDataFrame (any CRS; `area_m2` reused if present)
+    - admin_index: AdminIndex of the region at `level` (optional; see
+      common/admin.py)
+    - level: Geosquare level of the cells
+    - workers, max_pairs: see `apportion_buildings`
+
+    Returns:
+    - GeoDataFrame (EPSG:4326), rows sorted by centroid cell
+    """
+    buildings = buildings.to_crs('EPSG:4326').reset_index(drop=True)
+    utm = buildings.geometry.to_crs(crs)
+
+    area_m2 = buildings['area_m2'].to_numpy(dtype='float64') if 'area_m2' in buildings else utm.area.to_numpy()
+    centroids = utm.centroid.to_crs('EPSG:4326')
+    lons, lats = centroids.x.to_numpy(), centroids.y.to_numpy()
+
+    store = buildings[[c for c in STORE_ATTRIBUTES if c in buildings.columns] + ['geometry']].copy()
+    store['area_m2'] = area_m2
+    store['centroid_lon'] = lons
+    store['centroid_lat'] = lats
+    store['grid_id'] = lattice.lonlat_to_gid(lons, lats, level)
+
+    # Overlapped cells as list columns: offsets from the pieces per building
+    pieces = apportion_buildings(buildings, level=level, area_m2=area_m2, workers=workers, max_pairs=max_pairs)
+    pieces = pieces.sort_values(['building', 'key'], kind='stable')
+    counts = np.bincount(pieces['building'].to_numpy(), minlength=len(store))
+    offsets = np.r_[0, np.cumsum(counts)].astype('int32')
+    ix, iy = lattice.key_to_index(pieces['key'].to_numpy(), level)
+    cell_ids = pa.ListArray.from_arrays(offsets, pa.array(lattice.index_to_gid(ix, iy, level), pa.string()))
+    cell_area = pa.ListArray.from_arrays(offsets, pa.array(pieces['area_m2'].to_numpy(), pa.float64()))
+    store['cell_ids'] = cell_ids.to_numpy(zero_copy_only=False)
+    store['cell_area_m2'] = cell_area.to_numpy(zero_copy_only=False)
+
+    if admin_index is not None:
+        codes = admin_codes_at(lons, lats, admin_index)
+        store['admin_code'] = codes
+        store[admin_index.admin_col] = admin_index.name_of(codes)
+
+    return _sort_by_cell(store, level)
+
+
+def _sort_by_cell(store, level):
+    """Spatially clustered rows, so bbox reads skip most row groups"""
+    cx, cy = lattice.lonlat_to_index(store['centroid_lon'].to_numpy(), store['centroid_lat'].to_numpy(), level)
+    order = np.argsort(lattice.index_key(cx, cy, level), kind='stable')
+    return store.iloc[order].reset_index(drop=True)
+
+
+def merge_building_store(store, drop, additions, level=lattice.GRID_LEVEL):
+    """
+    Replace some rows of a store without rebuilding the others.
+
+    Parameters:
+    - store: existing store (`read_building_store`)
+    - drop: boolean mask of rows to remove (changed / deleted buildings)
+    - additions: store rows of the new versions (`build_building_store`)
+
+    Returns:
+    - GeoDataFrame sorted by cell like a freshly built store
+    """
+    import geopandas as gpd
+
+    kept = store[~np.asarray(drop)]
+    if len(additions):
+        additions = additions.to_crs(store.crs)[[c for c in store.columns if c in additions.columns]]
+        kept = gpd.GeoDataFrame(pd.concat([kept, additions], ignore_index=True), crs=store.crs)
+    return _sort_by_cell(kept, level)
+
+
+def write_building_store(store, path, row_group_size=ROW_GROUP_SIZE):
+    """Write the store as GeoParquet with a bbox covering column"""
+    tmp = path.with_name(path.name + '.tmp')
+    store.to_parquet(tmp, index=False, write_covering_bbox=True, row_group_size=row_group_size)
+    tmp.replace(path)
+    return path
+
+
+def _bbox_filters(bbox):
+    """Row filter on the GeoParquet bbox covering column"""
+    minx, miny, maxx, maxy = bbox
+    return ((pc.field('bbox', 'xmax') >= minx) & (pc.field('bbox', 'xmin') <= maxx) &
+            (pc.field('bbox', 'ymax') >= miny) & (pc.field('bbox', 'ymin') <= maxy))
+
+
+def read_building_store(path, columns=None, bbox=None):
+    """
+    Read the building store.
+
+    Parameters:
+    - path: store written by `write_building_store`
+    - columns: subset of columns; without 'geometry' a plain DataFrame is
+      returned and no geometry is decoded
+    - bbox: (minx, miny, maxx, maxy) in EPSG:4326; only buildings whose
+      bounds intersect it are read
+
+    Returns:
+    - GeoDataFrame (or DataFrame)
+    """
+    import geopandas as gpd
+
+    if columns is not None and 'geometry' not in columns:
+        filters = _bbox_filters(bbox) if bbox is not None else None
+        return pd.read_parquet(path, columns=list(columns), filters=filters)
+    return gpd.read_parquet(path, columns=columns, bbox=bbox)
+
+
+def read_cell_pieces(path, bbox=None):
+    """
+    Per-cell footprint pieces from the store, without geometry.
+
+    Returns:
+    - DataFrame like `apportion_buildings`: `building` (store row), cell
+      `key` (lattice.index_key) and `area_m2`
+    """
+    filters = _bbox_filters(bbox) if bbox is not None else None
+    table = pq.read_table(path, columns=['cell_ids', 'cell_area_m2'], filters=filters)
+    ids = table.column('cell_ids').combine_chunks()
+    areas = table.column('cell_area_m2').combine_chunks().flatten().to_numpy(zero_copy_only=False)
+
+    lengths = pc.list_value_length(ids).fill_null(0).to_numpy(zero_copy_only=False)
+    flat_ids = ids.flatten().to_numpy(zero_copy_only=False)
+    if len(flat_ids) == 0:
+        return pd.DataFrame({'building': np.empty(0, 'int64'), 'key': np.empty(0, 'int64'),
+                             'area_m2': np.empty(0, 'float64')})
+
+    ix, iy, level = lattice.gid_to_index(flat_ids)
+    return pd.DataFrame({
+        'building': np.repeat(np.arange(len(lengths)), lengths),
+        'key': lattice.index_key(ix, iy, level),
+        'area_m2': areas,
+    })
@@ -0,0 +1,181 @@
+"""
+Geosquare Lattice Arithmetic (vectorized)
+
+The Geosquare grid is a regular lon/lat lattice: at every level the world
+range (-217..232.16 lon, -216..233.16 lat) is split by the radices
+5, 2, 5, 2, ... so a level-L cell is SPAN / prod(radices[:L]) degrees wide
+in both directions (level 12 = 449.157642055036e-6 deg ~ 50m).
+
+A cell is therefore fully described by its integer column/row on the level
+lattice (ix, iy), and the grid ID is just those two integers written digit
+by digit in the mixed radix with the 5x5 code alphabet. This module does
+those conversions on NumPy arrays, so millions of cells can be encoded or
+decoded without calling `GeosquareGrid` once per cell.
+
+Results match `geosquare_grid.GeosquareGrid` (`lonlat_to_gid`,
+`gid_to_bound`) except for points within float rounding of a cell edge.
+"""
+
+import numpy as np
+
+ORIGIN_LON = -217.0
+ORIGIN_LAT = -216.0
+SPAN = 449.157642055036
+
+RADICES = (5, 2, 5, 2, 5, 2, 5, 2, 5, 2, 5, 2, 5, 2, 5)
+MAX_LEVEL = len(RADICES)
+GRID_LEVEL = 12  # 50m x 50m
+
+CODE_ALPHABET = (
+    "23456"
+    "789CE"
+    "FGHJL"
+    "MNPQR"
+    "TVWXY"
+)
+
+# ASCII code -> (row, col) in the 5x5 alphabet; -1 for invalid characters
+_ALPHABET_BYTES = np.frombuffer(CODE_ALPHABET.encode('ascii'), dtype=np.uint8)
+_CHAR_ROW = np.full(256, -1, dtype=np.int64)
+_CHAR_COL = np.full(256, -1, dtype=np.int64)
+_CHAR_ROW[_ALPHABET_BYTES] = np.arange(25) // 5
+_CHAR_COL[_ALPHABET_BYTES] = np.arange(25) % 5
+
+
+def cells_per_axis(level=GRID_LEVEL):
+    """Number of lattice cells along each axis at `level`"""
+    return int(np.prod(RADICES[:level]))
+
+
+def cell_size(level=GRID_LEVEL):
+    """Cell width/height in degrees at `level`"""
+    return SPAN / cells_per_axis(level)
+
+
+def lonlat_to_index(lons, lats, level=GRID_LEVEL):
+    """
+    Column/row of the level cell containing each lon/lat (int64 arrays)
+    """
+    size = cell_size(level)
+    ix = np.floor((np.asarray(lons, dtype='float64') - ORIGIN_LON) / size).astype('int64')
+    iy = np.floor((np.asarray(lats, dtype='float64') - ORIGIN_LAT) / size).astype('int64')
+    return ix, iy
+
+
+def index_to_bounds(ix, iy, level=GRID_LEVEL):
+    """
+    Cell bounds (minx, miny, maxx, maxy) in degrees for column/row arrays
+    """
+    size = cell_size(level)
+    minx = ORIGIN_LON + np.asarray(ix, dtype='float64') * size
+    miny = ORIGIN_LAT + np.asarray(iy, dtype='float64') * size
+    return minx, miny, minx + size, miny + size
+
+
+def index_to_center(ix, iy, level=GRID_LEVEL):
+    """Cell center lon/lat for column/row arrays"""
+    minx, miny, maxx, maxy = index_to_bounds(ix, iy, level)
+    return (minx + maxx) / 2, (miny + maxy) / 2
+
+
+def index_to_gid(ix, iy, level=GRID_LEVEL):
+    """
+    Encode column/row arrays as grid ID strings (object array)
+    """
+    ix = np.asarray(ix, dtype='int64')
+    iy = np.asarray(iy, dtype='int64')
+
+    chars = np.empty((ix.size, level), dtype=np.uint8)
+    rem_x = ix.ravel().copy()
+    rem_y = iy.ravel().copy()
+
+    # Most significant digit first: divide by the product of finer radices
+    for pos in range(level):
+        weight = int(np.prod(RADICES[pos + 1:level]))
+        px, rem_x = np.divmod(rem_x, weight)
+        py, rem_y = np.divmod(rem_y, weight)
+        chars[:, pos] = _ALPHABET_BYTES[py * 5 + px]
+
+    gids = chars.view(f'S{level}').ravel().astype(str)
+    return gids.astype(object).reshape(ix.shape)
+
+
+def _gid_bytes(gids):
+    """(n, level) uint8 array of grid ID characters"""
+    if gids.dtype == object:
+        lengths = np.fromiter(map(len, gids.flat), dtype='int64', count=gids.size)
+        level = int(lengths[0])
+        if (lengths != level).any():
+            raise ValueError("All grid IDs must have the same level (length)")
+        # One join + encode is far cheaper than a fixed-width string cast
+        buf = ''.join(gids.flat).encode('ascii')
+        return np.frombuffer(buf, dtype=np.uint8).reshape(-1, level), level
+
+    gids = np.asarray(gids, dtype=str)
+    level = len(gids.flat[0])
+    if (np.char.str_len(gids) != level).any():
+        raise ValueError("All grid IDs must have the same level (length)")
+    return gids.astype(f'S{level}').view(np.uint8).reshape(-1, level), level
+
+
+def gid_to_index(gids):
+    """
+    Decode grid ID strings to (ix, iy, level).
+
+    All IDs must share the same level (string length).
+    """
+    gids = np.asarray(gids)
+    if gids.size == 0:
+        return np.empty(0, dtype='int64'), np.empty(0, dtype='int64'), GRID_LEVEL
+
+    chars, level = _gid_bytes(gids)
+
+    rows = _CHAR_ROW[chars]
+    cols = _CHAR_COL[chars]
+    if (rows < 0).any():
+        raise ValueError("Grid IDs contain characters outside the Geosquare alphabet")
+
+    # Digit weights: product of the finer radices
+    weights = np.array([int(np.prod(RADICES[pos + 1:level])) for pos in range(level)], dtype='int64')
+    ix = cols @ weights
+    iy = rows @ weights
+
+    return ix.reshape(gids.shape), iy.reshape(gids.shape), level
+
+
+def lonlat_to_gid(lons, lats, level=GRID_LEVEL):
+    """Vectorized `GeosquareGrid.lonlat_to_gid`"""
+    ix, iy = lonlat_to_index(lons, lats, level)
+    return index_to_gid(ix, iy, level)
+
+
+def gid_to_bounds(gids):
+    """Vectorized `GeosquareGrid.gid_to_bound` -> (minx, miny, maxx, maxy)"""
+    ix, iy, level = gid_to_index(gids)
+    return index_to_bounds(ix, iy, level)
+
+
+def index_key(ix, iy, level=GRID_LEVEL):
+    """
+    Single int64 key per cell, row-major (sorted keys run west->east,
+    then south->north). Used for hash joins and searchsorted lookups.
+    """
+    return np.asarray(iy, dtype='int64') * cells_per_axis(level) + np.asarray(ix, dtype='int64')
+
+
+def key_to_index(keys, level=GRID_LEVEL):
+    """Inverse of `index_key` -> (ix, iy)"""
+    iy, ix = np.divmod(np.asarray(keys, dtype='int64'), cells_per_axis(level))
+    return ix, iy
+
+
+def parent_index(ix, iy, level, parent_level):
+    """
+    Column/row of the enclosing cell at a coarser `parent_level`.
+
+    Equivalent to truncating the grid ID to `parent_level` characters.
+    """
+    if parent_level > level:
+        raise ValueError(f"Parent level {parent_level} is finer than level {level}")
+    factor = int(np.prod(RADICES[parent_level:level]))
+    return np.asarray(ix, dtype='int64') // factor, np.asarray(iy, dtype='int64') // factor
@@ -0,0 +1,197 @@
+"""
+Region Registry
+
+One entry per kabupaten/kota the pipeline covers, instead of hard-coding
+Tangerang Selatan and OKU in every script:
+- key: short id used in file names (osm_roads_<key>.geojson, pop_grid_<key>.csv)
+- name / short_name: display names
+- gdb_pattern: regex on RBI10K `WADMKK` that selects the region's desa
+- admin_level + dissolve_by: kelurahan (as-is) or kecamatan (desa dissolved
+  by `WADMKC`); name_column holds the unit name in the boundary file
+- boundary_file, rtrw_file: Phase 1 inputs
+- population_file + population_columns: Disdukcapil table and its
+  {unit column, count column} -> {admin_level, 'population'} renames
+- crs: projected CRS for areas/lengths
+
+Adding a kabupaten = adding one `Region(...)` to REGIONS.
+
+`run_regions` runs a per-region function for several regions at once in a
+process pool, each with its own output directory. `osmium_extract_config`
+describes the regional PBF cuts of several regions for a single
+`osmium extract -c` run over the national file.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BOUNDARIES_DIR = PROJECT_ROOT / 'phase1_data_hunt' / 'boundaries'
+RTRW_DIR = PROJECT_ROOT / 'phase1_data_hunt' / 'rtrw'
+POPULATION_DIR = PROJECT_ROOT / 'phase1_data_hunt' / 'population'
+
+
+class Region:
+    """Static description of one region (see module docstring)"""
+
+    def __init__(self, key, name, short_name, gdb_pattern, admin_level, boundary_file,
+                 rtrw_file=None, population_file=None, population_columns=None,
+                 dissolve_by=None, name_column='NAMOBJ', crs='EPSG:32748'):
+        self.key = key
+        self.name = name
+        self.short_name = short_name
+        self.gdb_pattern = gdb_pattern
+        self.admin_level = admin_level
+        self.boundary_file = boundary_file
+        self.rtrw_file = rtrw_file
+        self.population_file = population_file
+        self.population_columns = population_columns
+        self.dissolve_by = dissolve_by
+        self.name_column = name_column
+        self.crs = crs
+
+    @property
+    def boundary_path(self):
+        return BOUNDARIES_DIR / self.boundary_file
+
+    @property
+    def rtrw_path(self):
+        return RTRW_DIR / self.rtrw_file if self.rtrw_file else None
+
+    @property
+    def population_path(self):
+        return POPULATION_DIR / self.population_file if self.population_file else None
+
+    def boundary_polygon(self, buffer=0.0):
+        """Dissolved region boundary (shapely, EPSG:4326), optionally buffered in degrees"""
+        import geopandas as gpd
+
+        boundary = gpd.read_file(self.boundary_path).to_crs('EPSG:4326').union_all()
+        return boundary.buffer(buffer) if buffer > 0 else boundary
+
+    def load_admin(self):
+        """Admin polygons with the normalized unit name in `admin_level`"""
+        import geopandas as gpd
+
+        admin = gpd.read_file(self.boundary_path)
+        admin[self.admin_level] = admin[self.name_column].str.upper().str.strip()
+        return admin
+
+    def __repr__(self):
+        return f"Region({self.key!r}, {self.name!r})"
+
+
+REGIONS = {
+    region.key: region
+    for region in [
+        Region(
+            'tangsel', 'Tangerang Selatan', 'Tangsel',
+            gdb_pattern='KOTA TANGERANG SELATAN',
+            admin_level='kelurahan',
+            boundary_file='tangerang_selatan_kelurahan_RBI.geojson',
+            rtrw_file='RTRW_KOTA_TANGERANG_SELATAN.geojson',
+            population_file='penduduk_54_tangsel_kelurahan_FINAL.csv',
+            population_columns={'kelurahan': 'kelurahan', 'jumlah_penduduk': 'population'},
+        ),
+        Region(
+            'oku', 'Ogan Komering Ulu', 'OKU',
+            # $ = exact match, so OKU Timur/Selatan are not caught
+            gdb_pattern='OGAN KOMERING ULU$',
+            admin_level='kecamatan',
+            dissolve_by='WADMKC',
+            name_column='WADMKC',
+            boundary_file='oku_kecamatan_RBI.geojson',
+            rtrw_file='RTRW_OGAN_KOMERING_ULU.geojson',
+            population_file='penduduk_oku_clean.csv',
+            population_columns={'kecamatan': 'kecamatan', 'jumlah': 'population'},
+        ),
+    ]
+}
+
+
+def get_regions(keys=None):
+    """Region objects for `keys` (default: all registered regions)"""
+    if keys is None:
+        return list(REGIONS.values())
+
+    unknown = [k for k in keys if k not in REGIONS]
+    if unknown:
+        raise KeyError(f"Unknown region(s) {unknown}; registered: {sorted(REGIONS)}")
+    return [REGIONS[k] for k in keys]
+
+
+def run_regions(func, regions, workers=None, output_dir=None, verbose=True, **kwargs):
+    """
+    Run `func(region, **kwargs)` for every region in worker processes.
+
+    Parameters:
+    - func: module-level function taking a Region (must be picklable)
+    - regions: Region objects or registry keys
+    - workers: pool size (default: one process per region, capped at the
+      core count); 1 runs in-process
+    - output_dir: if given, each region gets `output_dir/<key>/`, passed to
+      func as `output_dir=`
+    - kwargs: forwarded to func
+
+    Returns:
+    - {region key: func result}, in input order
+    """
+    regions = [REGIONS[r] if isinstance(r, str) else r for r in regions]
+    workers = workers or min(len(regions), os.cpu_count() or 1)
+
+    def region_kwargs(region):
+        if output_dir is None:
+            return kwargs
+        region_dir = Path(output_dir) / region.key
+        region_dir.mkdir(parents=True, exist_ok=True)
+        return {**kwargs, 'output_dir': region_dir}
+
+    results = {}
+    start = time.time()
+
+    if workers == 1 or len(regions) == 1:
+        for region in regions:
+            results[region.key] = func(region, **region_kwargs(region))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(func, region, **region_kwargs(region)): region for region in regions}
+            for future in as_completed(futures):
+                region = futures[future]
+                results[region.key] = future.result()
+                if verbose:
+                    print(f"✓ {region.name} done ({time.time() - start:.1f}s)")
+
+    return {region.key: results[region.key] for region in regions}
+
+
+def osmium_extract_config(regions, directory, buffer=0.0):
+    """
+    Config for `osmium extract -c`: every region cut out of one input PBF
+    along its boundary polygon, in a single read of that file.
+
+    Parameters:
+    - regions: Region objects or registry keys
+    - directory: where osmium writes `<key>.osm.pbf`
+    - buffer: boundary buffer in degrees (0 = exact boundary)
+
+    Returns:
+    - dict, to be written as JSON
+    """
+    import shapely
+
+    extracts = []
+    for region in regions:
+        region = REGIONS[region] if isinstance(region, str) else region
+        polygons = shapely.get_parts(region.boundary_polygon(buffer))
+        # osmium wants plain lists: [polygon][ring][point][lon, lat]
+        multipolygon = [[[list(point) for point in ring.coords]
+                         for ring in (polygon.exterior, *polygon.interiors)]
+                        for polygon in polygons]
+        extracts.append({
+            'output': f'{region.key}.osm.pbf',
+            'output_format': 'pbf',
+            'description': region.name,
+            'multipolygon': multipolygon,
+        })
+    return {'directory': str(directory), 'extracts': extracts}
@@ -0,0 +1,189 @@
+"""
+Sparse Grid Storage
+
+Most of a rural kabupaten's cells carry no buildings and no population, yet
+every frame and export materializes all of them with full geometry. The
+sparse format stores only the non-empty rows and keeps the region's full
+cell set implicitly:
+- extent: the full cell set as run-length encoded lattice rows
+  (iy, ix_start, ix_end) -- a few thousand integers instead of 1.5M IDs
+- rows: Parquet rows for cells where any of `value_columns` is non-zero
+- no geometry: cell polygons and lat/lon are derived from grid_id
+
+Readers get the sparse rows by default and can ask for the dense frame, in
+which case empty cells are filled back in: value columns = 0, lat/lon
+recomputed from the lattice, columns with a `derive` function (e.g. admin
+name and code from the admin index, see AdminIndex.derived_columns) looked
+up per cell, other columns missing.
+
+The dense frame is as large as the original; sparse storage cuts disk and
+read time, not the memory of a consumer that needs every cell.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from . import lattice
+
+METADATA_KEY = b'geosquare_sparse'
+FORMAT_VERSION = 1
+
+# Coordinate columns derivable from the lattice (cell lower-left corner, as
+# stored by the dasymetric and integration notebooks)
+COORDINATE_COLUMNS = {'lon': 0, 'lat': 1, 'longitude': 0, 'latitude': 1}
+
+
+def cell_runs(grid_ids):
+    """
+    Run-length encode a cell set.
+
+    Returns:
+    - (runs, level): int64 array of (iy, ix_start, ix_end) rows, inclusive
+    """
+    ix, iy, level = lattice.gid_to_index(np.asarray(grid_ids))
+    keys = np.unique(lattice.index_key(ix, iy, level))
+    if len(keys) == 0:
+        return np.empty((0, 3), dtype='int64'), level
+
+    ix, iy = lattice.key_to_index(keys, level)
+    # A new run starts where the row changes or the column is not contiguous
+    start = np.r_[True, (iy[1:] != iy[:-1]) | (ix[1:] != ix[:-1] + 1)]
+    first = np.flatnonzero(start)
+    last = np.r_[first[1:], len(keys)] - 1
+    return np.column_stack([iy[first], ix[first], ix[last]]), level
+
+
+def runs_to_index(runs, level=lattice.GRID_LEVEL):
+    """Expand (iy, ix_start, ix_end) runs back to (ix, iy) arrays"""
+    runs = np.asarray(runs, dtype='int64').reshape(-1, 3)
+    lengths = runs[:, 2] - runs[:, 1] + 1
+    rep = np.repeat(np.arange(len(runs)), lengths)
+    offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return runs[rep, 1] + offset, runs[rep, 0]
+
+
+def nonempty_mask(frame, value_columns):
+    """Rows where any value column is non-zero (NaN counts as empty)"""
+    values = frame[list(value_columns)].fillna(0).to_numpy()
+    return (values != 0).any(axis=1)
+
+
+def write_sparse(frame, path, value_columns, extent_ids=None):
+    """
+    Write the non-empty rows of a grid frame plus its implicit extent.
+
+    Parameters:
+    - frame: (Geo)DataFrame with `grid_id` (geometry is dropped)
+    - path: output .parquet path
+    - value_columns: columns whose all-zero rows count as empty
+    - extent_ids: full cell set of the region (default: frame['grid_id'])
+
+    Returns:
+    - number of rows written
+    """
+    runs, level = cell_runs(frame['grid_id'].values if extent_ids is None else extent_ids)
+    keep = nonempty_mask(frame, value_columns)
+
+    rows = pd.DataFrame(frame.loc[keep, [c for c in frame.columns if c != 'geometry']])
+    meta = {
+        'version': FORMAT_VERSION,
+        'level': int(level),
+        'n_cells': int((runs[:, 2] - runs[:, 1] + 1).sum()),
+        'value_columns': list(value_columns),
+        'runs': runs.tolist(),
+    }
+
+    table = pa.Table.from_pandas(rows, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), METADATA_KEY: json.dumps(meta).encode()}
+    pq.write_table(table.replace_schema_metadata(metadata), str(path))
+    return len(rows)
+
+
+def read_sparse_metadata(path):
+    """Extent and value columns of a sparse file (runs as an int64 array)"""
+    meta = json.loads(pq.read_schema(str(path)).metadata[METADATA_KEY])
+    meta['runs'] = np.asarray(meta['runs'], dtype='int64').reshape(-1, 3)
+    return meta
+
+
+def sparse_extent(path):
+    """All grid IDs of the region a sparse file covers"""
+    meta = read_sparse_metadata(path)
+    ix, iy = runs_to_index(meta['runs'], meta['level'])
+    return lattice.index_to_gid(ix, iy, meta['level'])
+
+
+def densify(rows, runs, level, value_columns, derive=None):
+    """
+    Dense frame over the full extent from sparse rows.
+
+    Value columns of empty cells are 0, columns in `derive` ({column:
+    f(ix, iy)}) are computed for them, other columns are missing;
+    coordinate columns are recomputed from the lattice. Rows are in extent
+    order (south to north, west to east).
+    """
+    derive = derive or {}
+    ix, iy = runs_to_index(runs, level)
+    keys = lattice.index_key(ix, iy, level)
+
+    rx, ry, _ = lattice.gid_to_index(rows['grid_id'].values)
+    pos = pd.Index(keys).get_indexer(lattice.index_key(rx, ry, level))
+    if (pos < 0).any():
+        raise ValueError(f"{(pos < 0).sum()} sparse rows fall outside the stored extent")
+
+    corners = lattice.index_to_bounds(ix, iy, level)
+    out = {}
+    for column in rows.columns:
+        if column == 'grid_id':
+            out[column] = lattice.index_to_gid(ix, iy, level)
+        elif column in COORDINATE_COLUMNS:
+            out[column] = corners[COORDINATE_COLUMNS[column]]
+        else:
+            values = rows[column].to_numpy()
+            if column in derive:
+                filled = np.asarray(derive[column](ix, iy)).astype(values.dtype, copy=False)
+            elif column in value_columns:
+                filled = np.zeros(len(keys), dtype=values.dtype)
+            elif values.dtype.kind in 'fc':
+                filled = np.full(len(keys), np.nan, dtype=values.dtype)
+            else:
+                filled = np.full(len(keys), None, dtype=object)
+            filled[pos] = values
+            out[column] = filled
+
+    return pd.DataFrame(out, columns=rows.columns)
+
+
+def read_sparse(path, dense=False, columns=None, with_geometry=False, derive=None):
+    """
+    Read a sparse grid file.
+
+    Parameters:
+    - path: file written by `write_sparse`
+    - dense: fill in the empty cells of the extent
+    - columns: optional subset of columns (grid_id is always read)
+    - derive: {column: f(ix, iy)} for non-value columns of filled-in cells
+      (see `densify`)
+    - with_geometry: return a GeoDataFrame with cell polygons (EPSG:4326)
+
+    Returns:
+    - DataFrame (or GeoDataFrame)
+    """
+    meta = read_sparse_metadata(path)
+    if columns is not None:
+        columns = ['grid_id'] + [c for c in columns if c != 'grid_id']
+    rows = pd.read_parquet(path, columns=columns)
+
+    frame = densify(rows, meta['runs'], meta['level'], meta['value_columns'], derive) if dense else rows
+
+    if with_geometry:
+        import geopandas as gpd
+
+        minx, miny, maxx, maxy = lattice.gid_to_bounds(frame['grid_id'].values)
+        frame = gpd.GeoDataFrame(frame, geometry=shapely.box(minx, miny, maxx, maxy), crs='EPSG:4326')
+    return frame
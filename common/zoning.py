@@ -0,0 +1,176 @@
+"""
+Rasterized RTRW Zoning Index
+
+Burns the RTRW (Pola Ruang) polygons once into an integer label raster that
+is aligned to the Geosquare lattice, so the zone of a cell is an array
+lookup instead of a point-in-polygon `sjoin` of 1.5M points:
+- label 0 = outside every zone, label k = row k-1 of the code table
+- code table: namobj, rtrpkk, rtrkaw (+ zone_category when rules are given)
+- a cell takes the zone containing its center; where polygons overlap the
+  first polygon in file order wins (same as `sjoin` + keep='first')
+
+The index is cached next to the GeoJSON (`zone_index/`) under a key built
+from the file's content hash, the level and the category rules, so it is
+only rebuilt when the GeoJSON (or the rules) change.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import lattice
+from .burn import LatticeRaster, burn, label_dtype
+
+ZONE_COLUMNS = ['namobj', 'rtrpkk', 'rtrkaw']
+
+# Broad zone categories per region, applied in order (later rules win).
+# (column, value): strings are case-insensitive regexes on the column,
+# anything else is an equality test.
+ZONE_CATEGORY_RULES = {
+    'tangsel': [
+        ('namobj', 'Permukiman', 'Residential'),
+        ('namobj', 'Industri', 'Industrial'),
+        ('namobj', 'RTH|Hijau|Taman|Ruang Terbuka Hijau', 'Green Space'),
+        ('rtrkaw', 1, 'Protected'),  # rtrkaw=1 means Kawasan Lindung
+    ],
+    'oku': [
+        ('namobj', 'Pertanian|Hortikultura', 'Agriculture'),
+        ('namobj', 'Permukiman', 'Residential'),
+        ('namobj', 'Hutan Produksi', 'Production Forest'),
+        ('namobj', 'Industri', 'Industrial'),
+        ('rtrkaw', 1, 'Protected'),  # rtrkaw=1 means Kawasan Lindung
+        ('namobj', 'Hutan Lindung', 'Protected'),
+    ],
+}
+
+
+def zone_category(zones, rules, default='Other'):
+    """Broad category of each zone polygon from (column, value, category) rules"""
+    category = pd.Series(default, index=zones.index, dtype='object')
+    for column, value, name in rules:
+        if column not in zones.columns:
+            continue
+        if isinstance(value, str):
+            match = zones[column].astype('string').str.contains(value, case=False, na=False)
+        else:
+            match = zones[column] == value
+        category[match.to_numpy(dtype=bool)] = name
+    return category
+
+
+def file_digest(path):
+    """sha256 of a file's content"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ZoneIndex(LatticeRaster):
+    """
+    Zone label raster on the lattice + code table (see common/burn.py for
+    the lookups).
+    """
+
+    def __init__(self, labels, codes, ix0, iy0, level):
+        super().__init__(labels, ix0, iy0, level)
+        self.codes = codes
+
+    def zones(self, grid_ids, columns=None, index=None):
+        """
+        Code-table attributes of each cell's zone.
+
+        Returns a DataFrame with `zone_code` and the requested code-table
+        columns (NaN for cells outside every zone).
+        """
+        columns = list(self.codes.columns) if columns is None else list(columns)
+        codes = self.lookup(grid_ids)
+        out = {'zone_code': codes}
+        for column in columns:
+            # Row 0 of the padded table is the "no zone" label
+            values = np.concatenate([[None], self.codes[column].to_numpy(dtype=object)])
+            out[column] = values[codes]
+        return pd.DataFrame(out, index=index)
+
+    def save(self, path):
+        """Write the code table (.codes.parquet), then labels + origin (.npz)"""
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp.npz')
+        np.savez_compressed(tmp, labels=self.labels, origin=np.array([self.ix0, self.iy0, self.level]))
+        self.codes.to_parquet(path.with_suffix('.codes.parquet'))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        with np.load(path) as data:
+            labels = data['labels']
+            ix0, iy0, level = data['origin']
+        codes = pd.read_parquet(path.with_suffix('.codes.parquet'))
+        return cls(labels, codes, ix0, iy0, level)
+
+
+def build_zone_index(zones, level=lattice.GRID_LEVEL, rules=None):
+    """
+    Burn zone polygons into a lattice-aligned label raster.
+
+    Parameters:
+    - zones: GeoDataFrame of RTRW polygons (namobj, rtrpkk, rtrkaw)
+    - level: Geosquare level of the raster cells (12 = 50m)
+    - rules: optional ZONE_CATEGORY_RULES entry -> `zone_category` column
+
+    Returns:
+    - ZoneIndex
+    """
+    zones = zones.to_crs('EPSG:4326').reset_index(drop=True)
+    codes = pd.DataFrame({c: zones[c] if c in zones.columns else None for c in ZONE_COLUMNS})
+    if rules is not None:
+        codes['zone_category'] = zone_category(zones, rules).values
+    codes.index = pd.RangeIndex(1, len(codes) + 1, name='code')
+
+    # Later shapes overwrite earlier ones, so burn in reverse file order to
+    # let the first overlapping polygon win; cells are burned when their
+    # center falls inside the polygon
+    shapes = zip(zones.geometry.values[::-1], codes.index[::-1])
+    raster = burn(shapes, zones.total_bounds, level=level, dtype=label_dtype(len(codes)))
+
+    return ZoneIndex(raster.labels, codes, raster.ix0, raster.iy0, level)
+
+
+def load_zone_index(geojson_path, level=lattice.GRID_LEVEL, rules=None, cache_dir=None, verbose=True):
+    """
+    Cached zone index for an RTRW GeoJSON, rebuilt only when it changes.
+
+    Parameters:
+    - geojson_path: RTRW_*.geojson
+    - level: Geosquare level (12 = 50m)
+    - rules: optional ZONE_CATEGORY_RULES entry
+    - cache_dir: where indexes are kept (default: `zone_index/` next to the GeoJSON)
+
+    Returns:
+    - ZoneIndex
+    """
+    geojson_path = Path(geojson_path)
+    cache_dir = Path(cache_dir) if cache_dir is not None else geojson_path.parent / 'zone_index'
+
+    payload = {'source': file_digest(geojson_path), 'level': int(level), 'rules': rules}
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+    path = cache_dir / f'{geojson_path.stem}-{key}.npz'
+
+    if path.exists():
+        if verbose:
+            print(f"✓ Zone index (cached): {path.name}")
+        return ZoneIndex.load(path)
+
+    import geopandas as gpd
+
+    index = build_zone_index(gpd.read_file(geojson_path), level=level, rules=rules)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index.save(path)
+    if verbose:
+        print(f"✓ Zone index built: {path.name} ({index.shape[1]}x{index.shape[0]} cells, {len(index.codes)} zones)")
+    return index
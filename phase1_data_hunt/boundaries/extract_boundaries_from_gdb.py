@@ -8,15 +8,20 @@ Source GDB: cache/RBI10K_ADMINISTRASI_DESA_20230928.gdb
 Source: Badan Informasi Geospasial (BIG)
 Date: September 2023
 
-Processing:
+Regions come from the registry in common/regions.py (RBI name pattern,
+admin level, output file) and are extracted concurrently:
 - Tangerang Selatan: Keeps kelurahan/desa level (as-is)
 - Ogan Komering Ulu: Dissolves desa → kecamatan level (aggregated)
 
 Output:
 - tangerang_selatan_kelurahan_RBI.geojson (54 kelurahan)
 - oku_kecamatan_RBI.geojson (15 kecamatan, dissolved from desa)
+
+Usage:
+    python extract_boundaries_from_gdb.py [region ...]
 """
 
+import sys
 import geopandas as gpd
 import os
 from pathlib import Path
@@ -27,9 +32,8 @@ PROJECT_ROOT = SCRIPT_DIR.parent.parent
 GDB_PATH = PROJECT_ROOT / "cache" / "RBI10K_ADMINISTRASI_DESA_20230928.gdb" / "RBI10K_ADMINISTRASI_DESA_20230928.gdb"
 OUTPUT_DIR = SCRIPT_DIR  # Output to boundaries/ folder
 
-# Target regions (exact match to avoid catching OKU Timur/Selatan)
-TANGSEL_KEYWORDS = ["KOTA TANGERANG SELATAN"]
-OKU_KEYWORDS = ["OGAN KOMERING ULU$"]  # $ for end-of-string regex
+sys.path.insert(0, str(PROJECT_ROOT))
+from common.regions import get_regions, run_regions
 
 
 def list_layers_in_gdb(gdb_path):
@@ -146,7 +150,21 @@ def extract_boundaries(gdb_path, layer_name, region_keywords, output_filename, d
     return filtered
 
 
-def main():
+def extract_region(region, gdb_path, layer_name):
+    """
+    Worker entry point: extract one registry region
+    """
+    gdf = extract_boundaries(
+        gdb_path,
+        layer_name,
+        [region.gdb_pattern],
+        region.boundary_file,
+        dissolve_by=region.dissolve_by
+    )
+    return None if gdf is None else len(gdf)
+
+
+def main(region_keys=None):
     print("="*70)
     print("RBI10K Administrative Boundaries Extraction")
     print("Source: BIG (Badan Informasi Geospasial)")
@@ -182,42 +200,25 @@ def main():
     print(f"\nUsing layer: {desa_layer}")
     print()
 
-    # Extract Tangerang Selatan kelurahan (keep desa/kelurahan level)
-    tangsel_gdf = extract_boundaries(
-        GDB_PATH,
-        desa_layer,
-        TANGSEL_KEYWORDS,
-        "tangerang_selatan_kelurahan_RBI.geojson",
-        dissolve_by=None  # Keep original desa/kelurahan level
-    )
-
-    # Extract OKU and dissolve to kecamatan level
-    oku_gdf = extract_boundaries(
-        GDB_PATH,
-        desa_layer,
-        OKU_KEYWORDS,
-        "oku_kecamatan_RBI.geojson",
-        dissolve_by="WADMKC"  # Dissolve desa → kecamatan
-    )
+    # One process per region (kelurahan level as-is, kecamatan dissolved from desa)
+    regions = get_regions(region_keys)
+    counts = run_regions(extract_region, regions, gdb_path=GDB_PATH, layer_name=desa_layer)
 
     # Summary
     print("\n" + "="*70)
     print("EXTRACTION SUMMARY")
     print("="*70)
 
-    if tangsel_gdf is not None:
-        print(f"✓ Tangerang Selatan: {len(tangsel_gdf):,} kelurahan (desa level)")
-    else:
-        print("✗ Tangerang Selatan: Failed")
-
-    if oku_gdf is not None:
-        print(f"✓ Ogan Komering Ulu: {len(oku_gdf):,} kecamatan (dissolved from desa)")
-    else:
-        print("✗ Ogan Komering Ulu: Failed")
+    for region in regions:
+        n = counts[region.key]
+        if n is not None:
+            print(f"✓ {region.name}: {n:,} {region.admin_level}")
+        else:
+            print(f"✗ {region.name}: Failed")
 
     print(f"\nOutput directory: {OUTPUT_DIR}")
     print("="*70)
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:] or None)
@@ -2,8 +2,22 @@
 Extract OSM Data from PBF - Tangerang Selatan & OKU
 
 Automatically downloads and extracts buildings, roads, and POI from OpenStreetMap
-PBF files for both regions. Downloads Indonesia PBF from Geofabrik if not cached,
-then uses osmium to create regional PBF extracts, and pyrosm for data extraction.
+PBF files for every region in the registry (common/regions.py). Downloads
+Indonesia PBF from Geofabrik if not cached, then cuts all regional PBF
+extracts along the region boundary polygons with a single `osmium extract -c`
+run (one read of the national file). Each extract is parsed once (pyosmium handler): nodes, ways and
+assembled areas are routed into the POI, building and road collectors in the
+same pass. Regions are processed concurrently, one worker process each.
+
+Usage:
+    python extract_osm_data.py [region ...]
+    python extract_osm_data.py --update [region ...]
+
+--update applies the Geofabrik replication diffs (osmChange) published
+since the last run to the cached regional extracts and re-derives only the
+POI, building and road records they touch (changed objects, ways using moved
+nodes, relations with changed members); the outputs are patched in place and
+the touched level-12 cells are listed in osm_changed_cells_<region>.csv.
 
 Input:
 - Downloads from: https://download.geofabrik.de/asia/indonesia-latest.osm.pbf
@@ -14,29 +28,41 @@ Output:
 - osm_business_oku.geojson/csv
 - osm_buildings_tangsel.geojson (building footprints)
 - osm_buildings_oku.geojson
+- osm_buildings_tangsel.parquet (building store: UTM area, centroid, level-12
+  cells, admin code; see common/footprints.py)
+- osm_buildings_oku.parquet
 - osm_roads_tangsel.geojson (road network)
 - osm_roads_oku.geojson
 - tangsel.osm.pbf (regional extract)
 - oku.osm.pbf (regional extract)
+- osmium_extracts.json (osmium extract config of the last run)
+- <region>.osm.pbf.state.json (replication sequence of the extract)
+- osm_changed_cells_<region>.csv (--update: grid cells under changed records)
 - osm_business_comparison.png (visualization)
 
 Dependencies:
-- pyrosm (OSM PBF reader)
+- osmium (pyosmium, single-pass PBF reader)
 - osmium-tool (PBF extraction)
 - geopandas, pandas, matplotlib
-- requests (HTTP downloads)
+- requests (HTTP downloads: resumable, MD5-verified, conditional; see
+  common/download.py)
 - tqdm (progress bars, optional)
 """
 
 import os
+import sys
+import json
 import subprocess
 from pathlib import Path
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-from pyrosm import OSM
+import shapely
+import osmium
+from osmium.replication.server import ReplicationServer
+from osmium.replication.utils import get_replication_header
 import matplotlib.pyplot as plt
 import requests
-from tqdm import tqdm
 
 # ============================================================================
 # CONFIGURATION
@@ -46,11 +72,44 @@ SCRIPT_DIR = Path(__file__).parent.absolute()
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 BOUNDARIES_DIR = SCRIPT_DIR.parent / "boundaries"
 INDONESIA_PBF_URL = "https://download.geofabrik.de/asia/indonesia-latest.osm.pbf"
+INDONESIA_UPDATES_URL = "https://download.geofabrik.de/asia/indonesia-updates"
+MAX_DIFF_KB = 200 * 1024  # replication diffs held in memory per update run
+ROAD_STEP_DEG = 0.0002  # ~22m: road vertex spacing when listing touched cells
 OUTPUT_DIR = SCRIPT_DIR
 
 # Global variable to store the Indonesia PBF path (determined at runtime)
 INDONESIA_PBF = None
 
+# Tags that make an object a POI
+POI_FILTER = ('amenity', 'shop', 'tourism')
+
+# Driving network: highway ways minus non-motorized, unbuilt and private
+# service ways
+DRIVING_EXCLUDE = {
+    'highway': {'cycleway', 'footway', 'path', 'pedestrian', 'steps', 'track', 'corridor', 'elevator',
+                'escalator', 'proposed', 'construction', 'bridleway', 'abandoned', 'platform', 'raceway'},
+    'area': {'yes'},
+    'motor_vehicle': {'no'},
+    'motorcar': {'no'},
+    'service': {'parking', 'parking_aisle', 'private', 'emergency_access'},
+}
+
+# Tag columns kept per layer (plus id, osm_type, geometry)
+LAYER_COLUMNS = {
+    'pois': ['name', 'amenity', 'shop', 'tourism', 'office', 'brand', 'operator', 'addr:street',
+             'addr:city', 'addr:postcode', 'phone', 'website', 'opening_hours'],
+    'buildings': ['name', 'building', 'amenity', 'building:levels', 'addr:street'],
+    'roads': ['name', 'highway', 'ref', 'oneway', 'maxspeed', 'lanes', 'surface'],
+}
+
+sys.path.insert(0, str(PROJECT_ROOT))
+from common.regions import get_regions, run_regions, osmium_extract_config
+from common.admin import region_admin_index
+from common.footprints import (build_building_store, write_building_store, read_building_store,
+                               merge_building_store)
+from common import lattice
+from common.download import download, DownloadError
+
 print("="*70)
 print("OSM Data Extraction - Tangerang Selatan & OKU")
 print("Using regional PBF extraction for fast processing")
@@ -63,123 +122,115 @@ print()
 # ============================================================================
 
 def download_indonesia_pbf():
-    """Find existing Indonesia PBF or download from Geofabrik if not found"""
+    """
+    Use a dated Indonesia PBF snapshot if present, else keep
+    indonesia-latest.osm.pbf current: resumable download verified against
+    Geofabrik's MD5, and a conditional request (ETag / If-Modified-Since)
+    when a copy is cached (common/download.py)
+    """
     global INDONESIA_PBF
 
-    # Look for any existing indonesia-*.osm.pbf file
-    existing_pbfs = list(SCRIPT_DIR.glob("indonesia-*.osm.pbf"))
-
-    if existing_pbfs:
+    # Dated snapshots (indonesia-YYMMDD.osm.pbf) are pinned inputs: use as-is
+    snapshots = [p for p in SCRIPT_DIR.glob("indonesia-*.osm.pbf") if p.name != "indonesia-latest.osm.pbf"]
+    if snapshots:
         # Use the most recent one (by modification time)
-        INDONESIA_PBF = max(existing_pbfs, key=lambda p: p.stat().st_mtime)
+        INDONESIA_PBF = max(snapshots, key=lambda p: p.stat().st_mtime)
         size_mb = INDONESIA_PBF.stat().st_size / (1024*1024)
         print(f"✓ Found existing Indonesia PBF: {INDONESIA_PBF.name} ({size_mb:.1f} MB)")
         return True
 
-    # No existing file found - download it
     INDONESIA_PBF = SCRIPT_DIR / "indonesia-latest.osm.pbf"
+    cached = INDONESIA_PBF.exists()
 
     print(f"\n{'='*70}")
-    print("DOWNLOADING INDONESIA OSM DATA")
+    print("CHECKING INDONESIA OSM DATA" if cached else "DOWNLOADING INDONESIA OSM DATA")
     print(f"{'='*70}")
     print(f"Source: {INDONESIA_PBF_URL}")
     print(f"Target: {INDONESIA_PBF}")
-    print("This is a large file (~1.6 GB) and may take several minutes...")
+    if not cached:
+        print("This is a large file (~1.6 GB) and may take several minutes...")
+        print("An interrupted download resumes where it stopped on the next run.")
     print()
 
     SCRIPT_DIR.mkdir(parents=True, exist_ok=True)
 
     try:
-        response = requests.get(INDONESIA_PBF_URL, stream=True)
-        response.raise_for_status()
-        total_size = int(response.headers.get('content-length', 0))
-
-        # Use tqdm if available, otherwise simple progress
-        try:
-            with tqdm(total=total_size, unit='B', unit_scale=True, desc="Downloading") as pbar:
-                with open(INDONESIA_PBF, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            pbar.update(len(chunk))
-        except NameError:
-            # tqdm not available, use simple progress
-            downloaded = 0
-            with open(INDONESIA_PBF, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if downloaded % (10 * 1024 * 1024) == 0:  # Every 10 MB
-                            print(f"  Downloaded: {downloaded / (1024*1024):.1f} MB / {total_size / (1024*1024):.1f} MB")
-
-        size_mb = INDONESIA_PBF.stat().st_size / (1024*1024)
-        print(f"\n✓ Download complete: {INDONESIA_PBF.name} ({size_mb:.1f} MB)")
-        return True
-
-    except Exception as e:
+        status = download(INDONESIA_PBF_URL, INDONESIA_PBF, md5_url=INDONESIA_PBF_URL + ".md5")
+    except (DownloadError, requests.RequestException) as e:
+        if cached:
+            print(f"⚠ Could not check for updates ({e}); using cached {INDONESIA_PBF.name}")
+            return True
         print(f"✗ Error downloading Indonesia PBF: {e}")
-        if INDONESIA_PBF.exists():
-            INDONESIA_PBF.unlink()  # Remove partial download
         return False
 
+    size_mb = INDONESIA_PBF.stat().st_size / (1024*1024)
+    if status == 'unchanged':
+        print(f"✓ {INDONESIA_PBF.name} is up to date ({size_mb:.1f} MB)")
+    else:
+        print(f"\n✓ Download complete: {INDONESIA_PBF.name} ({size_mb:.1f} MB, MD5 verified)")
+    return True
 
-def load_boundaries():
-    """Load region boundaries from GeoJSON"""
-    print("Loading region boundaries...")
-
-    tangsel_path = BOUNDARIES_DIR / "tangerang_selatan_kelurahan_RBI.geojson"
-    oku_path = BOUNDARIES_DIR / "oku_kecamatan_RBI.geojson"
-
-    if not tangsel_path.exists():
-        raise FileNotFoundError(f"Tangsel boundary not found: {tangsel_path}")
-    if not oku_path.exists():
-        raise FileNotFoundError(f"OKU boundary not found: {oku_path}")
-
-    tangsel_boundary = gpd.read_file(tangsel_path)
-    oku_boundary = gpd.read_file(oku_path)
-
-    # Dissolve to single polygon
-    tangsel_dissolved = tangsel_boundary.dissolve()
-    oku_dissolved = oku_boundary.dissolve()
-
-    print(f"✓ Tangsel: {len(tangsel_boundary)} kelurahan")
-    print(f"✓ OKU: {len(oku_boundary)} kecamatan")
 
-    return tangsel_dissolved, oku_dissolved
+def load_boundaries(region):
+    """Load a region's boundary from GeoJSON, dissolved to a single polygon"""
+    path = region.boundary_path
+    if not path.exists():
+        raise FileNotFoundError(f"{region.short_name} boundary not found: {path}")
 
+    boundary = gpd.read_file(path)
+    print(f"✓ {region.short_name}: {len(boundary)} {region.admin_level}")
 
-def get_bbox_string(gdf, buffer=0.01):
-    """Get bbox string for osmium with buffer"""
-    bbox = gdf.total_bounds  # [minx, miny, maxx, maxy]
-    return f"{bbox[0]-buffer},{bbox[1]-buffer},{bbox[2]+buffer},{bbox[3]+buffer}"
+    return boundary.dissolve()
 
 
 # ============================================================================
 # STEP 2: REGIONAL PBF EXTRACTION
 # ============================================================================
 
-def extract_regional_pbf(region_name, bbox_string, output_pbf):
-    """Extract regional PBF from Indonesia PBF using osmium"""
-    if output_pbf.exists():
-        print(f"✓ {output_pbf.name} already exists")
+def run_osmium_extract(config_path, input_pbf):
+    """Cut `input_pbf` into the extracts listed in an osmium config file"""
+    cmd = f'osmium extract -c "{config_path}" "{input_pbf}" --overwrite'
+    return subprocess.run(cmd, shell=True, capture_output=True, text=True)
+
+
+def extract_regional_pbfs(regions):
+    """
+    Cut every missing regional PBF out of the Indonesia PBF with one osmium
+    run: one config (common/regions.py) lists all regions with their
+    boundary polygons, so the national file is read once however many
+    regions there are.
+    """
+    missing = []
+    for region in regions:
+        region_pbf = OUTPUT_DIR / f'{region.key}.osm.pbf'
+        if region_pbf.exists():
+            print(f"✓ {region_pbf.name} already exists")
+        else:
+            missing.append(region)
+    if not missing:
         return True
 
     if not INDONESIA_PBF.exists():
         print(f"Error: Indonesia PBF not found: {INDONESIA_PBF}")
         return False
 
-    print(f"Extracting {region_name} region from Indonesia PBF...")
-    cmd = f'osmium extract -b {bbox_string} "{INDONESIA_PBF}" -o "{output_pbf}" --overwrite'
+    config_path = OUTPUT_DIR / 'osmium_extracts.json'
+    config_path.write_text(json.dumps(osmium_extract_config(missing, OUTPUT_DIR)))
 
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(f"Extracting {', '.join(r.short_name for r in missing)} from Indonesia PBF (one pass)...")
+    result = run_osmium_extract(config_path, INDONESIA_PBF)
 
     if result.returncode == 0:
-        size_mb = output_pbf.stat().st_size / (1024*1024)
-        print(f"✓ {output_pbf.name} created ({size_mb:.1f} MB)")
+        # Replication position of the national file: where --update starts
+        header = get_replication_header(str(INDONESIA_PBF))
+        for region in missing:
+            region_pbf = OUTPUT_DIR / f'{region.key}.osm.pbf'
+            write_replication_state(region_pbf, header.sequence, header.timestamp)
+            size_mb = region_pbf.stat().st_size / (1024*1024)
+            print(f"✓ {region_pbf.name} created ({size_mb:.1f} MB)")
         return True
     else:
-        print(f"Error extracting {region_name}: {result.stderr}")
+        print(f"Error extracting regions: {result.stderr}")
         return False
 
 
@@ -187,20 +238,145 @@ def extract_regional_pbf(region_name, bbox_string, output_pbf):
 # STEP 3: DATA EXTRACTION
 # ============================================================================
 
-def extract_pois(osm_obj, region_gdf, region_name):
-    """Extract POIs from regional PBF and clip to boundaries"""
+class LayerCollector(osmium.SimpleHandler):
+    """
+    Single-pass PBF reader: every node, way and assembled area is checked
+    once and routed into the POI, building and road collectors (selected
+    tags + WKB geometry per row). `only` ({'node'|'way'|'relation': ids})
+    restricts it to those objects (incremental updates).
+    """
+
+    def __init__(self, only=None):
+        super().__init__()
+        self.wkb = osmium.geom.WKBFactory()
+        self.rows = {layer: [] for layer in LAYER_COLUMNS}
+        self.only = only
+
+    def _collect(self, layer, osm_id, osm_type, tags, make_geometry, obj):
+        try:
+            geometry = make_geometry(obj)
+        except (osmium.InvalidLocationError, RuntimeError):
+            return  # Incomplete geometry (members outside the extract)
+        values = [tags.get(c) for c in LAYER_COLUMNS[layer]]
+        self.rows[layer].append((osm_id, osm_type, *values, geometry))
+
+    def node(self, n):
+        if self.only is not None and n.id not in self.only['node']:
+            return
+        if any(key in n.tags for key in POI_FILTER):
+            self._collect('pois', n.id, 'node', n.tags, self.wkb.create_point, n)
+
+    def way(self, w):
+        if self.only is not None and w.id not in self.only['way']:
+            return
+        if is_driving_road(w.tags):
+            self._collect('roads', w.id, 'way', w.tags, self.wkb.create_linestring, w)
+
+    def area(self, a):
+        osm_type = 'way' if a.from_way() else 'relation'
+        if self.only is not None and a.orig_id() not in self.only[osm_type]:
+            return
+        if a.tags.get('building', 'no') != 'no':
+            self._collect('buildings', a.orig_id(), osm_type, a.tags, self.wkb.create_multipolygon, a)
+        if any(key in a.tags for key in POI_FILTER):
+            self._collect('pois', a.orig_id(), osm_type, a.tags, self.wkb.create_multipolygon, a)
+
+    def to_frame(self, layer):
+        """Collected rows of one layer as a GeoDataFrame (EPSG:4326)"""
+        columns = ['id', 'osm_type'] + LAYER_COLUMNS[layer]
+        rows = self.rows[layer]
+        frame = pd.DataFrame([row[:-1] for row in rows], columns=columns)
+        geometry = shapely.from_wkb([row[-1] for row in rows])
+        # Single-part areas as plain polygons
+        if len(geometry):
+            single = shapely.get_num_geometries(geometry) == 1
+            single &= shapely.get_type_id(geometry) == 6
+            geometry[single] = shapely.get_geometry(geometry[single], 0)
+        return gpd.GeoDataFrame(frame, geometry=geometry, crs='EPSG:4326')
+
+
+def is_driving_road(tags):
+    """True for highway ways of the driving network (see DRIVING_EXCLUDE)"""
+    if 'highway' not in tags:
+        return False
+    return not any(tags.get(key) in values for key, values in DRIVING_EXCLUDE.items())
+
+
+def read_osm_layers(region_pbf):
+    """
+    Parse a regional PBF once.
+
+    Returns:
+    - (pois, buildings, roads) GeoDataFrames in EPSG:4326, unclipped
+    """
+    collector = LayerCollector()
+    collector.apply_file(str(region_pbf), locations=True, idx='flex_mem')
+    return collector.to_frame('pois'), collector.to_frame('buildings'), collector.to_frame('roads')
+
+
+def within_boundary(gdf, region_gdf):
+    """
+    Mask of geometries inside the region boundary (same result as an sjoin
+    with predicate='within'), vectorized:
+    1. bbox prefilter against the boundary's extent
+    2. points: prepared `contains_xy` on the coordinates
+    3. other geometries: prepared `contains` on the candidates only
+    """
+    boundary = region_gdf.geometry.union_all()
+    shapely.prepare(boundary)
+    minx, miny, maxx, maxy = boundary.bounds
+
+    geoms = gdf.geometry.values
+    bounds = shapely.bounds(geoms)
+    inside = np.zeros(len(gdf), dtype=bool)
+    candidates = np.flatnonzero((bounds[:, 0] >= minx) & (bounds[:, 2] <= maxx) &
+                                (bounds[:, 1] >= miny) & (bounds[:, 3] <= maxy))
+
+    points = shapely.get_type_id(geoms[candidates]) == 0
+    point_rows = candidates[points]
+    inside[point_rows] = shapely.contains_xy(boundary, bounds[point_rows, 0], bounds[point_rows, 1])
+    other_rows = candidates[~points]
+    inside[other_rows] = shapely.contains(boundary, geoms[other_rows])
+    return inside
+
+
+def coalesce_category(frame, keys=('shop', 'amenity', 'office')):
+    """'<key>:<value>' of the first key with a value, column-wise ('other' if none)"""
+    category = pd.Series(pd.NA, index=frame.index, dtype='string')
+    for key in reversed(keys):
+        if key in frame.columns:
+            values = frame[key].astype('string')
+            category = (key + ':' + values).fillna(category)
+    return category.fillna('other').astype(str)
+
+
+def centroid_lonlat(gdf, crs='EPSG:32748'):
+    """
+    Centroid lon/lat per geometry in one projection round-trip; points are
+    their own centroid and are not projected.
+    """
+    geoms = gdf.geometry.values
+    lons, lats = shapely.get_x(geoms), shapely.get_y(geoms)
+    shapes = np.flatnonzero(shapely.get_type_id(geoms) != 0)
+    if len(shapes):
+        centroids = gdf.geometry.iloc[shapes].to_crs(crs).centroid.to_crs(gdf.crs)
+        lons[shapes] = centroids.x.to_numpy()
+        lats[shapes] = centroids.y.to_numpy()
+    return lons, lats
+
+
+def extract_pois(pois_raw, region_gdf, region_name):
+    """Clip POIs from the regional PBF to the region boundary"""
     print(f"\n--- Extracting {region_name} POIs ---")
 
-    pois_raw = osm_obj.get_pois()
-    print(f"POIs in bbox: {len(pois_raw):,}")
+    print(f"POIs in extract: {len(pois_raw):,}")
 
     # Ensure same CRS
     if pois_raw.crs != region_gdf.crs:
         pois_raw = pois_raw.to_crs(region_gdf.crs)
 
     # Clip to precise boundary
-    pois = gpd.sjoin(pois_raw, region_gdf[['geometry']], how='inner', predicate='within')
-    pois = pois.drop(columns=['index_right'], errors='ignore')
+    pois = pois_raw[within_boundary(pois_raw, region_gdf)]
 
     print(f"✓ POIs within boundary: {len(pois):,}")
     return pois
@@ -215,28 +391,17 @@ def extract_business_data(gdf, region_name):
     print(f"POIs with name: {len(biz):,}")
 
     # Select relevant columns
-    cols_to_keep = ['name', 'amenity', 'shop', 'office', 'brand', 'operator',
+    cols_to_keep = ['id', 'osm_type', 'name', 'amenity', 'shop', 'office', 'brand', 'operator',
                     'addr:street', 'addr:city', 'addr:postcode', 'phone',
                     'website', 'opening_hours', 'geometry']
     cols_exist = [c for c in cols_to_keep if c in biz.columns]
     biz = biz[cols_exist]
 
-    # Add category
-    def get_category(row):
-        if pd.notna(row.get('shop')):
-            return f"shop:{row['shop']}"
-        elif pd.notna(row.get('amenity')):
-            return f"amenity:{row['amenity']}"
-        elif pd.notna(row.get('office')):
-            return f"office:{row['office']}"
-        return 'other'
-
-    biz['category'] = biz.apply(get_category, axis=1)
+    # Add category: shop, else amenity, else office
+    biz['category'] = coalesce_category(biz)
 
-    # Add lat/lon (convert to projected CRS first to avoid warning)
-    biz_proj = biz.to_crs('EPSG:32748')  # UTM Zone 48S
-    biz['lon'] = biz_proj.geometry.centroid.to_crs(biz.crs).x
-    biz['lat'] = biz_proj.geometry.centroid.to_crs(biz.crs).y
+    # Add lat/lon (polygon centroids in UTM Zone 48S, once)
+    biz['lon'], biz['lat'] = centroid_lonlat(biz)
 
     print(f"✓ Business POIs: {len(biz):,}")
     print(f"\nTop categories:")
@@ -245,20 +410,18 @@ def extract_business_data(gdf, region_name):
     return biz
 
 
-def extract_buildings(osm_obj, region_gdf, region_name):
-    """Extract building footprints"""
+def extract_buildings(buildings_raw, region_gdf, region_name):
+    """Clip building footprints to the region boundary and add their area"""
     print(f"\n--- Extracting {region_name} Buildings ---")
 
-    buildings_raw = osm_obj.get_buildings()
-    print(f"Buildings in bbox: {len(buildings_raw):,}")
+    print(f"Buildings in extract: {len(buildings_raw):,}")
 
     # Ensure same CRS
     if buildings_raw.crs != region_gdf.crs:
         buildings_raw = buildings_raw.to_crs(region_gdf.crs)
 
     # Clip to precise boundary
-    buildings = gpd.sjoin(buildings_raw, region_gdf[['geometry']], how='inner', predicate='within')
-    buildings = buildings.drop(columns=['index_right'], errors='ignore')
+    buildings = buildings_raw[within_boundary(buildings_raw, region_gdf)].copy()
 
     # Calculate area
     buildings['area_m2'] = buildings.to_crs('EPSG:32748').geometry.area
@@ -270,17 +433,15 @@ def extract_buildings(osm_obj, region_gdf, region_name):
     return buildings
 
 
-def extract_roads(osm_obj, region_gdf, region_name):
-    """Extract road network"""
+def extract_roads(roads_raw, region_gdf, region_name):
+    """Clip the driving network to the region boundary and add lengths"""
     print(f"\n--- Extracting {region_name} Roads ---")
 
-    roads_raw = osm_obj.get_network(network_type="driving")
-
     if roads_raw is None or len(roads_raw) == 0:
         print("⚠ No roads found")
         return gpd.GeoDataFrame()
 
-    print(f"Roads in bbox: {len(roads_raw):,}")
+    print(f"Roads in extract: {len(roads_raw):,}")
 
     # Ensure same CRS and clip
     if roads_raw.crs != region_gdf.crs:
@@ -305,88 +466,66 @@ def extract_roads(osm_obj, region_gdf, region_name):
 # STEP 4: OUTPUT & VISUALIZATION
 # ============================================================================
 
-def save_data(biz_tangsel, biz_oku, buildings_tangsel, buildings_oku, roads_tangsel, roads_oku):
-    """Save all extracted data"""
-    print("\n" + "="*70)
-    print("SAVING DATA")
-    print("="*70)
+def save_data(region, biz, buildings, roads, building_store=None):
+    """Save one region's extracted data"""
+    key = region.key
 
     # Business POIs
-    biz_tangsel.to_file(OUTPUT_DIR / 'osm_business_tangsel.geojson', driver='GeoJSON')
-    csv_cols = [c for c in biz_tangsel.columns if c != 'geometry']
-    biz_tangsel[csv_cols].to_csv(OUTPUT_DIR / 'osm_business_tangsel.csv', index=False)
-    print(f"✓ osm_business_tangsel.geojson/csv ({len(biz_tangsel):,} records)")
-
-    biz_oku.to_file(OUTPUT_DIR / 'osm_business_oku.geojson', driver='GeoJSON')
-    csv_cols = [c for c in biz_oku.columns if c != 'geometry']
-    biz_oku[csv_cols].to_csv(OUTPUT_DIR / 'osm_business_oku.csv', index=False)
-    print(f"✓ osm_business_oku.geojson/csv ({len(biz_oku):,} records)")
+    biz.to_file(OUTPUT_DIR / f'osm_business_{key}.geojson', driver='GeoJSON')
+    csv_cols = [c for c in biz.columns if c != 'geometry']
+    biz[csv_cols].to_csv(OUTPUT_DIR / f'osm_business_{key}.csv', index=False)
+    print(f"✓ osm_business_{key}.geojson/csv ({len(biz):,} records)")
 
     # Buildings
-    building_cols = ['name', 'building', 'amenity', 'area_m2', 'geometry']
-    cols_tangsel = [c for c in building_cols if c in buildings_tangsel.columns]
-    cols_oku = [c for c in building_cols if c in buildings_oku.columns]
-
-    buildings_tangsel[cols_tangsel].to_file(OUTPUT_DIR / 'osm_buildings_tangsel.geojson', driver='GeoJSON')
-    print(f"✓ osm_buildings_tangsel.geojson ({len(buildings_tangsel):,} buildings)")
+    building_cols = ['id', 'osm_type', 'name', 'building', 'amenity', 'area_m2', 'geometry']
+    cols_exist = [c for c in building_cols if c in buildings.columns]
+    buildings[cols_exist].to_file(OUTPUT_DIR / f'osm_buildings_{key}.geojson', driver='GeoJSON')
+    print(f"✓ osm_buildings_{key}.geojson ({len(buildings):,} buildings)")
 
-    buildings_oku[cols_oku].to_file(OUTPUT_DIR / 'osm_buildings_oku.geojson', driver='GeoJSON')
-    print(f"✓ osm_buildings_oku.geojson ({len(buildings_oku):,} buildings)")
+    # Building store (GeoParquet, read by Phase 3 without re-projecting)
+    if building_store is not None:
+        write_building_store(building_store, OUTPUT_DIR / f'osm_buildings_{key}.parquet')
+        print(f"✓ osm_buildings_{key}.parquet (area, centroid, cells, admin code)")
 
     # Roads
-    if len(roads_tangsel) > 0:
-        road_cols = ['name', 'highway', 'length_m', 'geometry']
-        cols_exist = [c for c in road_cols if c in roads_tangsel.columns]
-        roads_tangsel[cols_exist].to_file(OUTPUT_DIR / 'osm_roads_tangsel.geojson', driver='GeoJSON')
-        print(f"✓ osm_roads_tangsel.geojson ({len(roads_tangsel):,} roads)")
-
-    if len(roads_oku) > 0:
-        cols_exist = [c for c in road_cols if c in roads_oku.columns]
-        roads_oku[cols_exist].to_file(OUTPUT_DIR / 'osm_roads_oku.geojson', driver='GeoJSON')
-        print(f"✓ osm_roads_oku.geojson ({len(roads_oku):,} roads)")
+    if len(roads) > 0:
+        road_cols = ['id', 'osm_type', 'name', 'highway', 'length_m', 'geometry']
+        cols_exist = [c for c in road_cols if c in roads.columns]
+        roads[cols_exist].to_file(OUTPUT_DIR / f'osm_roads_{key}.geojson', driver='GeoJSON')
+        print(f"✓ osm_roads_{key}.geojson ({len(roads):,} roads)")
+    else:
+        # No roads left: drop the previous run's file rather than keep stale roads
+        (OUTPUT_DIR / f'osm_roads_{key}.geojson').unlink(missing_ok=True)
 
 
-def create_visualization(biz_tangsel, biz_oku, tangsel_dissolved, oku_dissolved):
-    """Create comparison visualization"""
+def create_visualization(results):
+    """Create comparison visualization (one row per region)"""
     print("\nCreating visualization...")
 
-    fig, axes = plt.subplots(2, 2, figsize=(14, 12))
-
-    # Tangsel - Categories
-    ax1 = axes[0, 0]
-    top_cats = biz_tangsel['category'].value_counts().head(12)
-    ax1.barh(range(len(top_cats)), top_cats.values, color='#3498db')
-    ax1.set_yticks(range(len(top_cats)))
-    ax1.set_yticklabels(top_cats.index)
-    ax1.invert_yaxis()
-    ax1.set_xlabel('Count')
-    ax1.set_title(f'Top Business Categories - Tangerang Selatan\n({len(biz_tangsel):,} total)')
-
-    # Tangsel - Map
-    ax2 = axes[0, 1]
-    tangsel_dissolved.boundary.plot(ax=ax2, color='blue', linewidth=1.5)
-    biz_tangsel.plot(ax=ax2, markersize=2, alpha=0.5, color='#e74c3c')
-    ax2.set_title('Business Locations - Tangerang Selatan')
-    ax2.set_xlabel('Longitude')
-    ax2.set_ylabel('Latitude')
-
-    # OKU - Categories
-    ax3 = axes[1, 0]
-    top_cats = biz_oku['category'].value_counts().head(12)
-    ax3.barh(range(len(top_cats)), top_cats.values, color='#27ae60')
-    ax3.set_yticks(range(len(top_cats)))
-    ax3.set_yticklabels(top_cats.index)
-    ax3.invert_yaxis()
-    ax3.set_xlabel('Count')
-    ax3.set_title(f'Top Business Categories - Ogan Komering Ulu\n({len(biz_oku):,} total)')
-
-    # OKU - Map
-    ax4 = axes[1, 1]
-    oku_dissolved.boundary.plot(ax=ax4, color='orange', linewidth=1.5)
-    biz_oku.plot(ax=ax4, markersize=2, alpha=0.5, color='#9b59b6')
-    ax4.set_title('Business Locations - Ogan Komering Ulu')
-    ax4.set_xlabel('Longitude')
-    ax4.set_ylabel('Latitude')
+    colors = [('#3498db', '#e74c3c'), ('#27ae60', '#9b59b6'), ('#f39c12', '#16a085')]
+    fig, axes = plt.subplots(len(results), 2, figsize=(14, 6 * len(results)), squeeze=False)
+
+    for row, (region, result) in enumerate(results):
+        bar_color, point_color = colors[row % len(colors)]
+        biz = result['business']
+
+        # Categories
+        ax1 = axes[row, 0]
+        top_cats = biz['category'].value_counts().head(12)
+        ax1.barh(range(len(top_cats)), top_cats.values, color=bar_color)
+        ax1.set_yticks(range(len(top_cats)))
+        ax1.set_yticklabels(top_cats.index)
+        ax1.invert_yaxis()
+        ax1.set_xlabel('Count')
+        ax1.set_title(f'Top Business Categories - {region.name}\n({len(biz):,} total)')
+
+        # Map
+        ax2 = axes[row, 1]
+        result['boundary'].boundary.plot(ax=ax2, color=bar_color, linewidth=1.5)
+        biz.plot(ax=ax2, markersize=2, alpha=0.5, color=point_color)
+        ax2.set_title(f'Business Locations - {region.name}')
+        ax2.set_xlabel('Longitude')
+        ax2.set_ylabel('Latitude')
 
     plt.tight_layout()
     output_path = OUTPUT_DIR / 'osm_business_comparison.png'
@@ -396,32 +535,26 @@ def create_visualization(biz_tangsel, biz_oku, tangsel_dissolved, oku_dissolved)
     print(f"✓ osm_business_comparison.png")
 
 
-def print_summary(pois_tangsel, pois_oku, biz_tangsel, biz_oku,
-                  buildings_tangsel, buildings_oku, roads_tangsel, roads_oku):
-    """Print final summary"""
+def print_summary(results):
+    """Print final summary (one column per region)"""
     print("\n" + "="*70)
     print("OSM DATA EXTRACTION - FINAL SUMMARY")
     print("="*70)
 
-    print(f"\n{'Category':<25} {'Tangsel':>15} {'OKU':>15} {'Ratio':>10}")
+    header = f"{'Category':<25}" + ''.join(f"{region.short_name:>15}" for region, _ in results)
+    print(f"\n{header}")
     print("-"*70)
 
-    # POIs
-    print(f"{'Total POIs':<25} {len(pois_tangsel):>15,} {len(pois_oku):>15,} {len(pois_tangsel)/max(len(pois_oku),1):>10.1f}x")
-    print(f"{'Business POIs':<25} {len(biz_tangsel):>15,} {len(biz_oku):>15,} {len(biz_tangsel)/max(len(biz_oku),1):>10.1f}x")
-
-    # Buildings
-    print(f"{'Buildings':<25} {len(buildings_tangsel):>15,} {len(buildings_oku):>15,} {len(buildings_tangsel)/max(len(buildings_oku),1):>10.1f}x")
-    tangsel_area = buildings_tangsel['area_m2'].sum()/1e6
-    oku_area = buildings_oku['area_m2'].sum()/1e6
-    print(f"{'Building Area (km²)':<25} {tangsel_area:>15.2f} {oku_area:>15.2f} {tangsel_area/max(oku_area,0.01):>10.1f}x")
-
-    # Roads
-    if len(roads_tangsel) > 0 and len(roads_oku) > 0:
-        print(f"{'Road Segments':<25} {len(roads_tangsel):>15,} {len(roads_oku):>15,} {len(roads_tangsel)/max(len(roads_oku),1):>10.1f}x")
-        tangsel_road_km = roads_tangsel['length_m'].sum()/1000
-        oku_road_km = roads_oku['length_m'].sum()/1000
-        print(f"{'Road Length (km)':<25} {tangsel_road_km:>15.1f} {oku_road_km:>15.1f} {tangsel_road_km/max(oku_road_km,0.1):>10.1f}x")
+    rows = [
+        ('Total POIs', 'pois', '{:>15,}'),
+        ('Business POIs', 'business_pois', '{:>15,}'),
+        ('Buildings', 'buildings', '{:>15,}'),
+        ('Building Area (km²)', 'building_area_km2', '{:>15.2f}'),
+        ('Road Segments', 'roads', '{:>15,}'),
+        ('Road Length (km)', 'road_km', '{:>15.1f}'),
+    ]
+    for label, stat, fmt in rows:
+        print(f"{label:<25}" + ''.join(fmt.format(result['stats'][stat]) for _, result in results))
 
     print("-"*70)
     print(f"\n📁 Output directory: {OUTPUT_DIR}")
@@ -429,62 +562,346 @@ def print_summary(pois_tangsel, pois_oku, biz_tangsel, biz_oku,
 
 
 # ============================================================================
-# MAIN EXECUTION
+# STEP 7: INCREMENTAL UPDATE (--update)
 # ============================================================================
 
-def main():
-    """Main execution pipeline"""
+def state_path(region_pbf):
+    return region_pbf.with_name(region_pbf.name + '.state.json')
 
-    # Step 1: Download Indonesia PBF
-    if not download_indonesia_pbf():
-        print("Failed to obtain Indonesia PBF file. Exiting.")
-        return
 
-    # Step 2: Load boundaries and get bounding boxes
-    tangsel_dissolved, oku_dissolved = load_boundaries()
-    tangsel_bbox_str = get_bbox_string(tangsel_dissolved)
-    oku_bbox_str = get_bbox_string(oku_dissolved)
+def write_replication_state(region_pbf, sequence, timestamp):
+    """Record the replication sequence/timestamp a regional extract is at"""
+    state = {'sequence': sequence, 'timestamp': timestamp.isoformat() if timestamp else None}
+    state_path(region_pbf).write_text(json.dumps(state))
 
-    print(f"\nTangsel bbox: {tangsel_bbox_str}")
-    print(f"OKU bbox: {oku_bbox_str}")
-    print()
 
-    # Step 3: Extract regional PBFs
-    tangsel_pbf = OUTPUT_DIR / 'tangsel.osm.pbf'
-    oku_pbf = OUTPUT_DIR / 'oku.osm.pbf'
+def read_replication_state(region_pbf):
+    """(sequence, timestamp) of a regional extract, from its state file or PBF header"""
+    path = state_path(region_pbf)
+    if path.exists():
+        state = json.loads(path.read_text())
+        timestamp = state.get('timestamp')
+        return state.get('sequence'), pd.Timestamp(timestamp).to_pydatetime() if timestamp else None
+    header = get_replication_header(str(region_pbf))
+    return header.sequence, header.timestamp
 
-    if not extract_regional_pbf("Tangsel", tangsel_bbox_str, tangsel_pbf):
-        return
-    if not extract_regional_pbf("OKU", oku_bbox_str, oku_pbf):
+
+class ChangeCollector(osmium.SimpleHandler):
+    """IDs of every object in an osmChange file (created, modified, deleted)"""
+
+    def __init__(self):
+        super().__init__()
+        self.ids = {'node': set(), 'way': set(), 'relation': set()}
+
+    def node(self, n):
+        self.ids['node'].add(n.id)
+
+    def way(self, w):
+        self.ids['way'].add(w.id)
+
+    def relation(self, r):
+        self.ids['relation'].add(r.id)
+
+
+class AffectedCollector(osmium.SimpleHandler):
+    """
+    Objects of an updated extract whose records depend on a change: the
+    changed objects, ways using a changed node (moved geometry) and
+    relations with a changed member. Reads refs only, no locations.
+    """
+
+    MEMBER_TYPES = {'n': 'node', 'w': 'way', 'r': 'relation'}
+
+    def __init__(self, changed):
+        super().__init__()
+        self.affected = {osm_type: set(ids) for osm_type, ids in changed.items()}
+
+    def way(self, w):
+        if w.id not in self.affected['way'] and any(n.ref in self.affected['node'] for n in w.nodes):
+            self.affected['way'].add(w.id)
+
+    def relation(self, r):
+        if r.id not in self.affected['relation'] and any(
+                m.ref in self.affected[self.MEMBER_TYPES[m.type]] for m in r.members):
+            self.affected['relation'].add(r.id)
+
+
+def fetch_osm_changes(start_sequence):
+    """
+    Download the Geofabrik replication diffs after `start_sequence` into one
+    osmChange file (last version of every object).
+
+    Returns:
+    - (osc path, last sequence, its timestamp), or None if already current
+    """
+    server = ReplicationServer(INDONESIA_UPDATES_URL)
+    osc_path = OUTPUT_DIR / 'indonesia-changes.osc.gz'
+
+    writer = osmium.SimpleWriter(str(osc_path), overwrite=True)
+    try:
+        sequence = server.apply_diffs(writer, start_sequence + 1, max_size=MAX_DIFF_KB)
+    finally:
+        writer.close()
+
+    if sequence is None:
+        osc_path.unlink(missing_ok=True)
+        return None
+    info = server.get_state_info(sequence)
+    return osc_path, sequence, info.timestamp if info is not None else None
+
+
+def apply_changes(region, osc_path):
+    """
+    Merge an osmChange file into a regional extract and cut it back to the
+    region boundary (the diffs cover all of Indonesia).
+    """
+    region_pbf = OUTPUT_DIR / f'{region.key}.osm.pbf'
+    merged = OUTPUT_DIR / f'{region.key}.merged.osm.pbf'
+    merged.unlink(missing_ok=True)
+
+    changes = osmium.MergeInputReader()
+    changes.add_file(str(osc_path))
+    reader = osmium.io.Reader(str(region_pbf))
+    writer = osmium.io.Writer(osmium.io.File(str(merged)), osmium.io.Header())
+    changes.apply_to_reader(reader, writer, False)
+    reader.close()
+    writer.close()
+
+    config_path = OUTPUT_DIR / f'osmium_update_{region.key}.json'
+    config_path.write_text(json.dumps(osmium_extract_config([region], OUTPUT_DIR)))
+    result = run_osmium_extract(config_path, merged)
+    merged.unlink(missing_ok=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Error cutting {region.short_name} after update: {result.stderr}")
+    return region_pbf
+
+
+def object_mask(frame, ids):
+    """Rows of `frame` whose (osm_type, id) is in `ids`"""
+    mask = np.zeros(len(frame), dtype=bool)
+    for osm_type, type_ids in ids.items():
+        if type_ids:
+            mask |= (frame['osm_type'] == osm_type).to_numpy() & frame['id'].isin(type_ids).to_numpy()
+    return mask
+
+
+def touched_cells(store_rows, pois, roads):
+    """Level-12 grid IDs under changed buildings, POIs and roads"""
+    cells = [np.concatenate([np.asarray(c, dtype=object) for c in store_rows['cell_ids']])
+             if len(store_rows) else np.empty(0, dtype=object)]
+    if len(pois):
+        cells.append(lattice.lonlat_to_gid(pois['lon'].to_numpy(), pois['lat'].to_numpy()))
+    if len(roads):
+        # Road vertices densified to ~22m, so no crossed cell is skipped
+        coords = shapely.get_coordinates(shapely.segmentize(roads.to_crs('EPSG:4326').geometry.values,
+                                                            ROAD_STEP_DEG))
+        cells.append(lattice.lonlat_to_gid(coords[:, 0], coords[:, 1]))
+    return np.unique(np.concatenate(cells).astype(str))
+
+
+def _as_output(frame, columns=('id', 'osm_type', 'geometry')):
+    """
+    A layer as an EPSG:4326 GeoDataFrame. Empty layers may come without a
+    geometry column or CRS (no previous output, nothing extracted): those
+    become an empty frame with `columns`.
+    """
+    if 'geometry' not in frame.columns:
+        return gpd.GeoDataFrame(columns=list(dict.fromkeys([*columns, 'geometry'])),
+                                geometry='geometry', crs='EPSG:4326')
+    # GeoJSON without a CRS member is EPSG:4326 by definition
+    return frame.set_crs('EPSG:4326') if frame.crs is None else frame.to_crs('EPSG:4326')
+
+
+def _read_output(path, like):
+    """Stored output layer (empty, with the columns of `like`, if there is none yet)"""
+    frame = gpd.read_file(path) if path.exists() else gpd.GeoDataFrame()
+    if len(frame) and not {'id', 'osm_type'} <= set(frame.columns):
+        raise RuntimeError(f"{path.name} has no id/osm_type columns; run a full extraction first")
+    return _as_output(frame, like.columns)
+
+
+def _replace(old, drop, new):
+    """`old` without its `drop` rows, plus `new` (an empty side does not turn the dtypes to object)"""
+    parts = [frame for frame in (old[~drop], new) if len(frame)] or [old.iloc[:0]]
+    return gpd.GeoDataFrame(pd.concat(parts, ignore_index=True), geometry='geometry', crs='EPSG:4326')
+
+
+def update_region(region, osc_path, sequence, timestamp):
+    """
+    Worker entry point of --update: apply the diffs to one regional extract
+    and re-derive only the POI, building and road records they affect.
+    """
+    key = region.key
+    osc_path = Path(osc_path)
+    dissolved = load_boundaries(region)
+
+    region_pbf = apply_changes(region, osc_path)
+
+    # Changed objects + everything whose geometry uses them
+    changes = ChangeCollector()
+    changes.apply_file(str(osc_path))
+    dependents = AffectedCollector(changes.ids)
+    dependents.apply_file(str(region_pbf))
+    affected = dependents.affected
+
+    # Re-derive the affected records only
+    collector = LayerCollector(only=affected)
+    collector.apply_file(str(region_pbf), locations=True, idx='flex_mem')
+    pois = extract_pois(collector.to_frame('pois'), dissolved, region.short_name)
+    biz = extract_business_data(pois, region.name)
+    buildings = extract_buildings(collector.to_frame('buildings'), dissolved, region.short_name)
+    roads = extract_roads(collector.to_frame('roads'), dissolved, region.short_name)
+    biz, buildings, roads = _as_output(biz), _as_output(buildings), _as_output(roads)
+
+    # Swap them into the stored outputs
+    old_biz = _read_output(OUTPUT_DIR / f'osm_business_{key}.geojson', biz)
+    old_buildings = _read_output(OUTPUT_DIR / f'osm_buildings_{key}.geojson', buildings)
+    old_roads = _read_output(OUTPUT_DIR / f'osm_roads_{key}.geojson', roads)
+    store = read_building_store(OUTPUT_DIR / f'osm_buildings_{key}.parquet')
+
+    drop_biz, drop_buildings = object_mask(old_biz, affected), object_mask(old_buildings, affected)
+    drop_roads, drop_store = object_mask(old_roads, affected), object_mask(store, affected)
+
+    new_store = build_building_store(buildings, admin_index=region_admin_index(region))
+    cells = touched_cells(pd.concat([store[drop_store], new_store]),
+                          pd.concat([old_biz[drop_biz], biz]),
+                          gpd.GeoDataFrame(pd.concat([old_roads[drop_roads], roads]), crs='EPSG:4326'))
+
+    save_data(region,
+              _replace(old_biz, drop_biz, biz),
+              _replace(old_buildings, drop_buildings, buildings),
+              _replace(old_roads, drop_roads, roads),
+              merge_building_store(store, drop_store, new_store))
+
+    cells_path = OUTPUT_DIR / f'osm_changed_cells_{key}.csv'
+    pd.DataFrame({'grid_id': cells}).to_csv(cells_path, index=False)
+    print(f"✓ {cells_path.name} ({len(cells):,} grid cells touched)")
+
+    write_replication_state(region_pbf, sequence, timestamp)
+    return {
+        'objects': sum(len(ids) for ids in affected.values()),
+        'business_pois': (int(drop_biz.sum()), len(biz)),
+        'buildings': (int(drop_buildings.sum()), len(buildings)),
+        'roads': (int(drop_roads.sum()), len(roads)),
+        'cells': len(cells),
+    }
+
+
+def update(region_keys=None):
+    """--update: bring the regional extracts and outputs up to date from replication diffs"""
+    regions = get_regions(region_keys)
+
+    sequences = []
+    for region in regions:
+        region_pbf = OUTPUT_DIR / f'{region.key}.osm.pbf'
+        if not region_pbf.exists():
+            print(f"✗ {region_pbf.name} not found; run a full extraction first")
+            return
+        sequence, timestamp = read_replication_state(region_pbf)
+        if sequence is None and timestamp is not None:
+            sequence = ReplicationServer(INDONESIA_UPDATES_URL).timestamp_to_sequence(timestamp)
+        if sequence is None:
+            print(f"✗ {region_pbf.name} has no replication state; run a full extraction first")
+            return
+        sequences.append(sequence)
+
+    # One download for all regions, from the oldest extract on (re-applying
+    # a change an extract already has is a no-op)
+    print(f"Fetching changes after sequence {min(sequences)}...")
+    fetched = fetch_osm_changes(min(sequences))
+    if fetched is None:
+        print("✓ Regional extracts are up to date")
         return
+    osc_path, sequence, timestamp = fetched
+    print(f"✓ {osc_path.name} (up to sequence {sequence}, {timestamp})")
 
-    print()
+    results = run_regions(update_region, regions, osc_path=str(osc_path), sequence=sequence, timestamp=timestamp)
+
+    print("\n" + "="*70)
+    print("OSM INCREMENTAL UPDATE - SUMMARY (removed / re-derived)")
+    print("="*70)
+    for region in regions:
+        result = results[region.key]
+        print(f"{region.short_name}: {result['objects']:,} affected objects, "
+              f"POIs {result['business_pois'][0]:,}/{result['business_pois'][1]:,}, "
+              f"buildings {result['buildings'][0]:,}/{result['buildings'][1]:,}, "
+              f"roads {result['roads'][0]:,}/{result['roads'][1]:,}, {result['cells']:,} cells")
 
-    # Step 4: Load regional PBFs
-    print("Loading regional PBF files...")
-    osm_tangsel = OSM(str(tangsel_pbf))
-    osm_oku = OSM(str(oku_pbf))
-    print("✓ Regional PBF files loaded")
 
-    # Step 5: Extract all data layers
-    pois_tangsel = extract_pois(osm_tangsel, tangsel_dissolved, "Tangsel")
-    pois_oku = extract_pois(osm_oku, oku_dissolved, "OKU")
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
 
-    biz_tangsel = extract_business_data(pois_tangsel, "Tangerang Selatan")
-    biz_oku = extract_business_data(pois_oku, "Ogan Komering Ulu")
+def process_region(region, indonesia_pbf):
+    """
+    Worker entry point: regional extract, data layers and outputs for one
+    registry region. Returns summary stats + what the comparison figure needs.
+    """
+    global INDONESIA_PBF
+    INDONESIA_PBF = Path(indonesia_pbf)
 
-    buildings_tangsel = extract_buildings(osm_tangsel, tangsel_dissolved, "Tangsel")
-    buildings_oku = extract_buildings(osm_oku, oku_dissolved, "OKU")
+    dissolved = load_boundaries(region)
 
-    roads_tangsel = extract_roads(osm_tangsel, tangsel_dissolved, "Tangsel")
-    roads_oku = extract_roads(osm_oku, oku_dissolved, "OKU")
+    # Regional PBF (cut by extract_regional_pbfs before the workers start)
+    region_pbf = OUTPUT_DIR / f'{region.key}.osm.pbf'
+    if not region_pbf.exists():
+        print(f"Error: regional PBF not found: {region_pbf}")
+        return None
 
-    # Step 6: Save, visualize, and summarize
-    save_data(biz_tangsel, biz_oku, buildings_tangsel, buildings_oku, roads_tangsel, roads_oku)
-    create_visualization(biz_tangsel, biz_oku, tangsel_dissolved, oku_dissolved)
-    print_summary(pois_tangsel, pois_oku, biz_tangsel, biz_oku,
-                  buildings_tangsel, buildings_oku, roads_tangsel, roads_oku)
+    # All data layers from one pass over the PBF
+    pois_raw, buildings_raw, roads_raw = read_osm_layers(region_pbf)
+
+    pois = extract_pois(pois_raw, dissolved, region.short_name)
+    biz = extract_business_data(pois, region.name)
+    buildings = extract_buildings(buildings_raw, dissolved, region.short_name)
+    roads = extract_roads(roads_raw, dissolved, region.short_name)
+
+    building_store = build_building_store(buildings, admin_index=region_admin_index(region))
+
+    save_data(region, biz, buildings, roads, building_store)
+
+    stats = {
+        'pois': len(pois),
+        'business_pois': len(biz),
+        'buildings': len(buildings),
+        'building_area_km2': buildings['area_m2'].sum() / 1e6,
+        'roads': len(roads),
+        'road_km': roads['length_m'].sum() / 1000 if len(roads) > 0 else 0.0,
+    }
+    return {'stats': stats, 'business': biz, 'boundary': dissolved}
+
+
+def main(region_keys=None):
+    """Main execution pipeline"""
+
+    # Step 1: Download Indonesia PBF
+    if not download_indonesia_pbf():
+        print("Failed to obtain Indonesia PBF file. Exiting.")
+        return
+
+    # Step 2: all regional extracts from one read of the Indonesia PBF
+    regions = get_regions(region_keys)
+    if not extract_regional_pbfs(regions):
+        print("Failed to extract regional PBFs. Exiting.")
+        return
+
+    # Steps 3-5: one worker process per region
+    results = run_regions(process_region, regions, indonesia_pbf=str(INDONESIA_PBF))
+
+    failed = [region.name for region in regions if results[region.key] is None]
+    if failed:
+        print(f"✗ Regional extraction failed: {', '.join(failed)}")
+        return
+
+    # Step 6: Visualize and summarize
+    results = [(region, results[region.key]) for region in regions]
+    create_visualization(results)
+    print_summary(results)
 
 
 if __name__ == "__main__":
-    main()
+    args = sys.argv[1:]
+    if '--update' in args:
+        update([a for a in args if a != '--update'] or None)
+    else:
+        main(args or None)
@@ -7,6 +7,13 @@ Assign Metadata to All Rasters
 import rasterio
 import numpy as np
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.regions import get_regions
+
+NIGHTLIGHT_YEARS = (2020, 2025)
 
 # ============================================================
 # NIGHT LIGHTS METADATA
@@ -174,10 +181,9 @@ def main():
 
     nightlights_dir = 'data/nightlights'
     nightlights_files = [
-        ('tangsel_nightlights_2020.tif', 2020, 'Tangerang Selatan'),
-        ('tangsel_nightlights_2025.tif', 2025, 'Tangerang Selatan'),
-        ('oku_nightlights_2020.tif', 2020, 'Ogan Komering Ulu'),
-        ('oku_nightlights_2025.tif', 2025, 'Ogan Komering Ulu'),
+        (f'{region.key}_nightlights_{year}.tif', year, region.name)
+        for region in get_regions()
+        for year in NIGHTLIGHT_YEARS
     ]
 
     for filename, year, region in nightlights_files:
@@ -215,8 +221,8 @@ def main():
     print("METADATA ASSIGNMENT COMPLETE")
     print("=" * 70)
     print()
-    print("Night Lights: 4 files")
-    print("BNPB Hazards: 6 files")
+    print(f"Night Lights: {len(nightlights_files)} files")
+    print(f"BNPB Hazards: {len(hazard_files)} files")
     print()
     print("Use 'gdalinfo' or rasterio to view metadata:")
     print("  gdalinfo data/nightlights/tangsel_nightlights_2025.tif")
@@ -106,22 +106,23 @@ def assign_lulc_metadata(input_tif, output_tif=None):
         print(f"CRS: {src.crs}")
         print(f"Bounds: {src.bounds}")
 
-if __name__ == '__main__':
-    import sys
-
-    # Process Tangsel
+def process_region(region):
+    """Assign LULC metadata for one registry region"""
     print("=" * 60)
-    print("Processing LULC Tangsel 2025")
+    print(f"Processing LULC {region.short_name} 2025")
     print("=" * 60)
-    assign_lulc_metadata('data/satellite/lulc_tangsel_2025.tif')
+    assign_lulc_metadata(f'data/satellite/lulc_{region.key}_2025.tif')
 
-    print("\n")
 
-    # Process OKU
-    print("=" * 60)
-    print("Processing LULC OKU 2025")
-    print("=" * 60)
-    assign_lulc_metadata('data/satellite/lulc_oku_2025.tif')
+if __name__ == '__main__':
+    import sys
+    from pathlib import Path
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from common.regions import get_regions, run_regions
+
+    # One process per region (python lulc_metadata.py [region ...])
+    run_regions(process_region, get_regions(sys.argv[1:] or None))
 
     print("\n" + "=" * 60)
     print("METADATA ASSIGNMENT COMPLETE")
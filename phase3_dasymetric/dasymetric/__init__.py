@@ -0,0 +1,51 @@
+"""
+Dasymetric - reusable building blocks for Phase 3
+
+Importable counterpart of `dasymetric_mapping.ipynb`.
+"""
+
+import sys
+from pathlib import Path
+
+# Shared helpers (common/) live at the project root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from .grid import grid_coordinates, build_grid, create_geosquare_grid
+from .buildings import apportion_buildings, building_area_per_cell, calc_building_area_per_grid
+from .admin import AdminIndex, build_admin_index, assign_grid_to_admin
+from .weighted import (ANCILLARY_COLUMNS, weighted_dasymetric, reallocate, unit_sums,
+                       scheme_grid, evaluate_schemes)
+from .incremental import (load_population, save_snapshot, population_changes, patch_estimates,
+                          stale_outputs, update_region)
+from .uncertainty import simulate, simulate_population
+from .pycnophylactic import smooth, pycnophylactic_population
+
+__all__ = [
+    'grid_coordinates',
+    'build_grid',
+    'create_geosquare_grid',
+    'apportion_buildings',
+    'building_area_per_cell',
+    'calc_building_area_per_grid',
+    'AdminIndex',
+    'build_admin_index',
+    'assign_grid_to_admin',
+    'ANCILLARY_COLUMNS',
+    'weighted_dasymetric',
+    'reallocate',
+    'unit_sums',
+    'scheme_grid',
+    'evaluate_schemes',
+    'load_population',
+    'save_snapshot',
+    'population_changes',
+    'patch_estimates',
+    'stale_outputs',
+    'update_region',
+    'simulate',
+    'simulate_population',
+    'smooth',
+    'pycnophylactic_population',
+]
@@ -0,0 +1,91 @@
+"""
+Bulk Geosquare Grid Construction
+
+Turns the grid IDs returned by `polyfill` into a GeoDataFrame in one pass
+instead of calling `gid_to_geometry` / `gid_to_lonlat` per cell:
+1. decode all IDs to lattice column/row arrays (common/lattice.py)
+2. corner and center coordinates by array arithmetic
+3. every cell polygon from one `shapely.box` call
+"""
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from common import lattice
+
+UTM_CRS = 'EPSG:32748'  # UTM Zone 48S (area calculations)
+
+# polyfill `size` in meters -> Geosquare level
+SIZE_TO_LEVEL = {50: 12}
+
+
+def grid_coordinates(grid_ids):
+    """
+    Corner and center coordinates of an array of grid IDs.
+
+    Returns:
+    - dict of float64 arrays: minx, miny, maxx, maxy, center_lon, center_lat
+    """
+    ix, iy, level = lattice.gid_to_index(np.asarray(grid_ids))
+    minx, miny, maxx, maxy = lattice.index_to_bounds(ix, iy, level)
+    return {
+        'minx': minx, 'miny': miny, 'maxx': maxx, 'maxy': maxy,
+        'center_lon': (minx + maxx) / 2,
+        'center_lat': (miny + maxy) / 2,
+    }
+
+
+def build_grid(grid_ids, crs=None):
+    """
+    GeoDataFrame of Geosquare cells from an array of grid IDs.
+
+    Parameters:
+    - grid_ids: array-like of grid IDs (one level)
+    - crs: optional CRS to project to (cells are built in EPSG:4326)
+
+    Returns:
+    - GeoDataFrame with grid_id, latitude/longitude (cell corner, as
+      `gid_to_lonlat`), center_lat/center_lon and polygon geometry
+    """
+    grid_ids = np.asarray(grid_ids, dtype=object)
+    coords = grid_coordinates(grid_ids)
+
+    grid = gpd.GeoDataFrame(
+        {
+            'grid_id': grid_ids,
+            'latitude': coords['miny'],
+            'longitude': coords['minx'],
+            'center_lat': coords['center_lat'],
+            'center_lon': coords['center_lon'],
+        },
+        geometry=shapely.box(coords['minx'], coords['miny'], coords['maxx'], coords['maxy']),
+        crs='EPSG:4326'
+    )
+    return grid.to_crs(crs) if crs is not None else grid
+
+
+def create_geosquare_grid(gdf, size=50, crs=UTM_CRS, verbose=True):
+    """
+    Geosquare grid covering `gdf` (polyfill + bulk construction).
+
+    size=50 corresponds to Level 12 (50m x 50m cells). Returns the grid in
+    `crs` (UTM by default, for area calculations).
+    """
+    import geosquare_grid as gs
+
+    if verbose:
+        print(f"Creating Geosquare Grid (size={size}m, Level {SIZE_TO_LEVEL.get(size, '?')})...")
+
+    grid_engine = gs.GeosquareGrid()
+    boundary = gdf.to_crs('EPSG:4326').union_all()
+
+    # Generate Geosquare grid IDs
+    grid_ids = grid_engine.polyfill(boundary, size=size, fullcover=True)
+    if verbose:
+        print(f"✓ Generated {len(grid_ids):,} Geosquare grid cells")
+
+    grid = build_grid(grid_ids, crs=crs)
+    if verbose:
+        print(f"✓ Grid GeoDataFrame created: {len(grid):,} cells")
+    return grid
@@ -0,0 +1,270 @@
+"""
+Incremental Dasymetric Update
+
+When Disdukcapil republishes counts for a few admin units, only those
+units' cells change, so the stored outputs are patched instead of re-running
+the notebook:
+1. diff the new population table against the snapshot saved with the last
+   run (`pop_input_<region>.csv`; without one, the per-unit sums of the
+   stored estimates stand in)
+2. within a changed unit every cell keeps its share of the unit, so
+   new estimate = new total × stored estimate / stored unit sum (units that
+   had nothing allocated fall back to building-area shares)
+3. `estimated_pop` / `pop_density_km2` are rewritten for those rows only in
+   the CSV and sparse Parquet outputs (other columns, row order and the
+   sparse extent metadata are kept); GeoJSON is optional since it is
+   rewritten as a whole
+4. outputs derived from the estimates that cannot be patched row by row
+   are not left behind silently: the smoothed surface, the uncertainty
+   ranges and an unpatched GeoJSON are removed (re-run the notebook to
+   regenerate them), Phase 4 integrated grids and pyramids are reported as
+   out of date
+
+Run from `phase3_dasymetric/`:
+    python -m dasymetric.incremental tangsel
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.regions import REGIONS, get_regions
+
+from . import PROJECT_ROOT
+from .weighted import GRID_AREA_KM2
+
+OUTPUT_DIR = Path(__file__).resolve().parents[1] / 'outputs'
+SNAPSHOT_NAME = 'pop_input_{key}.csv'
+PHASE4_OUTPUT_DIR = PROJECT_ROOT / 'phase4_grid_integration' / 'outputs'
+
+# Phase 3 outputs computed from whole-unit estimates (smoothing across unit
+# borders, simulations): a patch cannot update them, so they are removed
+DERIVED_OUTPUTS = ['pop_smooth_{key}.csv', 'pop_uncertainty_{key}.csv']
+
+# Phase 4 outputs carrying the estimates (notebook and per-region script runs)
+PHASE4_OUTPUTS = ['grid_{key}_integrated.*', 'pyramid_{key}',
+                  '{key}/grid_{key}_integrated.*', '{key}/pyramid_{key}']
+
+
+def load_population(region):
+    """Census table of a region as [admin_level, 'population'] (names upper-cased)"""
+    region = REGIONS[region] if isinstance(region, str) else region
+    pop = pd.read_csv(region.population_path, usecols=list(region.population_columns))
+    pop = pop.rename(columns=region.population_columns)[[region.admin_level, 'population']]
+    pop[region.admin_level] = pop[region.admin_level].str.upper().str.strip()
+    return pop
+
+
+def save_snapshot(population, region, output_dir=OUTPUT_DIR):
+    """Store the population table a run was made with"""
+    region = REGIONS[region] if isinstance(region, str) else region
+    path = Path(output_dir) / SNAPSHOT_NAME.format(key=region.key)
+    population.to_csv(path, index=False)
+    return path
+
+
+def unit_totals(population, admin_col, pop_col='population'):
+    """Series of population per unit name"""
+    return population.groupby(admin_col)[pop_col].sum()
+
+
+def population_changes(previous, current, admin_col, tolerance=0.5):
+    """
+    Units whose count differs between two population tables.
+
+    Parameters:
+    - previous, current: tables with `admin_col` and `population`
+      (or Series of totals indexed by unit name)
+
+    Returns:
+    - DataFrame indexed by unit name with `previous` and `current` totals
+      (missing units count as 0)
+    """
+    if isinstance(previous, pd.DataFrame):
+        previous = unit_totals(previous, admin_col)
+    if isinstance(current, pd.DataFrame):
+        current = unit_totals(current, admin_col)
+
+    both = pd.concat({'previous': previous, 'current': current}, axis=1).fillna(0)
+    changed = (both['current'] - both['previous']).abs() > tolerance
+    return both[changed]
+
+
+def patch_estimates(frame, changes, admin_col, weight_col='building_area_m2'):
+    """
+    Recompute `estimated_pop` and `pop_density_km2` of changed units in place.
+
+    Parameters:
+    - frame: stored output rows (all rows of each changed unit present)
+    - changes: output of `population_changes`
+
+    Returns:
+    - boolean mask of the patched rows
+    """
+    units = frame[admin_col].to_numpy()
+    rows = np.flatnonzero(pd.Index(changes.index).get_indexer(units) >= 0)
+    if len(rows) == 0:
+        return np.zeros(len(frame), dtype=bool)
+
+    codes, names = pd.factorize(units[rows])
+    estimates = frame['estimated_pop'].to_numpy(dtype='float64', na_value=0)[rows]
+    weights = frame[weight_col].to_numpy(dtype='float64', na_value=0)[rows] if weight_col in frame else estimates
+
+    # Keep each cell's share of its unit; fall back to the ancillary weight
+    stored = np.bincount(codes, weights=estimates, minlength=len(names))
+    fallback = np.bincount(codes, weights=weights, minlength=len(names))
+    basis = np.where(stored[codes] > 0, estimates, weights)
+    totals = np.where(stored > 0, stored, fallback)[codes]
+
+    new_totals = changes['current'].reindex(names).to_numpy(dtype='float64')[codes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        patched = np.where(totals > 0, new_totals * basis / totals, 0.0)
+
+    pop = frame['estimated_pop'].to_numpy(dtype='float64', copy=True)
+    pop[rows] = patched
+    frame['estimated_pop'] = pop
+    if 'pop_density_km2' in frame:
+        frame['pop_density_km2'] = pop / GRID_AREA_KM2
+
+    mask = np.zeros(len(frame), dtype=bool)
+    mask[rows] = True
+    return mask
+
+
+def _patch_parquet(path, changes, admin_col):
+    """Patch a (sparse) Parquet output, keeping schema metadata"""
+    table = pq.read_table(path)
+    frame = table.select([c for c in (admin_col, 'building_area_m2', 'estimated_pop', 'pop_density_km2')
+                          if c in table.column_names]).to_pandas()
+    mask = patch_estimates(frame, changes, admin_col)
+    if mask.any():
+        for column in ('estimated_pop', 'pop_density_km2'):
+            if column in table.column_names:
+                i = table.column_names.index(column)
+                table = table.set_column(i, table.field(i), pa.array(frame[column].to_numpy(), table.field(i).type))
+        tmp = path.with_name(path.name + '.tmp')
+        pq.write_table(table, tmp)
+        tmp.replace(path)
+    return int(mask.sum())
+
+
+def _patch_csv(path, changes, admin_col):
+    frame = pd.read_csv(path)
+    mask = patch_estimates(frame, changes, admin_col)
+    if mask.any():
+        tmp = path.with_name(path.name + '.tmp')
+        frame.to_csv(tmp, index=False)
+        tmp.replace(path)
+    return int(mask.sum())
+
+
+def _patch_geojson(path, changes, admin_col):
+    import geopandas as gpd
+
+    frame = gpd.read_file(path)
+    mask = patch_estimates(frame, changes, admin_col)
+    if mask.any():
+        tmp = path.with_name(path.stem + '.tmp.geojson')
+        frame.to_file(tmp, driver='GeoJSON')
+        tmp.replace(path)
+    return int(mask.sum())
+
+
+def stale_outputs(region, output_dir=OUTPUT_DIR, geojson=False, phase4_dir=PHASE4_OUTPUT_DIR):
+    """
+    Existing outputs that `update_region` does not patch.
+
+    Returns:
+    - (removable, phase4): Phase 3 files to remove and Phase 4 outputs to
+      report, as lists of Paths
+    """
+    region = REGIONS[region] if isinstance(region, str) else region
+    output_dir = Path(output_dir)
+    removable = [output_dir / name.format(key=region.key) for name in DERIVED_OUTPUTS]
+    if not geojson:
+        removable.append(output_dir / f'pop_grid_{region.key}.geojson')
+    phase4 = sorted(path for pattern in PHASE4_OUTPUTS
+                    for path in Path(phase4_dir).glob(pattern.format(key=region.key)))
+    return [path for path in removable if path.exists()], phase4
+
+
+def update_region(region, population=None, output_dir=OUTPUT_DIR, geojson=False,
+                  phase4_dir=PHASE4_OUTPUT_DIR, verbose=True):
+    """
+    Patch a region's stored dasymetric outputs for a new population table.
+
+    Parameters:
+    - region: key or Region
+    - population: new census table (default: re-read the region's file)
+    - output_dir: directory with pop_grid_<region>.* outputs
+    - geojson: also rewrite the GeoJSON output (slow for large regions;
+      otherwise it is removed)
+    - phase4_dir: Phase 4 outputs to check for integrated grids built on
+      the old estimates
+
+    Smoothed and uncertainty outputs are removed, since they cannot be
+    patched; Phase 4 outputs are listed as out of date.
+
+    Returns:
+    - DataFrame of the changed units (previous/current totals)
+    """
+    region = REGIONS[region] if isinstance(region, str) else region
+    admin_col = region.admin_level
+    output_dir = Path(output_dir)
+    population = load_population(region) if population is None else population
+    start = time.time()
+
+    snapshot = output_dir / SNAPSHOT_NAME.format(key=region.key)
+    csv_path = output_dir / f'pop_grid_{region.key}.csv'
+    if not csv_path.exists():
+        raise FileNotFoundError(f"{csv_path} not found; run dasymetric_mapping.ipynb first")
+
+    if snapshot.exists():
+        previous = pd.read_csv(snapshot)
+    else:
+        # No snapshot: what the stored estimates add up to per unit
+        stored = pd.read_csv(csv_path, usecols=[admin_col, 'estimated_pop'])
+        previous = stored.rename(columns={'estimated_pop': 'population'})
+
+    changes = population_changes(previous, population, admin_col)
+    if verbose:
+        print(f"{region.name}: {len(changes)} {admin_col} changed")
+    if changes.empty:
+        return changes
+
+    patchers = [(csv_path, _patch_csv), (output_dir / f'pop_grid_{region.key}.sparse.parquet', _patch_parquet)]
+    if geojson:
+        patchers.append((output_dir / f'pop_grid_{region.key}.geojson', _patch_geojson))
+
+    for path, patch in patchers:
+        if path.exists():
+            n_rows = patch(path, changes, admin_col)
+            if verbose:
+                print(f"  ✓ {path.name}: {n_rows:,} grids patched")
+
+    removable, phase4 = stale_outputs(region, output_dir, geojson, phase4_dir)
+    for path in removable:
+        path.unlink()
+        print(f"  ⚠ {path.name}: out of date, removed (re-run dasymetric_mapping.ipynb to regenerate)")
+    for path in phase4:
+        print(f"  ⚠ {path.relative_to(phase4_dir)}: out of date "
+              f"(re-run: python -m grid_integration --region {region.key})")
+
+    save_snapshot(population, region, output_dir)
+    if verbose:
+        print(f"✓ Updated in {time.time() - start:.1f}s")
+    return changes
+
+
+def main(region_keys=None):
+    for region in get_regions(region_keys):
+        update_region(region)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
@@ -3,6 +3,10 @@ Export Integrated Grids to Multiple Formats
 - CSV (for analysis in pandas/Excel)
 - GeoJSON (standard spatial format)
 - GeoParquet (efficient spatial format)
+
+No sparse Parquet here: hazard, night light, LULC and RTRW values are set
+for nearly every cell, so dropping "empty" cells would lose them (sparse
+storage is for the Phase 3 population grid, see common/sparse.py).
 """
 
 import geopandas as gpd
@@ -0,0 +1,61 @@
+"""
+Grid Integration - reusable building blocks for Phase 4
+
+Importable counterpart of `grid_data_integration.ipynb`.
+"""
+
+import sys
+from pathlib import Path
+
+# Shared helpers (common/) live at the project root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from .sampling import sample_raster_at_points
+from .stack import RasterStack, sample_layer_stack
+from .lulc_zonal import LULC_CLASSES, lulc_fractions
+from .layers import (
+    GridLayer, LulcLayer, NightLightLayer, HazardLayer,
+    RtrwLayer, PoiLayer, RoadLayer,
+)
+from .poi import poi_counts
+from .roads import road_pieces, road_lengths
+from .tiling import integrate_tiled, spatial_chunks, rows_for_memory
+from .cache import LayerCache, integrate_cached
+from .pyramid import (
+    PYRAMID_LEVELS, build_pyramid, build_pyramid_parquet, write_pyramid, read_pyramid_level,
+)
+from .pipeline import integrate_parallel, region_layers, run_region, run_all
+
+__all__ = [
+    'sample_raster_at_points',
+    'RasterStack',
+    'sample_layer_stack',
+    'LULC_CLASSES',
+    'lulc_fractions',
+    'GridLayer',
+    'LulcLayer',
+    'NightLightLayer',
+    'HazardLayer',
+    'RtrwLayer',
+    'PoiLayer',
+    'RoadLayer',
+    'poi_counts',
+    'road_pieces',
+    'road_lengths',
+    'integrate_tiled',
+    'spatial_chunks',
+    'rows_for_memory',
+    'LayerCache',
+    'integrate_cached',
+    'PYRAMID_LEVELS',
+    'build_pyramid',
+    'build_pyramid_parquet',
+    'write_pyramid',
+    'read_pyramid_level',
+    'integrate_parallel',
+    'region_layers',
+    'run_region',
+    'run_all',
+]
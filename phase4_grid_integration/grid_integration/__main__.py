@@ -0,0 +1,68 @@
+"""
+CLI entry point
+
+    cd phase4_grid_integration
+    python -m grid_integration --region tangsel --region oku --workers 16
+    python -m grid_integration --region oku --tiled --memory-mb 1024
+    python -m grid_integration --format parquet --pyramid 11 10 9
+"""
+
+import argparse
+
+from common.regions import REGIONS
+
+from .pipeline import run_all
+from .tiling import DEFAULT_MEMORY_MB
+from .pyramid import PYRAMID_LEVELS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m grid_integration',
+        description='Integrate all data layers onto the Geosquare grid (Phase 4)'
+    )
+    parser.add_argument('--region', action='append', choices=sorted(REGIONS),
+                        help='Region to integrate (repeatable, default: all)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Total process budget, split across regions (default: all cores, 1 = no pool)')
+    parser.add_argument('--lulc-mode', choices=['zonal', 'centroid'], default='zonal',
+                        help='LULC class fractions per cell or centroid pixel')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse cached layer blocks from outputs/layer_cache/')
+    parser.add_argument('--tiled', action='store_true',
+                        help='Stream tiles to GeoParquet with bounded memory (sequential)')
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_MB,
+                        help='Approximate memory budget per tile of joined data for --tiled')
+    parser.add_argument('--format', dest='output_format', choices=['csv', 'parquet'], default='csv',
+                        help='Output format for the non-tiled run')
+    parser.add_argument('--pyramid', dest='pyramid_levels', type=int, nargs='*', metavar='LEVEL',
+                        help=f'Also write coarser Geosquare levels (default with no value: {PYRAMID_LEVELS})')
+    args = parser.parse_args(argv)
+    if args.pyramid_levels == []:
+        args.pyramid_levels = list(PYRAMID_LEVELS)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("Phase 4: Grid Data Integration")
+    print("=" * 70)
+
+    outputs = run_all(
+        args.region,
+        workers=args.workers,
+        lulc_mode=args.lulc_mode,
+        cache=args.cache,
+        tiled=args.tiled,
+        memory_mb=args.memory_mb,
+        output_format=args.output_format,
+        pyramid_levels=args.pyramid_levels,
+    )
+    for key, path in outputs.items():
+        print(f"✓ {key}: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Content-Addressed Layer Cache
+
+Stores each layer's column block on disk, keyed by a hash of:
+- the grid IDs the block was computed for
+- the layer's source file(s) (path + size + mtime, or full content hash)
+- the layer's sampling parameters (class, mode, column names, ...)
+
+An unchanged layer loads from `<cache_dir>/<layer>-<key>.parquet`; a layer
+whose inputs changed (e.g. a new RTRW GeoJSON) gets a new key and is
+recomputed. Old entries are left in place and can be removed with `prune`.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Above this size, sources are fingerprinted by size + mtime instead of
+# hashing the full content (national hazard rasters are hundreds of MB)
+FULL_HASH_MAX_BYTES = 64 * 1024 * 1024
+
+
+def hash_grid_ids(grid_ids):
+    """Stable digest of the ordered grid IDs"""
+    h = hashlib.sha256()
+    ids = np.asarray(grid_ids, dtype=str)
+    h.update(str(len(ids)).encode())
+    h.update('\n'.join(ids.tolist()).encode())
+    return h.hexdigest()
+
+
+def fingerprint_file(path, full_hash_max_bytes=FULL_HASH_MAX_BYTES):
+    """Content hash for small files, size + mtime for large ones"""
+    path = Path(path)
+    if not path.exists():
+        return {'path': str(path), 'missing': True}
+
+    stat = path.stat()
+    if stat.st_size <= full_hash_max_bytes:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        return {'name': path.name, 'sha256': h.hexdigest()}
+
+    return {'name': path.name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _jsonable(value):
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def cache_key(grid_digest, sources, params):
+    """Combine grid digest, source fingerprints and parameters into one key"""
+    payload = {
+        'grid': grid_digest,
+        'sources': [fingerprint_file(p) for p in sources],
+        'params': _jsonable(params),
+    }
+    blob = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()[:24]
+
+
+class LayerCache:
+    """
+    On-disk cache of layer column blocks.
+
+    Layers describe themselves through `sources()` (files read) and
+    `params()` (anything else that changes the output); see layers.py.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def entry_path(self, layer, grid_digest):
+        key = cache_key(grid_digest, layer.sources(), layer.params())
+        return self.cache_dir / f"{layer.name}-{key}.parquet"
+
+    def load(self, layer, grid_digest, index):
+        """Cached block for `layer`, or None on a miss"""
+        path = self.entry_path(layer, grid_digest)
+        if not path.exists():
+            return None
+        block = pd.read_parquet(path)
+        block.index = index
+        return block
+
+    def store(self, layer, grid_digest, block):
+        path = self.entry_path(layer, grid_digest)
+        tmp = path.with_suffix('.tmp')
+        block.reset_index(drop=True).to_parquet(tmp, index=False)
+        tmp.replace(path)
+        return path
+
+    def compute(self, layer, cells, grid_digest=None, verbose=True):
+        """
+        Load `layer`'s block for `cells` from cache, or compute and store it
+        """
+        grid_digest = grid_digest or hash_grid_ids(cells['grid_id'].values)
+        block = self.load(layer, grid_digest, cells.index)
+        if block is not None:
+            if verbose:
+                print(f"  ✓ {layer.name}: cached")
+            return block
+
+        if verbose:
+            print(f"  … {layer.name}: computing")
+        with layer:
+            block = layer.compute(cells)
+        self.store(layer, grid_digest, block)
+        return block
+
+    def prune(self, keep):
+        """Delete entries whose file name is not in `keep` (set of Paths)"""
+        keep = {Path(p).name for p in keep}
+        removed = 0
+        for path in self.cache_dir.glob('*.parquet'):
+            if path.name not in keep:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+def integrate_cached(grid, layers, cache_dir, verbose=True):
+    """
+    Attach every layer's columns to `grid`, reusing cached blocks.
+
+    Returns a new DataFrame (grid columns + all layer columns).
+    """
+    cache = LayerCache(cache_dir)
+    grid_digest = hash_grid_ids(grid['grid_id'].values)
+    blocks = [cache.compute(layer, grid, grid_digest, verbose=verbose) for layer in layers]
+    return pd.concat([grid] + blocks, axis=1)
@@ -0,0 +1,249 @@
+"""
+Integration Layers
+
+Each data layer of the integration notebook as a small object that turns a
+chunk of grid cells into a block of new columns:
+
+    with HazardLayer(HAZARD_LAYERS) as layer:
+        block = layer.compute(cells)    # cells: grid_id, lon, lat
+
+`open()` loads the source once (rasters, GeoJSON); `compute()` can then be
+called for the whole grid or tile by tile. Blocks are indexed like `cells`.
+
+`chunk_local` layers (rasters) only read the windows a chunk covers, so the
+parallel pipeline splits them into spatial chunks; the others load their
+whole source in `open()` and run as one task per layer.
+"""
+
+import geopandas as gpd
+import pandas as pd
+
+from common.zoning import load_zone_index
+
+from .sampling import sample_raster_at_points
+from .stack import RasterStack
+from .lulc_zonal import LULC_CLASSES, lulc_fractions
+from .poi import poi_counts
+from .roads import road_pieces, road_lengths
+
+LULC_MAPPING = {0: 'No Data', **LULC_CLASSES}
+
+
+class GridLayer:
+    """
+    Base class: a named data source that yields columns for grid cells
+    """
+
+    name = None
+    # open() is cheap and compute() reads only the chunk's part of the source
+    chunk_local = False
+
+    def open(self):
+        return self
+
+    def close(self):
+        pass
+
+    def sources(self):
+        """Files the layer reads (cache invalidation)"""
+        return []
+
+    def params(self):
+        """Everything besides sources that changes the output (cache key)"""
+        return {'layer': type(self).__name__}
+
+    def compute(self, cells):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class LulcLayer(GridLayer):
+    """
+    LULC class per cell: centroid pixel, or zonal class fractions + majority
+    """
+
+    name = 'lulc'
+    chunk_local = True
+
+    def __init__(self, raster_path, mode='zonal'):
+        self.raster_path = str(raster_path)
+        self.mode = mode
+
+    def sources(self):
+        return [self.raster_path]
+
+    def params(self):
+        return {**super().params(), 'mode': self.mode, 'classes': LULC_MAPPING}
+
+    def compute(self, cells):
+        if self.mode == 'zonal':
+            block = lulc_fractions(self.raster_path, cells['grid_id'], index=cells.index)
+            block.insert(0, 'lulc_class', block['lulc_majority'])
+        else:
+            values = sample_raster_at_points(self.raster_path, cells['lon'], cells['lat'], fill_value=0)
+            block = pd.DataFrame({'lulc_class': values.astype('int64')}, index=cells.index)
+        block.insert(1, 'lulc_name', block['lulc_class'].map(LULC_MAPPING))
+        return block
+
+
+class RasterStackLayer(GridLayer):
+    """
+    Several rasters sampled together (see stack.RasterStack)
+    """
+
+    chunk_local = True
+
+    def __init__(self, layers, name=None):
+        self.layers = dict(layers)
+        self.name = name or self.name
+        self.stack = None
+
+    def open(self):
+        if self.stack is None:
+            self.stack = RasterStack(self.layers)
+        return self
+
+    def close(self):
+        if self.stack is not None:
+            self.stack.close()
+            self.stack = None
+
+    def sources(self):
+        return list(self.layers.values())
+
+    def params(self):
+        return {**super().params(), 'columns': list(self.layers)}
+
+    def derive(self, block):
+        """Hook for derived columns (change, composite, ...)"""
+        return block
+
+    def compute(self, cells):
+        self.open()
+        block = self.stack.sample(cells['lon'], cells['lat'], index=cells.index)
+        return self.derive(block)
+
+
+class NightLightLayer(RasterStackLayer):
+    """VIIRS 2020 vs 2025 plus change"""
+
+    name = 'nightlights'
+
+    def __init__(self, path_2020, path_2025):
+        super().__init__({'nightlight_2020': path_2020, 'nightlight_2025': path_2025})
+
+    def derive(self, block):
+        block['nightlight_change'] = block['nightlight_2025'] - block['nightlight_2020']
+        return block
+
+
+class HazardLayer(RasterStackLayer):
+    """BNPB InaRISK hazards plus composite (mean of all hazards)"""
+
+    name = 'hazards'
+
+    def derive(self, block):
+        block['hazard_composite'] = block[list(self.layers)].mean(axis=1)
+        return block
+
+
+class RtrwLayer(GridLayer):
+    """
+    RTRW zone of each cell, looked up in the rasterized zoning index
+    (common/zoning.py; built once per GeoJSON and cached next to it)
+    """
+
+    name = 'rtrw'
+
+    def __init__(self, geojson_path, rules=None, cache_dir=None):
+        self.geojson_path = geojson_path
+        self.rules = rules
+        self.cache_dir = cache_dir
+        self.index = None
+
+    def sources(self):
+        return [self.geojson_path]
+
+    def params(self):
+        return {**super().params(), 'method': 'zone_index', 'rules': self.rules}
+
+    def open(self):
+        if self.index is None:
+            self.index = load_zone_index(self.geojson_path, rules=self.rules,
+                                         cache_dir=self.cache_dir, verbose=False)
+        return self
+
+    def close(self):
+        self.index = None
+
+    def compute(self, cells):
+        self.open()
+        zones = self.index.zones(cells['grid_id'].values, index=cells.index)
+        block = pd.DataFrame({
+            'rtrw_zone': zones['rtrpkk'],
+            'rtrw_name': zones['namobj'],
+        }, index=cells.index)
+        if self.rules is not None:
+            block['rtrw_category'] = zones['zone_category']
+        return block
+
+
+class PoiLayer(GridLayer):
+    """POI count per cell (+ per category group), by grid ID arithmetic"""
+
+    name = 'poi'
+
+    def __init__(self, geojson_path, by_category=True):
+        self.geojson_path = geojson_path
+        self.by_category = by_category
+        self.pois = None
+
+    def sources(self):
+        return [self.geojson_path]
+
+    def params(self):
+        return {**super().params(), 'method': 'cell_id', 'by_category': self.by_category}
+
+    def open(self):
+        if self.pois is None:
+            self.pois = gpd.read_file(self.geojson_path)
+        return self
+
+    def compute(self, cells):
+        self.open()
+        return poi_counts(cells['grid_id'].values, self.pois,
+                          by_category=self.by_category, index=cells.index)
+
+
+class RoadLayer(GridLayer):
+    """Exact road length per cell (lines split on the lattice)"""
+
+    name = 'roads'
+
+    def __init__(self, geojson_path, by_class=False):
+        self.geojson_path = geojson_path
+        self.by_class = by_class
+        self.pieces = None
+
+    def sources(self):
+        return [self.geojson_path]
+
+    def params(self):
+        return {**super().params(), 'method': 'lattice_split', 'by_class': self.by_class}
+
+    def open(self):
+        if self.pieces is None:
+            # Split once; compute() then only looks up cells
+            self.pieces = road_pieces(gpd.read_file(self.geojson_path))
+        return self
+
+    def compute(self, cells):
+        self.open()
+        return road_lengths(cells['grid_id'].values, self.pieces,
+                            by_class=self.by_class, index=cells.index)
@@ -0,0 +1,161 @@
+"""
+LULC Class Fractions per Grid Cell (zonal mode)
+
+Instead of the single 10m pixel under each 50m cell centroid, counts every
+LULC pixel whose center falls inside the cell:
+- the raster is read in row strips restricted to the grid's bounding box
+- pixel centers are mapped to level-12 lattice (ix, iy) arithmetically
+- per-class pixel counts are accumulated with `np.bincount`
+- output: `lulc_frac_<class>` columns plus the majority class
+
+Memory is bounded by one strip of pixels plus an (n_cells x n_classes)
+count table, so the full `lulc_oku_2025.tif` streams through.
+"""
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.warp import transform as warp_transform
+from rasterio.windows import Window
+
+from common import lattice
+
+# ESA WorldCover-style codes used by the GEE export (0 = No Data)
+LULC_CLASSES = {
+    1: 'Water',
+    2: 'Trees',
+    4: 'Flooded Vegetation',
+    5: 'Crops',
+    7: 'Built Area',
+    8: 'Bare Ground',
+    11: 'Rangeland',
+    12: 'Oil Palm'
+}
+
+
+def class_column(name):
+    """'Built Area' -> 'lulc_frac_built_area'"""
+    return 'lulc_frac_' + name.lower().replace(' ', '_')
+
+
+def _grid_lookup(grid_ids):
+    """
+    Sorted lattice keys of the grid plus the permutation back to input order
+    """
+    ix, iy, level = lattice.gid_to_index(grid_ids)
+    keys = lattice.index_key(ix, iy, level)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], order, ix, iy, level
+
+
+def _pixel_centers(src, window, row_start, n_rows):
+    """lon/lat of pixel centers for `n_rows` rows of `window`"""
+    cols = np.arange(window.width, dtype='float64') + window.col_off + 0.5
+    rows = np.arange(n_rows, dtype='float64') + row_start + 0.5
+    cc, rr = np.meshgrid(cols, rows)
+
+    t = src.transform
+    xs = t.a * cc + t.b * rr + t.c
+    ys = t.d * cc + t.e * rr + t.f
+
+    if src.crs is not None and src.crs.to_epsg() != 4326:
+        xs, ys = warp_transform(src.crs, 'EPSG:4326', xs.ravel(), ys.ravel())
+        return np.asarray(xs).reshape(cc.shape), np.asarray(ys).reshape(cc.shape)
+    return xs, ys
+
+
+def _grid_window(src, ix, iy, level):
+    """Raster window covering the grid bounding box (in raster CRS)"""
+    minx, miny, _, _ = lattice.index_to_bounds(ix.min(), iy.min(), level)
+    _, _, maxx, maxy = lattice.index_to_bounds(ix.max(), iy.max(), level)
+
+    if src.crs is not None and src.crs.to_epsg() != 4326:
+        xs, ys = warp_transform('EPSG:4326', src.crs, [minx, maxx, minx, maxx], [miny, miny, maxy, maxy])
+        minx, maxx, miny, maxy = min(xs), max(xs), min(ys), max(ys)
+
+    inv = ~src.transform
+    cols, rows = zip(*(inv * (x, y) for x in (minx, maxx) for y in (miny, maxy)))
+    col0, row0 = max(int(np.floor(min(cols))), 0), max(int(np.floor(min(rows))), 0)
+    col1, row1 = min(int(np.ceil(max(cols))), src.width), min(int(np.ceil(max(rows))), src.height)
+    return Window(col0, row0, max(col1 - col0, 0), max(row1 - row0, 0))
+
+
+def lulc_fractions(raster_path, grid_ids, classes=None, block_rows=256, index=None):
+    """
+    Per-cell LULC class fractions by streaming block reduction.
+
+    Parameters:
+    - raster_path: LULC GeoTIFF (class codes, 0 = No Data)
+    - grid_ids: array-like of Geosquare grid IDs (one level, e.g. level 12)
+    - classes: {code: name}; defaults to LULC_CLASSES
+    - block_rows: raster rows read per strip (bounds memory)
+    - index: optional index for the returned frame (e.g. `grid.index`)
+
+    Returns:
+    - DataFrame with `lulc_frac_<class>` (share of valid pixels, 0-1),
+      `lulc_majority` (class code, 0 if the cell has no valid pixel) and
+      `lulc_pixels` (valid pixel count), aligned with `grid_ids`
+    """
+    classes = LULC_CLASSES if classes is None else classes
+    codes = np.array(sorted(classes), dtype='int64')
+    n_classes = len(codes)
+
+    sorted_keys, order, ix, iy, level = _grid_lookup(grid_ids)
+    n_cells = len(sorted_keys)
+    counts = np.zeros(n_cells * n_classes, dtype='int32')
+
+    with rasterio.open(raster_path) as src:
+        # class code -> column in the count table, -1 = ignored (No Data / unknown)
+        lut = np.full(max(int(codes.max()), 255) + 1, -1, dtype='int64')
+        lut[codes] = np.arange(n_classes)
+
+        window = _grid_window(src, ix, iy, level)
+        row_end = int(window.row_off + window.height)
+
+        for row_start in range(int(window.row_off), row_end, block_rows):
+            n_rows = min(block_rows, row_end - row_start)
+            strip = Window(window.col_off, row_start, window.width, n_rows)
+            values = src.read(1, window=strip).astype('int64', copy=False)
+
+            valid = (values >= 0) & (values < len(lut))
+            if src.nodata is not None:
+                valid &= values != src.nodata
+            cls = np.full(values.shape, -1, dtype='int64')
+            cls[valid] = lut[values[valid]]
+            keep = cls >= 0
+            if not keep.any():
+                continue
+
+            lons, lats = _pixel_centers(src, window, row_start, n_rows)
+            pix, piy = lattice.lonlat_to_index(lons[keep], lats[keep], level)
+            pkeys = lattice.index_key(pix, piy, level)
+
+            pos = np.searchsorted(sorted_keys, pkeys)
+            pos = np.minimum(pos, n_cells - 1)
+            hit = sorted_keys[pos] == pkeys
+            if not hit.any():
+                continue
+
+            flat = pos[hit] * n_classes + cls[keep][hit]
+            lo, hi = flat.min(), flat.max() + 1
+            counts[lo:hi] += np.bincount(flat - lo, minlength=hi - lo).astype('int32')
+
+    counts = counts.reshape(n_cells, n_classes)
+
+    # Back to input order
+    result = np.empty_like(counts)
+    result[order] = counts
+    total = result.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fractions = np.where(total[:, None] > 0, result / total[:, None], 0.0)
+
+    majority = np.where(total > 0, codes[result.argmax(axis=1)], 0)
+
+    out = {
+        class_column(classes[code]): fractions[:, i].astype('float32')
+        for i, code in enumerate(codes)
+    }
+    out['lulc_majority'] = majority.astype('int64')
+    out['lulc_pixels'] = total.astype('int32')
+    return pd.DataFrame(out, index=index)
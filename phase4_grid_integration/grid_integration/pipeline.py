@@ -0,0 +1,267 @@
+"""
+Grid Integration Pipeline
+
+Script version of `grid_data_integration.ipynb`:
+1. load the dasymetric base grid (Phase 3 output)
+2. run every layer as an independent task (LULC, night lights, hazards,
+   RTRW, POI, roads); raster layers are split into spatial chunks, layers
+   that load a whole source (RTRW, POI, roads) run as one task each
+3. run the tasks in a process pool and merge the column blocks on grid_id
+   (with a cache, whole-grid blocks are reused and stored by the parent)
+4. export the integrated grid (optionally plus a pyramid of coarser levels)
+
+Regions come from the registry in common/regions.py; several regions run
+concurrently, one process each, writing to `outputs/<region>/`.
+
+Run from `phase4_grid_integration/`:
+    python -m grid_integration --region oku --workers 16
+"""
+
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from common.admin import region_admin_index
+from common.regions import REGIONS, get_regions, run_regions
+from common.sparse import read_sparse
+from common.zoning import ZONE_CATEGORY_RULES
+
+from . import PROJECT_ROOT
+from .cache import LayerCache, hash_grid_ids
+from .pyramid import build_pyramid, build_pyramid_parquet, write_pyramid
+from .layers import (
+    LulcLayer, NightLightLayer, HazardLayer, RtrwLayer, PoiLayer, RoadLayer,
+)
+from .tiling import spatial_chunks, integrate_tiled, DEFAULT_MEMORY_MB
+
+PHASE1_DIR = PROJECT_ROOT / 'phase1_data_hunt'
+PHASE2_DIR = PROJECT_ROOT / 'phase2_satellite'
+PHASE3_DIR = PROJECT_ROOT / 'phase3_dasymetric'
+OUTPUT_DIR = PROJECT_ROOT / 'phase4_grid_integration' / 'outputs'
+
+HAZARD_LAYERS = {
+    'hazard_floods': PHASE1_DIR / 'bnpb' / 'inarisk' / 'inarisk_hazard_floods.tif',
+    'hazard_drought': PHASE1_DIR / 'bnpb' / 'inarisk' / 'inarisk_hazard_drought.tif',
+    'hazard_landslide': PHASE1_DIR / 'bnpb' / 'inarisk' / 'inarisk_hazard_landslide.tif',
+    'hazard_earthquake': PHASE1_DIR / 'bnpb' / 'inarisk' / 'inarisk_hazard_earthquake.tif',
+    'hazard_extreme_weather': PHASE1_DIR / 'bnpb' / 'inarisk' / 'inarisk_hazard_extreme_weather.tif',
+    'hazard_fire': PHASE1_DIR / 'bnpb' / 'inarisk' / 'inarisk_hazard_land_forest_fire.tif'
+}
+
+# Columns every layer task needs; the rest of the base grid stays in the parent
+CELL_COLUMNS = ['grid_id', 'lon', 'lat']
+
+
+def region_layers(region, lulc_mode='zonal'):
+    """All integration layers for one region (key or Region), in notebook column order"""
+    region = REGIONS[region] if isinstance(region, str) else region
+    key = region.key
+    return [
+        LulcLayer(PHASE2_DIR / 'data' / 'lulc' / f'lulc_{key}_2025.tif', mode=lulc_mode),
+        NightLightLayer(
+            PHASE2_DIR / 'data' / 'nightlights' / f'{key}_nightlights_2020.tif',
+            PHASE2_DIR / 'data' / 'nightlights' / f'{key}_nightlights_2025.tif',
+        ),
+        HazardLayer(HAZARD_LAYERS),
+        RtrwLayer(region.rtrw_path, rules=ZONE_CATEGORY_RULES.get(key)),
+        PoiLayer(PHASE1_DIR / 'osm' / f'osm_business_{key}.geojson'),
+        RoadLayer(PHASE1_DIR / 'osm' / f'osm_roads_{key}.geojson'),
+    ]
+
+
+def load_base_grid(region):
+    """
+    Dasymetric population grid from Phase 3 (dense CSV, else sparse Parquet).
+
+    The sparse file is densified: every layer is sampled for every cell, so
+    Phase 4 holds the full grid either way (sparse only saves disk and read
+    time). Admin names of the filled-in cells come from the lattice admin
+    index, the same lookup Phase 3 assigned them with.
+    """
+    region = REGIONS[region] if isinstance(region, str) else region
+    csv_path = PHASE3_DIR / 'outputs' / f'pop_grid_{region.key}.csv'
+    if csv_path.exists():
+        return pd.read_csv(csv_path)
+    index = region_admin_index(region)
+    grid = read_sparse(PHASE3_DIR / 'outputs' / f'pop_grid_{region.key}.sparse.parquet', dense=True,
+                       derive=index.derived_columns())
+    if 'pop_density_km2' in grid.columns:
+        # Files written before density was a value column: left-out cells have no population
+        grid['pop_density_km2'] = grid['pop_density_km2'].fillna(0.0)
+    return grid
+
+
+def run_layer_task(layer, cells):
+    """
+    Worker entry point: compute one layer for one chunk of cells.
+
+    Returns the column block with `grid_id` as its first column, so blocks
+    from different workers can be merged without relying on row order.
+    """
+    with layer:
+        block = layer.compute(cells)
+
+    block = block.reset_index(drop=True)
+    block.insert(0, 'grid_id', cells['grid_id'].values)
+    return layer.name, block
+
+
+def plan_tasks(cells, layers, workers):
+    """
+    (layer, cells) tasks: layers that load a whole source run once on all
+    cells; chunk-local layers (rasters) are split into enough spatial chunks
+    that the pool has at least `workers` tasks to run.
+    """
+    chunked = [layer for layer in layers if layer.chunk_local]
+    whole = [layer for layer in layers if not layer.chunk_local]
+    tasks = [(layer, cells) for layer in whole]
+    if not chunked:
+        return tasks
+
+    n_chunks = max(1, math.ceil((workers - len(whole)) / len(chunked)))
+    rows_per_chunk = max(1, math.ceil(len(cells) / n_chunks))
+    chunks = [np.sort(pos) for pos in spatial_chunks(cells['grid_id'].values, rows_per_chunk)]
+    return tasks + [
+        (layer, cells.iloc[pos].reset_index(drop=True))
+        for layer in chunked
+        for pos in chunks
+    ]
+
+
+def integrate_parallel(grid, layers, workers=None, cache_dir=None, verbose=True):
+    """
+    Run independent layer tasks in a process pool and merge on grid_id.
+
+    Parameters:
+    - grid: base grid (grid_id, lon, lat + population columns)
+    - layers: GridLayer objects (not yet opened; they are pickled to workers)
+    - workers: pool size (default: os.cpu_count()); 1 runs in-process
+    - cache_dir: optional LayerCache directory; blocks are keyed on the
+      whole grid (as in `integrate_cached`), so hits do not depend on how
+      the work was chunked
+
+    Returns:
+    - grid with all layer columns, rows in the original order
+    """
+    workers = workers or os.cpu_count() or 1
+    layers = list(layers)
+    cells = grid[CELL_COLUMNS]
+    start = time.time()
+
+    cached = {}
+    if cache_dir is not None:
+        cache = LayerCache(cache_dir)
+        grid_digest = hash_grid_ids(cells['grid_id'].values)
+        for layer in layers:
+            block = cache.load(layer, grid_digest, cells.index)
+            if block is not None:
+                cached[layer.name] = block
+                if verbose:
+                    print(f"  ✓ {layer.name}: cached")
+
+    pending = [layer for layer in layers if layer.name not in cached]
+    tasks = plan_tasks(cells, pending, workers)
+    parts = {layer.name: [] for layer in pending}
+
+    if workers == 1:
+        for layer, chunk in tasks:
+            name, block = run_layer_task(layer, chunk)
+            parts[name].append(block)
+    elif tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_layer_task, layer, chunk) for layer, chunk in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                name, block = future.result()
+                parts[name].append(block)
+                if verbose:
+                    print(f"  [{done}/{len(futures)}] {name} chunk done ({time.time() - start:.1f}s)")
+
+    result = grid
+    for layer in layers:
+        if layer.name in cached:
+            result = pd.concat([result, cached[layer.name].set_axis(result.index)], axis=1)
+            continue
+        block = pd.concat(parts[layer.name], ignore_index=True)
+        result = result.merge(block, on='grid_id', how='left')
+        if cache_dir is not None:
+            # Whole-grid block in grid order, the key integrate_cached uses
+            cache.store(layer, grid_digest, result[block.columns[1:]])
+
+    if verbose:
+        print(f"✓ {len(layers)} layers ({len(cached)} cached), {len(tasks)} tasks, "
+              f"{workers} workers: {time.time() - start:.1f}s")
+    return result
+
+
+def write_region_pyramid(pyramid, region, output_dir):
+    """Write pyramid levels (see pyramid.py) -> `pyramid_<region>/level=<L>/`"""
+    root = output_dir / f'pyramid_{region.key}'
+    paths = write_pyramid(pyramid, root)
+    for level, path in paths.items():
+        print(f"  pyramid level {level}: {len(pyramid[level]):,} grids")
+    return root
+
+
+def run_region(region, workers=None, lulc_mode='zonal', cache=False, tiled=False,
+               memory_mb=DEFAULT_MEMORY_MB, output_format='csv', pyramid_levels=None,
+               output_dir=OUTPUT_DIR):
+    """
+    Integrate one region (key or Region) end to end and write
+    `grid_<region>_integrated.*` (plus `pyramid_<region>/` when
+    `pyramid_levels` is given)
+    """
+    region = REGIONS[region] if isinstance(region, str) else region
+    output_dir.mkdir(parents=True, exist_ok=True)
+    grid = load_base_grid(region)
+    layers = region_layers(region, lulc_mode=lulc_mode)
+    print(f"{region.key}: {len(grid):,} grids, {len(layers)} layers")
+
+    if tiled:
+        # Memory-bounded path always writes GeoParquet, one row group per tile
+        out_path = output_dir / f'grid_{region.key}_integrated.parquet'
+        integrate_tiled(grid, layers, out_path, memory_mb=memory_mb)
+        print(f"✓ {out_path}")
+        if pyramid_levels:
+            # Row group by row group: the integrated grid is never loaded whole
+            write_region_pyramid(build_pyramid_parquet(out_path, pyramid_levels), region, output_dir)
+        return out_path
+
+    cache_dir = output_dir / 'layer_cache' / region.key if cache else None
+    result = integrate_parallel(grid, layers, workers=workers, cache_dir=cache_dir)
+
+    if output_format == 'parquet':
+        out_path = output_dir / f'grid_{region.key}_integrated.parquet'
+        result.to_parquet(out_path, index=False)
+    else:
+        out_path = output_dir / f'grid_{region.key}_integrated.csv'
+        result.to_csv(out_path, index=False)
+
+    print(f"✓ {out_path} ({len(result):,} grids, {len(result.columns)} columns)")
+    if pyramid_levels:
+        write_region_pyramid(build_pyramid(result, pyramid_levels), region, output_dir)
+    return out_path
+
+
+def run_all(regions=None, workers=None, output_dir=OUTPUT_DIR, **kwargs):
+    """
+    Integrate several regions concurrently, one process per region, each
+    writing to `output_dir/<region>/`.
+
+    The core budget (`workers`, default all cores) is split between the
+    regions; each region runs its layer tasks on its share.
+
+    Returns:
+    - {region key: output path}
+    """
+    regions = get_regions(regions)
+    workers = workers or os.cpu_count() or 1
+    region_procs = min(len(regions), workers)
+    layer_workers = max(1, workers // region_procs)
+
+    task = partial(run_region, workers=layer_workers, **kwargs)
+    return run_regions(task, regions, workers=region_procs, output_dir=output_dir)
@@ -0,0 +1,91 @@
+"""
+POI-to-Cell Assignment by Grid ID Arithmetic
+
+Each POI's level-12 cell is computed directly from its lon/lat on the
+Geosquare lattice, so counting POIs per cell is a hash group-by instead of
+buffering 1.5M centroids into 25m circles and running `sjoin`:
+- exact: every POI lands in exactly the cell that contains it
+- O(n_poi + n_cells), no geometry construction
+
+Per-category counts use the `category` column written by
+`extract_osm_data.py` ("shop:convenience", "amenity:school", "other", ...).
+"""
+
+import numpy as np
+import pandas as pd
+
+from common import lattice
+
+# Top-level groups of the `category` column -> count column
+CATEGORY_GROUPS = ('shop', 'amenity', 'office', 'other')
+
+
+def poi_coordinates(pois):
+    """
+    lon/lat arrays of a POI (Geo)DataFrame.
+
+    Prefers the `lon`/`lat` columns of osm_business_* (centroids computed in
+    UTM during extraction); falls back to representative points.
+    """
+    if {'lon', 'lat'} <= set(pois.columns):
+        return pois['lon'].to_numpy('float64'), pois['lat'].to_numpy('float64')
+
+    points = pois.geometry.to_crs('EPSG:4326').representative_point()
+    return points.x.to_numpy('float64'), points.y.to_numpy('float64')
+
+
+def category_group(categories):
+    """'shop:convenience' -> 'shop'; missing -> 'other'"""
+    groups = pd.Series(categories, dtype='object').fillna('other').astype(str).str.split(':', n=1).str[0]
+    return groups.where(groups.isin(CATEGORY_GROUPS), 'other')
+
+
+def cell_positions(grid_ids, lons, lats):
+    """
+    Row position in `grid_ids` of the cell containing each point (-1 if the
+    point's cell is not part of the grid)
+    """
+    gx, gy, level = lattice.gid_to_index(grid_ids)
+    px, py = lattice.lonlat_to_index(lons, lats, level)
+
+    grid_keys = pd.Index(lattice.index_key(gx, gy, level))
+    return grid_keys.get_indexer(lattice.index_key(px, py, level))
+
+
+def poi_counts(grid_ids, pois, by_category=True, index=None):
+    """
+    Count POIs per grid cell.
+
+    Parameters:
+    - grid_ids: array-like of grid IDs (one level)
+    - pois: (Geo)DataFrame of POIs (lon/lat columns or point geometry)
+    - by_category: also count per top-level category (poi_shop, ...)
+    - index: optional index for the returned frame
+
+    Returns:
+    - DataFrame with `poi_count` (+ `poi_<group>` columns)
+    """
+    n_cells = len(grid_ids)
+    out = {}
+
+    if len(pois) == 0:
+        out['poi_count'] = np.zeros(n_cells, dtype='int64')
+        if by_category:
+            for group in CATEGORY_GROUPS:
+                out[f'poi_{group}'] = np.zeros(n_cells, dtype='int64')
+        return pd.DataFrame(out, index=index)
+
+    lons, lats = poi_coordinates(pois)
+    pos = cell_positions(grid_ids, lons, lats)
+    inside = pos >= 0
+
+    out['poi_count'] = np.bincount(pos[inside], minlength=n_cells)
+
+    if by_category:
+        categories = pois['category'] if 'category' in pois.columns else pd.Series([None] * len(pois))
+        groups = category_group(categories.values).to_numpy()
+        for group in CATEGORY_GROUPS:
+            sel = inside & (groups == group)
+            out[f'poi_{group}'] = np.bincount(pos[sel], minlength=n_cells)
+
+    return pd.DataFrame(out, index=index)
@@ -0,0 +1,334 @@
+"""
+Multi-Resolution Grid Pyramid
+
+Rolls the integrated level-12 (50m) grid up through coarser Geosquare
+levels, so maps and summary stats at 500m / 1km read thousands of rows
+instead of millions:
+- a cell's parent is its grid ID truncated to the coarser level, computed
+  on lattice integers (lattice.parent_index)
+- every column gets a rule from AGGREGATION_RULES: `sum` for counts and
+  totals (population, POI, road lengths), `mean` for intensities (hazards,
+  night lights, densities), `histogram` for classes (LULC: child-cell
+  counts per class + majority), `majority` for labels; a numeric column
+  without a rule is an error rather than a guess (averaging a total is
+  silently wrong)
+- one pass: each level is reduced from the previous one with `np.bincount`
+  on additive state (sums, counts, histograms), never from the base again
+- a tiled Parquet output is rolled up row group by row group
+  (`build_pyramid_parquet`), so the full base grid is never in memory
+- each level is written as its own Parquet dataset
+  `<root>/level=<L>/part-0.parquet` (Hive-style, readable as one dataset)
+
+`n_cells` holds the number of level-12 cells under each parent; partial
+parents at the region edge have fewer than the full count.
+"""
+
+from fnmatch import fnmatch
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from common import lattice
+
+from .lulc_zonal import LULC_CLASSES, class_column
+
+# Coarser levels: 100m, 500m, 1km, 5km
+PYRAMID_LEVELS = (11, 10, 9, 8)
+
+# (column pattern, rule); first match wins. Unmatched text / boolean
+# columns take the majority value, unmatched numeric columns raise
+AGGREGATION_RULES = [
+    ('grid_id', 'key'),
+    ('lon', 'coordinate'),
+    ('lat', 'coordinate'),
+    ('longitude', 'coordinate'),
+    ('latitude', 'coordinate'),
+    ('lulc_name', 'derived'),
+    ('estimated_pop', 'sum'),
+    ('estimated_pop_smooth', 'sum'),
+    ('building_area_m2', 'sum'),
+    ('poi_*', 'sum'),
+    ('road_length_*', 'sum'),
+    ('lulc_pixels', 'sum'),
+    ('lulc_frac_*', 'mean'),
+    ('lulc_class', 'histogram'),
+    ('lulc_majority', 'majority'),
+    ('admin_code', 'majority'),
+    ('hazard_*', 'mean'),
+    ('nightlight_*', 'mean'),
+    ('*density*', 'mean'),
+]
+
+# Means weighted by another column (class fractions by valid pixel count)
+MEAN_WEIGHTS = {'lulc_frac_*': 'lulc_pixels'}
+
+
+def aggregation_rule(column, dtype):
+    """Rule for one column (see AGGREGATION_RULES); None = numeric without a rule"""
+    for pattern, rule in AGGREGATION_RULES:
+        if fnmatch(column, pattern):
+            return rule
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return None
+    return 'majority'
+
+
+def _mean_weight(column, columns):
+    for pattern, weight in MEAN_WEIGHTS.items():
+        if fnmatch(column, pattern) and weight in columns:
+            return weight
+    return None
+
+
+class RollupState:
+    """
+    Additive per-cell state at one level: sums and weights for sum/mean
+    columns, sparse class counts (cell, class, count) for histogram and
+    majority columns.
+    """
+
+    def __init__(self, keys, level, n_cells, sums, weights, counts, categories, rules, integer_sums):
+        self.keys = keys
+        self.level = level
+        self.n_cells = n_cells
+        self.sums = sums
+        self.weights = weights
+        self.counts = counts
+        self.categories = categories
+        self.rules = rules
+        self.integer_sums = integer_sums
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Base-level state of a grid frame (one row per cell)"""
+        ix, iy, level = lattice.gid_to_index(frame['grid_id'].values)
+        keys = lattice.index_key(ix, iy, level)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        if (keys[1:] == keys[:-1]).any():
+            raise ValueError("Duplicate grid IDs in frame")
+        frame = frame.iloc[order]
+
+        rules = {c: aggregation_rule(c, frame[c].dtype) for c in frame.columns if c != 'geometry'}
+        unmatched = [c for c, rule in rules.items() if rule is None]
+        if unmatched:
+            raise ValueError(f"No aggregation rule for numeric column(s) {unmatched}; "
+                             f"add 'sum' or 'mean' entries to AGGREGATION_RULES")
+        sums, weights, counts, categories = {}, {}, {}, {}
+        for column, rule in rules.items():
+            if rule in ('sum', 'mean'):
+                values = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+                valid = ~np.isnan(values)
+                weight_col = _mean_weight(column, frame.columns) if rule == 'mean' else None
+                w = frame[weight_col].to_numpy(dtype='float64', na_value=0) if weight_col else np.ones(len(values))
+                w = np.where(valid, w, 0.0)
+                sums[column] = np.where(valid, values, 0.0) * (w if rule == 'mean' else 1.0)
+                weights[column] = w
+            elif rule in ('histogram', 'majority'):
+                codes, uniques = pd.factorize(frame[column], sort=True)
+                cells = np.flatnonzero(codes >= 0)
+                counts[column] = (cells, codes[cells].astype('int64'), np.ones(len(cells), dtype='int64'))
+                categories[column] = np.asarray(uniques)
+
+        # Integer counts (POI) stay integers
+        integer_sums = {c for c, rule in rules.items() if rule == 'sum' and pd.api.types.is_integer_dtype(frame[c].dtype)}
+        return cls(keys, level, np.ones(len(keys), dtype='int64'), sums, weights, counts, categories, rules,
+                   integer_sums)
+
+    @classmethod
+    def concat(cls, states):
+        """
+        One state from several at the same level (e.g. one per tile); cells
+        present in more than one are merged.
+        """
+        first = states[0]
+        offsets = np.cumsum([0] + [len(s.keys) for s in states])
+        counts, categories = {}, {}
+        for column in first.counts:
+            categories[column], inverse = np.unique(
+                np.concatenate([s.categories[column] for s in states]), return_inverse=True)
+            starts = np.cumsum([0] + [len(s.categories[column]) for s in states])
+            cells, codes, count = zip(*(s.counts[column] for s in states))
+            counts[column] = (
+                np.concatenate([c + offset for c, offset in zip(cells, offsets)]),
+                np.concatenate([inverse[start + c] for c, start in zip(codes, starts)]).astype('int64'),
+                np.concatenate(count),
+            )
+
+        merged = cls(
+            np.concatenate([s.keys for s in states]), first.level,
+            np.concatenate([s.n_cells for s in states]),
+            {c: np.concatenate([s.sums[c] for s in states]) for c in first.sums},
+            {c: np.concatenate([s.weights[c] for s in states]) for c in first.weights},
+            counts, categories, first.rules,
+            set.intersection(*(s.integer_sums for s in states)),
+        )
+        # Rolling up to the same level merges duplicate cells
+        return merged.rollup(first.level)
+
+    def rollup(self, parent_level):
+        """State at a coarser level, reduced from this one"""
+        ix, iy = lattice.key_to_index(self.keys, self.level)
+        px, py = lattice.parent_index(ix, iy, self.level, parent_level)
+        keys, inverse = np.unique(lattice.index_key(px, py, parent_level), return_inverse=True)
+        n = len(keys)
+
+        def reduce(values):
+            return np.bincount(inverse, weights=values, minlength=n)
+
+        def reduce_counts(column):
+            cells, codes, count = self.counts[column]
+            k = max(len(self.categories[column]), 1)
+            pairs, pair_of = np.unique(inverse[cells] * k + codes, return_inverse=True)
+            return pairs // k, pairs % k, np.bincount(pair_of, weights=count).astype('int64')
+
+        return RollupState(
+            keys, parent_level,
+            reduce(self.n_cells).astype('int64'),
+            {c: reduce(v) for c, v in self.sums.items()},
+            {c: reduce(v) for c, v in self.weights.items()},
+            {c: reduce_counts(c) for c in self.counts},
+            self.categories, self.rules, self.integer_sums,
+        )
+
+    def to_frame(self, histograms=True):
+        """
+        Aggregated frame at this level.
+
+        Histogram columns get the majority class plus one count column per
+        class (`lulc_hist_<class>` for LULC).
+        """
+        ix, iy = lattice.key_to_index(self.keys, self.level)
+        minx, miny, _, _ = lattice.index_to_bounds(ix, iy, self.level)
+        corners = {'lon': minx, 'longitude': minx, 'lat': miny, 'latitude': miny}
+
+        out = {}
+        for column, rule in self.rules.items():
+            if rule == 'key':
+                out[column] = lattice.index_to_gid(ix, iy, self.level)
+                out['n_cells'] = self.n_cells
+            elif rule == 'coordinate':
+                out[column] = corners[column]
+            elif rule == 'sum':
+                out[column] = self.sums[column]
+                if column in self.integer_sums:
+                    out[column] = np.rint(out[column]).astype('int64')
+            elif rule == 'mean':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    out[column] = self.sums[column] / self.weights[column]
+            elif rule in ('histogram', 'majority'):
+                out.update(self._majority(column, histograms and rule == 'histogram'))
+        return pd.DataFrame(out)
+
+    def _majority(self, column, with_histogram):
+        cells, codes, count = self.counts[column]
+        categories = self.categories[column]
+        n = len(self.keys)
+
+        # Most frequent class per cell (ties -> first in sort order)
+        order = np.lexsort((codes, -count, cells))
+        first = order[np.r_[True, cells[order][1:] != cells[order][:-1]]] if len(cells) else order
+        numeric = categories.dtype.kind in 'iuf'
+        majority = np.zeros(n, dtype=categories.dtype) if numeric else np.full(n, None, dtype=object)
+        majority[cells[first]] = categories[codes[first]]
+
+        out = {column: majority}
+        if column == 'lulc_class':
+            out['lulc_name'] = pd.Series(majority).map({0: 'No Data', **LULC_CLASSES}).to_numpy()
+        if with_histogram:
+            prefix = 'lulc_hist' if column == 'lulc_class' else f'{column}_hist'
+            for j, category in enumerate(categories):
+                name = LULC_CLASSES.get(category, str(category)) if column == 'lulc_class' else str(category)
+                hist = np.zeros(n, dtype='int64')
+                sel = codes == j
+                hist[cells[sel]] = count[sel]
+                out[class_column(name).replace('lulc_frac', prefix, 1)] = hist
+        return out
+
+
+def build_pyramid(frame, levels=PYRAMID_LEVELS, histograms=True):
+    """
+    Aggregate a grid frame to coarser Geosquare levels.
+
+    Parameters:
+    - frame: integrated grid (one row per cell, `grid_id` at one level)
+    - levels: coarser levels to produce (any order)
+    - histograms: add per-class count columns for histogram columns
+
+    Returns:
+    - {level: DataFrame}
+    """
+    return _build_levels(RollupState.from_frame(frame), levels, histograms)
+
+
+def build_pyramid_parquet(path, levels=PYRAMID_LEVELS, histograms=True, columns=None):
+    """
+    `build_pyramid` for a Parquet grid (e.g. the tiled output), one row
+    group at a time.
+
+    Each row group is reduced to the finest requested level on its own and
+    the small per-group states are merged, so memory holds one row group
+    plus the first pyramid level instead of the whole base grid.
+
+    Parameters:
+    - path: Parquet file with one row per cell
+    - columns: columns to aggregate (default: all but `geometry`)
+
+    Returns:
+    - {level: DataFrame}
+    """
+    parquet = pq.ParquetFile(path)
+    if columns is None:
+        columns = [c for c in parquet.schema_arrow.names if c != 'geometry']
+    levels = sorted(set(levels), reverse=True)
+    if not levels:
+        return {}
+
+    states = []
+    for i in range(parquet.num_row_groups):
+        base = RollupState.from_frame(parquet.read_row_group(i, columns=columns).to_pandas())
+        if levels[0] >= base.level:
+            raise ValueError(f"Pyramid levels must be coarser than the grid level {base.level}")
+        states.append(base.rollup(levels[0]))
+    if not states:
+        return {}
+
+    state = RollupState.concat(states)
+    pyramid = {levels[0]: state.to_frame(histograms=histograms)}
+    pyramid.update(_build_levels(state, levels[1:], histograms))
+    return pyramid
+
+
+def _build_levels(state, levels, histograms):
+    levels = sorted(set(levels), reverse=True)
+    if levels and levels[0] >= state.level:
+        raise ValueError(f"Pyramid levels must be coarser than the grid level {state.level}")
+
+    pyramid = {}
+    for level in levels:
+        state = state.rollup(level)
+        pyramid[level] = state.to_frame(histograms=histograms)
+    return pyramid
+
+
+def write_pyramid(pyramid, root):
+    """
+    Write each level as `<root>/level=<L>/part-0.parquet`.
+
+    Returns:
+    - {level: path}
+    """
+    paths = {}
+    for level, frame in sorted(pyramid.items()):
+        level_dir = root / f'level={level}'
+        level_dir.mkdir(parents=True, exist_ok=True)
+        path = level_dir / 'part-0.parquet'
+        frame.to_parquet(path, index=False)
+        paths[level] = path
+    return paths
+
+
+def read_pyramid_level(root, level, columns=None):
+    """One level of a pyramid written by `write_pyramid`"""
+    return pd.read_parquet(root / f'level={level}' / 'part-0.parquet', columns=columns)
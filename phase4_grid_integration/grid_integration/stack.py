@@ -0,0 +1,119 @@
+"""
+Raster Layer Stack Sampling
+
+Samples many single-band rasters at the same grid centroids in one pass:
+- every raster is opened once and kept open for all regions
+- rasters are grouped by CRS and affine transform
+- lon/lat -> raster CRS is computed once per CRS
+- row/col indices are computed once per (CRS, transform) group
+- each band is then read through one window and indexed with NumPy
+
+Typical inputs are `HAZARD_LAYERS` (6 national InaRISK rasters sharing one
+grid) and the per-region night-light pairs (2020/2025 on the same grid).
+"""
+
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+import rasterio
+
+from .sampling import coords_to_raster_crs, xy_to_rowcol, read_at_rowcol
+
+
+def _crs_key(src):
+    return src.crs.to_wkt() if src.crs is not None else None
+
+
+class RasterStack:
+    """
+    Group of rasters sampled together as one column block.
+
+    Parameters:
+    - layers: dict of {column_name: raster_path}
+    - band: 1-based band index read from every raster
+
+    Use as a context manager so the datasets are closed afterwards:
+
+        with RasterStack(HAZARD_LAYERS) as stack:
+            block = stack.sample(grid['lon'], grid['lat'], index=grid.index)
+    """
+
+    def __init__(self, layers, band=1):
+        self.layers = dict(layers)
+        self.band = band
+        self._exit_stack = ExitStack()
+        self.datasets = {
+            name: self._exit_stack.enter_context(rasterio.open(str(path)))
+            for name, path in self.layers.items()
+        }
+
+        # (crs, transform) -> [column names], in insertion order
+        self.groups = {}
+        for name, src in self.datasets.items():
+            key = (_crs_key(src), tuple(src.transform)[:6])
+            self.groups.setdefault(key, []).append(name)
+
+    @property
+    def n_groups(self):
+        return len(self.groups)
+
+    def sample(self, lons, lats, fill_values=None, index=None):
+        """
+        Sample every layer at the given WGS84 coordinates.
+
+        Parameters:
+        - lons, lats: array-likes of grid centroid coordinates
+        - fill_values: optional {column_name: fill} for NoData/outside cells
+          (columns not listed get NaN and a float dtype)
+        - index: optional index for the returned frame (e.g. `grid.index`)
+
+        Returns:
+        - pandas DataFrame with one column per layer, in `layers` order
+        """
+        fill_values = fill_values or {}
+        lons = np.asarray(lons, dtype='float64')
+        lats = np.asarray(lats, dtype='float64')
+
+        coords_by_crs = {}
+        columns = {}
+
+        for (crs_key, _), names in self.groups.items():
+            first = self.datasets[names[0]]
+
+            if crs_key not in coords_by_crs:
+                coords_by_crs[crs_key] = coords_to_raster_crs(first, lons, lats)
+            xs, ys = coords_by_crs[crs_key]
+
+            rows, cols = xy_to_rowcol(first.transform, xs, ys)
+            for name in names:
+                columns[name] = read_at_rowcol(
+                    self.datasets[name], rows, cols,
+                    band=self.band, fill_value=fill_values.get(name)
+                )
+
+        ordered = {name: columns[name] for name in self.layers}
+        return pd.DataFrame(ordered, index=index)
+
+    def close(self):
+        self._exit_stack.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def sample_layer_stack(layers, lons, lats, band=1, fill_values=None, index=None):
+    """
+    One-shot helper: open `layers`, sample them at lon/lat, close again.
+
+    Returns a DataFrame column block ready to attach to the grid:
+
+        block = sample_layer_stack(NL_LAYERS, grid['lon'], grid['lat'], index=grid.index)
+        grid[block.columns] = block
+    """
+    with RasterStack(layers, band=band) as stack:
+        return stack.sample(lons, lats, fill_values=fill_values, index=index)
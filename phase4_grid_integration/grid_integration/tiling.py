@@ -0,0 +1,206 @@
+"""
+Tiled, Bounded-Memory Integration
+
+Runs the integration layers over spatial tiles of the grid instead of the
+whole frame at once:
+- cells are ordered by square lattice tiles and taken in chunks of
+  `rows_per_tile` rows, sized from a memory budget (`memory_mb`)
+- every chunk goes through all layers, then is appended as one Parquet row
+  group (GeoParquet, cell polygons as WKB)
+- the first chunk is sized from a rough per-row estimate (BYTES_PER_ROW);
+  after each chunk its measured size (joined frame + Arrow table) replaces
+  the estimate, so later chunks fit the budget for this region's columns
+- only one chunk of joined columns and cell geometries is alive at a time
+
+`memory_mb` is a budget for that chunk data, not a ceiling on the process:
+the base grid, the layer sources and transient join intermediates come on
+top. What the tiling guarantees is that memory does not grow with the
+number of cells in the kabupaten.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from common import lattice
+
+# Starting estimate of chunk bytes per cell (joined columns + Arrow table
+# with WKB polygons); replaced by the measured value after the first chunk
+BYTES_PER_ROW = 4096
+DEFAULT_MEMORY_MB = 512
+
+
+def rows_for_memory(memory_mb=DEFAULT_MEMORY_MB, bytes_per_row=BYTES_PER_ROW):
+    """Rows per chunk whose data takes about `memory_mb` at `bytes_per_row`"""
+    return max(1, int(memory_mb * 1024 * 1024 // bytes_per_row))
+
+
+def _tile_order(grid_ids, rows_per_tile):
+    """
+    Positions of the cells ordered by square lattice tile (row-major), plus
+    the start/end of each tile in that order
+    """
+    ix, iy, level = lattice.gid_to_index(grid_ids)
+    if len(ix) == 0:
+        return np.empty(0, dtype='int64'), np.empty(0, dtype='int64'), np.empty(0, dtype='int64')
+
+    side = max(1, int(np.sqrt(rows_per_tile)))
+    tile_x = (ix - ix.min()) // side
+    tile_y = (iy - iy.min()) // side
+    tile_key = tile_y * (tile_x.max() + 1) + tile_x
+
+    order = np.argsort(tile_key, kind='stable')
+    keys_sorted = tile_key[order]
+    starts = np.flatnonzero(np.r_[True, keys_sorted[1:] != keys_sorted[:-1]])
+    ends = np.r_[starts[1:], len(order)]
+    return order, starts, ends
+
+
+def spatial_chunks(grid_ids, rows_per_tile):
+    """
+    Split cells into spatially compact chunks of at most `rows_per_tile`.
+
+    Cells are bucketed into square tiles of ~rows_per_tile cells on the
+    lattice; consecutive tiles (row-major) are packed together until the
+    chunk is full, so sparse rural tiles do not produce tiny row groups.
+
+    Yields positional index arrays into `grid_ids`.
+    """
+    order, starts, ends = _tile_order(grid_ids, rows_per_tile)
+
+    chunk = []
+    chunk_rows = 0
+    for start, end in zip(starts, ends):
+        # A single tile larger than the budget is split row-wise
+        for sub in range(start, end, rows_per_tile):
+            part = order[sub:min(end, sub + rows_per_tile)]
+            if chunk_rows + len(part) > rows_per_tile and chunk:
+                yield np.concatenate(chunk)
+                chunk, chunk_rows = [], 0
+            chunk.append(part)
+            chunk_rows += len(part)
+
+    if chunk:
+        yield np.concatenate(chunk)
+
+
+def cell_polygons(grid_ids):
+    """Exact Geosquare cell polygons for an array of grid IDs"""
+    minx, miny, maxx, maxy = lattice.gid_to_bounds(np.asarray(grid_ids))
+    return shapely.box(minx, miny, maxx, maxy)
+
+
+def _geo_metadata(bbox):
+    return {
+        'version': '1.0.0',
+        'primary_column': 'geometry',
+        'columns': {
+            'geometry': {
+                'encoding': 'WKB',
+                'geometry_types': ['Polygon'],
+                'bbox': [float(v) for v in bbox],
+            }
+        },
+    }
+
+
+def _to_table(frame, with_geometry):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if with_geometry:
+        wkb = shapely.to_wkb(cell_polygons(frame['grid_id'].values))
+        table = table.append_column('geometry', pa.array(wkb, type=pa.binary()))
+    return table
+
+
+def _unify(table, schema):
+    """Cast a chunk table to the writer schema (all-null chunks etc.)"""
+    if table.schema.equals(schema, check_metadata=False):
+        return table
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names
+        else pa.nulls(len(table), type=field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _writer_schema(table):
+    """First-chunk schema with all-null columns widened to string"""
+    fields = [
+        pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+        for f in table.schema
+    ]
+    return pa.schema(fields)
+
+
+def integrate_tiled(grid, layers, out_path, memory_mb=DEFAULT_MEMORY_MB,
+                    bytes_per_row=BYTES_PER_ROW, with_geometry=True, verbose=True):
+    """
+    Run all layers tile by tile and append each tile as a Parquet row group.
+
+    Parameters:
+    - grid: DataFrame with at least grid_id, lon, lat (base columns are kept)
+    - layers: iterable of GridLayer objects (see layers.py)
+    - out_path: output .parquet path (overwritten)
+    - memory_mb: approximate budget for one chunk of joined data (see the
+      module docstring for what it does not cover)
+    - bytes_per_row: estimate used to size the first chunk; later chunks
+      use the measured size of the previous one
+    - with_geometry: write cell polygons as GeoParquet geometry
+
+    Returns:
+    - number of rows written
+    """
+    rows_per_tile = rows_for_memory(memory_mb, bytes_per_row)
+    # Tile order fixed up front; chunk sizes along it adapt as chunks are measured
+    order, _, _ = _tile_order(grid['grid_id'].values, rows_per_tile)
+    layers = list(layers)
+    for layer in layers:
+        layer.open()
+
+    writer = None
+    schema = None
+    written = 0
+    minx = miny = np.inf
+    maxx = maxy = -np.inf
+
+    try:
+        n = 0
+        while written < len(order):
+            n += 1
+            positions = order[written:written + rows_per_tile]
+            cells = grid.iloc[np.sort(positions)]
+            blocks = [layer.compute(cells) for layer in layers]
+            frame = pd.concat([cells] + blocks, axis=1)
+
+            table = _to_table(frame, with_geometry)
+            chunk_bytes = int(frame.memory_usage(deep=True).sum()) + table.nbytes
+            rows_per_tile = rows_for_memory(memory_mb, chunk_bytes / len(frame))
+            if writer is None:
+                schema = _writer_schema(table)
+                writer = pq.ParquetWriter(str(out_path), schema)
+            writer.write_table(_unify(table, schema), row_group_size=len(frame))
+
+            if with_geometry:
+                b = lattice.gid_to_bounds(frame['grid_id'].values)
+                minx, miny = min(minx, b[0].min()), min(miny, b[1].min())
+                maxx, maxy = max(maxx, b[2].max()), max(maxy, b[3].max())
+
+            written += len(frame)
+            if verbose:
+                print(f"  tile {n}: {len(frame):,} cells, {chunk_bytes / 2**20:,.0f} MB "
+                      f"({written:,}/{len(grid):,})")
+    finally:
+        for layer in layers:
+            layer.close()
+        if writer is not None:
+            if with_geometry and written:
+                # GeoParquet 'geo' metadata is only complete once all tiles are known
+                writer.add_key_value_metadata({'geo': json.dumps(_geo_metadata((minx, miny, maxx, maxy)))})
+            writer.close()
+
+    return written
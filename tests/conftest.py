@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+# Shared helpers (common/) live at the project root; the phase packages are
+# imported the way they run, from their own directories
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+for path in (PROJECT_ROOT, PROJECT_ROOT / 'phase1_data_hunt' / 'osm', PROJECT_ROOT / 'phase3_dasymetric',
+             PROJECT_ROOT / 'phase4_grid_integration'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,167 @@
+"""
+common/download.py against a local http.server stand-in for Geofabrik
+(Range / If-Range, ETag / If-None-Match, If-Modified-Since, `.md5`)
+"""
+
+import hashlib
+import os
+import socket
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from common import download as dl
+
+LAST_MODIFIED = 1_700_000_000
+
+
+class FileServer(ThreadingHTTPServer):
+    """Serves one file under any path and its MD5 under `<path>.md5`"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FileHandler)
+        self.data = os.urandom(2_000_000)
+        self.etag = '"v1"'
+        self.md5 = None          # published checksum (None = real MD5)
+        self.drop_after = None   # bytes sent before the next transfer drops
+        self.requests = []
+
+    def publish(self, data, etag):
+        self.data, self.etag = data, etag
+
+    def url(self, name='indonesia-latest.osm.pbf'):
+        return f'http://127.0.0.1:{self.server_port}/{name}'
+
+
+class FileHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        srv = self.server
+        if self.path.endswith('.md5'):
+            self._send(200, ((srv.md5 or hashlib.md5(srv.data).hexdigest()) + '  f.pbf\n').encode())
+            return
+
+        srv.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == srv.etag:
+            self._send(304)
+            return
+        since = self.headers.get('If-Modified-Since')
+        if since and 'If-None-Match' not in self.headers \
+                and parsedate_to_datetime(since).timestamp() >= LAST_MODIFIED:
+            self._send(304)
+            return
+
+        start = 0
+        if self.headers.get('Range') and self.headers.get('If-Range') == srv.etag:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+        body = srv.data[start:]
+        self.send_response(206 if start else 200)
+        self.send_header('ETag', srv.etag)
+        self.send_header('Last-Modified', formatdate(LAST_MODIFIED, usegmt=True))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if srv.drop_after:
+            # Connection drop mid-transfer
+            self.wfile.write(body[:srv.drop_after])
+            self.wfile.flush()
+            srv.drop_after = None
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        self.wfile.write(body)
+
+    def _send(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(dl.time, 'sleep', lambda seconds: None)
+    srv = FileServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def fetch(server, path, **kwargs):
+    return dl.download(server.url(), path, md5_url=server.url() + '.md5', progress=False, **kwargs)
+
+
+def test_interrupted_transfer_resumes_from_part(server, tmp_path):
+    path = tmp_path / 'indonesia-latest.osm.pbf'
+    server.drop_after = 700_000
+
+    assert fetch(server, path, chunk_size=64 * 1024) == 'downloaded'
+    assert path.read_bytes() == server.data
+    assert not path.with_name(path.name + '.part').exists()
+
+    first, resumed = server.requests
+    assert 'Range' not in first
+    offset = int(resumed['Range'].split('=')[1].rstrip('-'))
+    assert 0 < offset <= 700_000
+    assert resumed['If-Range'] == '"v1"'
+    assert dl.read_meta(path)['md5'] == hashlib.md5(server.data).hexdigest()
+
+
+def test_unchanged_file_is_not_transferred(server, tmp_path):
+    path = tmp_path / 'indonesia-latest.osm.pbf'
+    fetch(server, path)
+    server.requests.clear()
+    before = path.stat().st_mtime_ns
+
+    assert fetch(server, path) == 'unchanged'
+    assert len(server.requests) == 1
+    assert server.requests[0]['If-None-Match'] == '"v1"'
+    assert path.stat().st_mtime_ns == before
+
+
+def test_cached_copy_without_metadata_uses_mtime(server, tmp_path):
+    path = tmp_path / 'indonesia-latest.osm.pbf'
+    path.write_bytes(server.data)
+
+    assert fetch(server, path) == 'unchanged'
+    assert 'If-Modified-Since' in server.requests[0]
+
+    # Older than the server's copy: the conditional response is the download
+    os.utime(path, (LAST_MODIFIED - 3600, LAST_MODIFIED - 3600))
+    server.requests.clear()
+    assert fetch(server, path) == 'downloaded'
+    assert len(server.requests) == 1
+    assert path.read_bytes() == server.data
+
+
+def test_etag_change_downloads_new_version(server, tmp_path):
+    path = tmp_path / 'indonesia-latest.osm.pbf'
+    fetch(server, path)
+    server.publish(os.urandom(50_000), '"v2"')
+    server.requests.clear()
+
+    assert fetch(server, path) == 'downloaded'
+    assert path.read_bytes() == server.data
+    assert len(server.requests) == 1
+    assert dl.read_meta(path)['etag'] == '"v2"'
+
+
+def test_md5_mismatch_keeps_cached_copy(server, tmp_path):
+    path = tmp_path / 'indonesia-latest.osm.pbf'
+    fetch(server, path)
+    cached = path.read_bytes()
+    server.publish(os.urandom(50_000), '"v2"')
+    server.md5 = '0' * 32
+
+    with pytest.raises(dl.DownloadError, match='MD5'):
+        fetch(server, path)
+    assert path.read_bytes() == cached
+    assert not path.with_name(path.name + '.part').exists()
+    assert not dl.meta_path(path.with_name(path.name + '.part')).exists()
@@ -0,0 +1,121 @@
+"""
+dasymetric/incremental.py: patched outputs against a full recompute, and
+the outputs a patch cannot update (removed / reported)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common import lattice
+from common.regions import REGIONS
+from common.sparse import read_sparse, write_sparse
+from dasymetric import weighted_dasymetric, save_snapshot, update_region
+
+REGION = REGIONS['tangsel']
+UNITS = ['BARAT', 'TENGAH', 'TIMUR']
+
+
+def synthetic_grid(n=30, seed=0):
+    """n x n level-12 cells in three kelurahan (column thirds), sparse building area"""
+    rng = np.random.default_rng(seed)
+    ix0, iy0 = lattice.lonlat_to_index(106.7, -6.3)
+    gx, gy = np.meshgrid(np.arange(ix0, ix0 + n), np.arange(iy0, iy0 + n))
+    gx, gy = gx.ravel(), gy.ravel()
+    minx, miny, _, _ = lattice.index_to_bounds(gx, gy)
+    area = np.where(rng.random(len(gx)) < 0.4, rng.uniform(20, 2000, len(gx)), 0.0)
+    return pd.DataFrame({
+        'grid_id': lattice.index_to_gid(gx, gy),
+        'kelurahan': np.array(UNITS)[(gx - ix0) * 3 // n],
+        'building_area_m2': area,
+        'lon': minx,
+        'lat': miny,
+    })
+
+
+def population(*counts):
+    return pd.DataFrame({'kelurahan': UNITS, 'population': counts})
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    """Outputs of a full run with the old counts (TIMUR had no population then)"""
+    previous = population(5000, 3000, 0)
+    grid = weighted_dasymetric(synthetic_grid(), previous, 'kelurahan', verbose=False)
+    grid = grid.drop(columns='weight')
+    grid.to_csv(tmp_path / f'pop_grid_{REGION.key}.csv', index=False)
+    write_sparse(grid, tmp_path / f'pop_grid_{REGION.key}.sparse.parquet',
+                 ['building_area_m2', 'estimated_pop', 'pop_density_km2'])
+    save_snapshot(previous, REGION, tmp_path)
+    return grid
+
+
+def recompute(grid, current):
+    full = weighted_dasymetric(grid.drop(columns=['estimated_pop', 'pop_density_km2']), current,
+                               'kelurahan', verbose=False)
+    return full.drop(columns='weight')
+
+
+def test_patch_matches_full_recompute(outputs, tmp_path):
+    current = population(5600, 3000, 1200)
+    changes = update_region(REGION, current, tmp_path, phase4_dir=tmp_path / 'phase4', verbose=False)
+    assert sorted(changes.index) == ['BARAT', 'TIMUR']
+
+    full = recompute(outputs, current)
+    patched = pd.read_csv(tmp_path / f'pop_grid_{REGION.key}.csv')
+    pd.testing.assert_frame_equal(patched, full, check_exact=False, rtol=1e-9)
+
+    sparse = read_sparse(tmp_path / f'pop_grid_{REGION.key}.sparse.parquet')
+    expected = full.set_index('grid_id').loc[sparse['grid_id']]
+    for column in ('estimated_pop', 'pop_density_km2'):
+        assert np.allclose(sparse[column].to_numpy(), expected[column].to_numpy())
+
+    # The snapshot now holds the new counts: a second run has nothing to do
+    assert update_region(REGION, current, tmp_path, phase4_dir=tmp_path / 'phase4', verbose=False).empty
+
+
+def test_patch_with_geojson_matches_full_recompute(outputs, tmp_path):
+    import geopandas as gpd
+
+    geojson_path = tmp_path / f'pop_grid_{REGION.key}.geojson'
+    gpd.GeoDataFrame(outputs, geometry=gpd.points_from_xy(outputs['lon'], outputs['lat']),
+                     crs='EPSG:4326').to_file(geojson_path, driver='GeoJSON')
+
+    current = population(4100, 3300, 0)
+    update_region(REGION, current, tmp_path, geojson=True, phase4_dir=tmp_path / 'phase4', verbose=False)
+
+    full = recompute(outputs, current)
+    patched = gpd.read_file(geojson_path)
+    assert np.allclose(patched['estimated_pop'], full['estimated_pop'])
+    assert np.allclose(patched['pop_density_km2'], full['pop_density_km2'])
+
+
+def test_unpatchable_outputs_removed_or_reported(outputs, tmp_path, capsys):
+    derived = [tmp_path / f'pop_smooth_{REGION.key}.csv', tmp_path / f'pop_uncertainty_{REGION.key}.csv',
+               tmp_path / f'pop_grid_{REGION.key}.geojson']
+    for path in derived:
+        path.write_text('stale')
+    phase4_dir = tmp_path / 'phase4'
+    (phase4_dir / f'pyramid_{REGION.key}').mkdir(parents=True)
+    phase4 = [phase4_dir / f'grid_{REGION.key}_integrated.parquet', phase4_dir / f'pyramid_{REGION.key}']
+    phase4[0].write_text('stale')
+
+    update_region(REGION, population(5000, 3500, 0), tmp_path, phase4_dir=phase4_dir, verbose=False)
+
+    # Phase 3 outputs computed from whole units are removed, Phase 4 ones reported
+    assert not any(path.exists() for path in derived)
+    assert all(path.exists() for path in phase4)
+    printed = capsys.readouterr().out
+    assert all(path.name in printed for path in derived + phase4)
+
+
+def test_unchanged_counts_leave_outputs_alone(outputs, tmp_path):
+    smooth_path = tmp_path / f'pop_smooth_{REGION.key}.csv'
+    smooth_path.write_text('current')
+    before = (tmp_path / f'pop_grid_{REGION.key}.csv').read_bytes()
+
+    changes = update_region(REGION, population(5000, 3000, 0), tmp_path, phase4_dir=tmp_path / 'phase4',
+                            verbose=False)
+    assert changes.empty
+    assert smooth_path.exists()
+    assert (tmp_path / f'pop_grid_{REGION.key}.csv').read_bytes() == before
@@ -0,0 +1,172 @@
+"""
+phase4 grid_integration: the tiled writer, the parallel scheduler and the
+layer cache against one in-memory pass over all layers, on small synthetic sources (LULC / hazard rasters, RTRW zones,
+POIs, roads) around the OKU corner
+"""
+
+import shutil
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+
+import grid_integration as gi
+from grid_integration.cache import integrate_cached
+from common import lattice
+from grid_integration.pipeline import CELL_COLUMNS, integrate_parallel, plan_tasks
+from grid_integration.tiling import integrate_tiled
+
+LON0, LAT0 = 103.6, -3.9
+
+
+def base_grid(n=60):
+    """n x n level-12 cells south-east of (LON0, LAT0)"""
+    ix0, iy0 = lattice.lonlat_to_index(LON0, LAT0)
+    gx, gy = np.meshgrid(np.arange(ix0, ix0 + n), np.arange(iy0 - n, iy0))
+    gx, gy = gx.ravel(), gy.ravel()
+    lon, lat = lattice.index_to_center(gx, gy)
+    return pd.DataFrame({
+        'grid_id': lattice.index_to_gid(gx, gy),
+        'lon': lon,
+        'lat': lat,
+        'estimated_pop': np.arange(len(gx), dtype='float64') % 11,
+    })
+
+
+def write_raster(path, values, pixel, dtype, nodata):
+    profile = {'driver': 'GTiff', 'width': values.shape[1], 'height': values.shape[0], 'count': 1,
+               'dtype': dtype, 'nodata': nodata, 'crs': 'EPSG:4326',
+               'transform': from_origin(LON0 - 0.002, LAT0 + 0.002, pixel, pixel)}
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(values.astype(dtype), 1)
+
+
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory):
+    """Layer sources covering base_grid() (with a margin)"""
+    root = tmp_path_factory.mktemp('sources')
+    rng = np.random.default_rng(0)
+    span = 0.034
+
+    # ~10m LULC classes in patches, so cells mix classes; 0 = no data
+    classes = np.array([0, 1, 2, 5, 7, 7, 11])
+    patches = rng.integers(0, len(classes), (40, 40))
+    lulc = classes[np.kron(patches, np.ones((10, 10), dtype='int64'))]
+    write_raster(root / 'lulc.tif', lulc, span / 400, 'uint8', 0)
+
+    # ~55m hazard surface with a no-data band
+    hazard = rng.random((62, 62)).astype('float32')
+    hazard[20:24] = -9999
+    write_raster(root / 'hazard.tif', hazard, 0.00055, 'float32', -9999)
+
+    west, east = shapely.box(LON0 - 0.01, LAT0 - 0.05, LON0 + 0.012, LAT0 + 0.01), \
+        shapely.box(LON0 + 0.012, LAT0 - 0.05, LON0 + 0.05, LAT0 + 0.01)
+    gpd.GeoDataFrame({'namobj': ['Permukiman', 'Pertanian'], 'rtrpkk': ['PK', 'PT'], 'geometry': [west, east]},
+                     crs='EPSG:4326').to_file(root / 'rtrw.geojson', driver='GeoJSON')
+
+    n_poi = 800
+    lons, lats = LON0 + rng.random(n_poi) * 0.027, LAT0 - rng.random(n_poi) * 0.027
+    categories = rng.choice(['shop:bakery', 'amenity:school', 'office:ngo', 'other'], n_poi)
+    gpd.GeoDataFrame({'name': 'x', 'category': categories, 'lon': lons, 'lat': lats},
+                     geometry=gpd.points_from_xy(lons, lats), crs='EPSG:4326').to_file(
+        root / 'poi.geojson', driver='GeoJSON')
+
+    starts = np.c_[LON0 + rng.random(60) * 0.027, LAT0 - rng.random(60) * 0.027]
+    ends = starts + rng.normal(0, 0.006, starts.shape)
+    gpd.GeoDataFrame({'highway': rng.choice(['primary', 'residential', 'service'], 60)},
+                     geometry=shapely.linestrings(np.stack([starts, ends], axis=1)), crs='EPSG:4326').to_file(
+        root / 'roads.geojson', driver='GeoJSON')
+    return root
+
+
+def make_layers(root):
+    """Fresh (unopened) layers over the synthetic sources"""
+    return [
+        gi.LulcLayer(root / 'lulc.tif'),
+        gi.HazardLayer({'hazard_test': root / 'hazard.tif'}),
+        gi.RtrwLayer(root / 'rtrw.geojson'),
+        gi.PoiLayer(root / 'poi.geojson'),
+        gi.RoadLayer(root / 'roads.geojson', by_class=True),
+    ]
+
+
+def in_memory(grid, layers):
+    """Reference: every layer computed once over the whole grid"""
+    blocks = []
+    for layer in layers:
+        with layer:
+            blocks.append(layer.compute(grid[['grid_id', 'lon', 'lat']]))
+    return pd.concat([grid] + blocks, axis=1)
+
+
+@pytest.fixture(scope='module')
+def expected(sources):
+    return in_memory(base_grid(), make_layers(sources))
+
+
+def by_grid_id(frame):
+    return frame.sort_values('grid_id').reset_index(drop=True)
+
+
+def test_reference_exercises_every_layer(expected):
+    assert expected['lulc_frac_built_area'].between(0, 1).all()
+    assert 0 < expected['lulc_frac_built_area'].mean() < 1
+    assert expected['hazard_test'].isna().any() and expected['hazard_test'].notna().any()
+    assert set(expected['rtrw_zone']) == {'PK', 'PT'}
+    assert expected['poi_count'].sum() > 0
+    assert expected['road_length_m'].sum() > 0
+
+
+def test_tiled_writer_matches_in_memory(sources, expected, tmp_path):
+    grid = base_grid()
+    out_path = tmp_path / 'grid.parquet'
+    # A budget of a few hundred rows per chunk: several tiles / row groups
+    n_rows = integrate_tiled(grid, make_layers(sources), out_path, memory_mb=0.25, verbose=False)
+    assert n_rows == len(grid)
+    assert pq.ParquetFile(out_path).num_row_groups > 3
+
+    tiled = pd.read_parquet(out_path).drop(columns='geometry')
+    assert sorted(tiled.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(by_grid_id(tiled[expected.columns]), by_grid_id(expected))
+
+
+@pytest.mark.parametrize('workers', [1, 8])
+def test_parallel_scheduler_matches_in_memory(sources, expected, workers):
+    if workers > 1:
+        # Raster layers are split into spatial chunks across the pool
+        assert len(plan_tasks(base_grid()[CELL_COLUMNS], make_layers(sources), workers)) > len(make_layers(sources))
+    result = integrate_parallel(base_grid(), make_layers(sources), workers=workers, verbose=False)
+    # Rows stay in the base grid's order
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_cached_runs_match_in_memory(sources, expected, tmp_path, capsys):
+    cache_dir = tmp_path / 'cache'
+    # Blocks stored by the parallel run are hits for integrate_cached and vice versa
+    first = integrate_parallel(base_grid(), make_layers(sources), workers=8, cache_dir=cache_dir, verbose=False)
+    assert len(list(cache_dir.glob('*.parquet'))) == len(make_layers(sources))
+    capsys.readouterr()
+
+    cached = integrate_cached(base_grid(), make_layers(sources), cache_dir)
+    assert capsys.readouterr().out.count(': cached') == len(make_layers(sources))
+    again = integrate_parallel(base_grid(), make_layers(sources), workers=1, cache_dir=cache_dir, verbose=False)
+    for result in (first, cached, again):
+        pd.testing.assert_frame_equal(result, expected)
+    assert len(list(cache_dir.glob('*.parquet'))) == len(make_layers(sources))
+
+
+def test_changed_source_is_recomputed(sources, tmp_path):
+    poi_path = tmp_path / 'poi.geojson'
+    shutil.copy(sources / 'poi.geojson', poi_path)
+    grid = base_grid()
+    before = integrate_cached(grid, [gi.PoiLayer(poi_path)], tmp_path / 'cache', verbose=False)
+
+    gpd.read_file(poi_path).iloc[::2].to_file(poi_path, driver='GeoJSON')
+    after = integrate_cached(grid, [gi.PoiLayer(poi_path)], tmp_path / 'cache', verbose=False)
+    assert after['poi_count'].sum() < before['poi_count'].sum()
+    pd.testing.assert_frame_equal(after, in_memory(grid, [gi.PoiLayer(poi_path)]))
@@ -0,0 +1,226 @@
+"""
+extract_osm_data.py layer parsing and post-processing:
+- the single-pass LayerCollector against the pyrosm filters it replaced
+  (get_pois / get_buildings / get_network('driving')), applied here to the
+  raw XML of a synthetic extract
+- the vectorized boundary clip, POI categories and centroids against the
+  row-wise code they replaced
+"""
+
+import xml.etree.ElementTree as ET
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+import extract_osm_data as osm
+from common.regions import REGIONS
+
+# pyrosm defaults: get_pois() keys and the 'driving' network exclusions
+PYROSM_POI_KEYS = ('amenity', 'shop', 'tourism')
+PYROSM_DRIVING_EXCLUDE = {
+    'highway': ['cycleway', 'footway', 'path', 'pedestrian', 'steps', 'track', 'corridor', 'elevator',
+                'escalator', 'proposed', 'construction', 'bridleway', 'abandoned', 'platform', 'raceway'],
+    'area': ['yes'],
+    'motor_vehicle': ['no'],
+    'motorcar': ['no'],
+    'service': ['parking', 'parking_aisle', 'private', 'emergency_access'],
+}
+
+HIGHWAYS = [
+    ('primary', {}), ('residential', {'name': 'Jl Mawar'}), ('service', {}), ('unclassified', {}),
+    ('footway', {}), ('cycleway', {}), ('steps', {}), ('track', {}), ('construction', {}),
+    ('service', {'service': 'parking_aisle'}), ('service', {'service': 'driveway'}),
+    ('service', {'service': 'private'}), ('residential', {'motor_vehicle': 'no'}),
+    ('tertiary', {'motorcar': 'no'}), ('pedestrian', {'area': 'yes'}), ('secondary', {'oneway': 'yes'}),
+]
+
+POI_TAGS = [
+    {'amenity': 'cafe', 'name': 'Kopi'}, {'shop': 'bakery', 'name': 'Roti'}, {'tourism': 'hotel'},
+    {'office': 'ngo', 'name': 'LSM'}, {'name': 'Tugu'}, {'amenity': 'atm', 'operator': 'Bank'},
+]
+
+
+def tag_xml(tags):
+    return ''.join(f'<tag k="{k}" v="{v}"/>' for k, v in tags.items())
+
+
+def synthetic_osm():
+    """Tagged nodes, roads, building / POI areas (ways and a multipolygon)"""
+    parts, node_id = [], 1
+    for i, tags in enumerate(POI_TAGS):
+        parts.append(f'<node id="{node_id}" lat="-6.3" lon="{106.70 + i * 0.001:.3f}">{tag_xml(tags)}</node>')
+        node_id += 1
+
+    # Squares (closed rings) and two-node lines on a row of their own
+    def ring(x, y, size=0.0003):
+        nonlocal node_id
+        ids = []
+        for dx, dy in ((0, 0), (size, 0), (size, size), (0, size)):
+            parts.append(f'<node id="{node_id}" lat="{y + dy:.5f}" lon="{x + dx:.5f}"/>')
+            ids.append(node_id)
+            node_id += 1
+        return ids + ids[:1]
+
+    def line(x, y):
+        nonlocal node_id
+        parts.append(f'<node id="{node_id}" lat="{y:.5f}" lon="{x:.5f}"/>')
+        parts.append(f'<node id="{node_id + 1}" lat="{y - 0.001:.5f}" lon="{x + 0.001:.5f}"/>')
+        node_id += 2
+        return [node_id - 2, node_id - 1]
+
+    ways = []
+    for i, (highway, extra) in enumerate(HIGHWAYS):
+        refs = ring(106.70 + i * 0.001, -6.31) if extra.get('area') == 'yes' else line(106.70 + i * 0.001, -6.31)
+        ways.append((refs, {'highway': highway, **extra}))
+    area_tags = [{'building': 'yes'}, {'building': 'house', 'name': 'Rumah', 'building:levels': '2'},
+                 {'building': 'no', 'amenity': 'parking'}, {'building': 'school', 'amenity': 'school', 'name': 'SD'},
+                 {'shop': 'mall', 'name': 'Mall'}, {'landuse': 'residential'}]
+    for i, tags in enumerate(area_tags):
+        ways.append((ring(106.70 + i * 0.001, -6.32), tags))
+    outer = ring(106.71, -6.33, 0.0006)
+    ways.append((outer, {}))
+
+    way_ids = list(range(1000, 1000 + len(ways)))
+    for way_id, (refs, tags) in zip(way_ids, ways):
+        nds = ''.join(f'<nd ref="{ref}"/>' for ref in refs)
+        parts.append(f'<way id="{way_id}">{nds}{tag_xml(tags)}</way>')
+    parts.append(f'<relation id="5000"><member type="way" ref="{way_ids[-1]}" role="outer"/>'
+                 f'{tag_xml({"type": "multipolygon", "building": "commercial", "shop": "supermarket"})}</relation>')
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">' + '\n'.join(parts) + '</osm>\n'
+
+
+def pyrosm_selection(xml):
+    """(osm_type, id) per layer as the pyrosm filters select them, from the raw XML"""
+    def tags_of(element):
+        return {tag.get('k'): tag.get('v') for tag in element.findall('tag')}
+
+    root = ET.fromstring(xml)
+    selected = {'pois': set(), 'buildings': set(), 'roads': set()}
+
+    for node in root.iter('node'):
+        if any(key in tags_of(node) for key in PYROSM_POI_KEYS):
+            selected['pois'].add(('node', int(node.get('id'))))
+    areas = [('way', way) for way in root.iter('way')
+             if way.findall('nd')[0].get('ref') == way.findall('nd')[-1].get('ref')]
+    areas += [('relation', rel) for rel in root.iter('relation') if tags_of(rel).get('type') == 'multipolygon']
+    for osm_type, element in areas:
+        tags = tags_of(element)
+        if tags.get('building', 'no') != 'no':
+            selected['buildings'].add((osm_type, int(element.get('id'))))
+        if any(key in tags for key in PYROSM_POI_KEYS):
+            selected['pois'].add((osm_type, int(element.get('id'))))
+    for way in root.iter('way'):
+        tags = tags_of(way)
+        if 'highway' in tags and not any(tags.get(k) in v for k, v in PYROSM_DRIVING_EXCLUDE.items()):
+            selected['roads'].add(('way', int(way.get('id'))))
+    return selected
+
+
+@pytest.fixture(scope='module')
+def extract(tmp_path_factory):
+    path = tmp_path_factory.mktemp('osm') / 'extract.osm'
+    path.write_text(synthetic_osm())
+    return path
+
+
+def test_layer_collector_matches_pyrosm_filters(extract):
+    expected = pyrosm_selection(extract.read_text())
+    layers = dict(zip(('pois', 'buildings', 'roads'), osm.read_osm_layers(extract)))
+    for name, frame in layers.items():
+        assert set(zip(frame['osm_type'], frame['id'])) == expected[name], name
+    # Kept: 4 POI nodes + 4 POI areas, 3 building ways + the relation, 6 of 16 highways
+    assert {name: len(ids) for name, ids in expected.items()} == {'pois': 8, 'buildings': 4, 'roads': 6}
+
+
+def test_layer_collector_geometry_and_tags(extract):
+    pois, buildings, roads = osm.read_osm_layers(extract)
+    assert (pois.crs, buildings.crs, roads.crs) == ('EPSG:4326',) * 3
+    assert set(roads.geom_type) == {'LineString'}
+    # Single-part areas as plain polygons, like the pyrosm outputs
+    assert set(buildings.geom_type) == {'Polygon'}
+    assert set(pois.geom_type) == {'Point', 'Polygon'}
+
+    house = buildings[buildings['name'] == 'Rumah'].iloc[0]
+    assert (house['building'], house['building:levels']) == ('house', '2')
+    assert shapely.area(house.geometry) == pytest.approx(0.0003 ** 2)
+    assert set(roads.loc[roads['name'] == 'Jl Mawar', 'highway']) == {'residential'}
+
+
+def test_only_restricts_to_given_objects(extract):
+    collector = osm.LayerCollector(only={'node': {1}, 'way': {1000}, 'relation': {5000}})
+    collector.apply_file(str(extract), locations=True, idx='flex_mem')
+    assert set(collector.to_frame('pois')['id']) == {1, 5000}
+    assert set(collector.to_frame('buildings')['id']) == {5000}
+    assert set(collector.to_frame('roads')['id']) == {1000}
+
+
+def test_driving_filter_matches_pyrosm():
+    for highway, extra in HIGHWAYS:
+        tags = {'highway': highway, **extra}
+        pyrosm = not any(tags.get(k) in v for k, v in PYROSM_DRIVING_EXCLUDE.items())
+        assert osm.is_driving_road(tags) == pyrosm, tags
+    assert not osm.is_driving_road({'building': 'yes'})
+
+
+@pytest.fixture(scope='module')
+def boundary():
+    return osm.load_boundaries(REGIONS['tangsel'])
+
+
+def synthetic_pois(boundary, n=4000, seed=0):
+    """Points and small squares over the boundary's extent (many straddle it)"""
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = boundary.total_bounds
+    x, y = rng.uniform(minx, maxx, n), rng.uniform(miny, maxy, n)
+    size = rng.uniform(0.0002, 0.01, n)
+    square = rng.random(n) < 0.3
+    geometry = np.where(square, shapely.box(x, y, x + size, y + size), shapely.points(x, y))
+    keys = rng.choice(['shop', 'amenity', 'office', None], (n, 3))
+    frame = pd.DataFrame({
+        'shop': np.where(keys[:, 0] == 'shop', 'bakery', None),
+        'amenity': np.where(keys[:, 1] == 'amenity', 'cafe', None),
+        'office': np.where(keys[:, 2] == 'office', 'ngo', None),
+        'name': 'x',
+    }, index=rng.permutation(n) + 100)
+    return gpd.GeoDataFrame(frame, geometry=geometry, crs='EPSG:4326')
+
+
+def test_within_boundary_matches_sjoin(boundary):
+    pois = synthetic_pois(boundary)
+    old = gpd.sjoin(pois, boundary[['geometry']], how='inner', predicate='within')
+    inside = osm.within_boundary(pois, boundary)
+    assert 0 < inside.sum() < len(pois)
+    assert set(pois.index[inside]) == set(old.index)
+
+
+def test_categories_and_centroids_match_row_wise(boundary):
+    pois = synthetic_pois(boundary)
+
+    def get_category(row):
+        if pd.notna(row.get('shop')):
+            return f"shop:{row['shop']}"
+        elif pd.notna(row.get('amenity')):
+            return f"amenity:{row['amenity']}"
+        elif pd.notna(row.get('office')):
+            return f"office:{row['office']}"
+        return 'other'
+
+    assert osm.coalesce_category(pois).tolist() == pois.apply(get_category, axis=1).tolist()
+    assert osm.coalesce_category(pois[['shop', 'name']]).tolist() == \
+        pois[['shop', 'name']].apply(get_category, axis=1).tolist()
+
+    projected = pois.to_crs('EPSG:32748')
+    lons, lats = osm.centroid_lonlat(pois)
+    assert np.allclose(lons, projected.geometry.centroid.to_crs(pois.crs).x, rtol=0, atol=1e-9)
+    assert np.allclose(lats, projected.geometry.centroid.to_crs(pois.crs).y, rtol=0, atol=1e-9)
+
+
+def test_business_data_of_empty_frame():
+    empty = gpd.GeoDataFrame({'id': [], 'osm_type': [], 'name': [], 'amenity': []},
+                             geometry=gpd.GeoSeries([], crs='EPSG:4326'))
+    biz = osm.extract_business_data(empty, 'Empty')
+    assert len(biz) == 0
+    assert {'category', 'lon', 'lat'} <= set(biz.columns)
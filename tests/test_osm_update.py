@@ -0,0 +1,208 @@
+"""
+Incremental OSM update (--update) against a full re-extraction, on a small
+synthetic extract inside Tangerang Selatan with the osmium cut stubbed
+(the merged file is copied to the regional PBF as-is)
+"""
+
+import json
+import shutil
+import subprocess
+
+import geopandas as gpd
+import numpy as np
+import osmium
+import pandas as pd
+import pytest
+
+import extract_osm_data as osm
+from common import lattice
+from common.regions import REGIONS
+
+NODES = '''
+ <node id="1" lat="-6.300" lon="106.700" version="1"><tag k="amenity" v="cafe"/><tag k="name" v="Kopi"/></node>
+ <node id="2" lat="-6.300" lon="106.710" version="1"/>
+ <node id="3" lat="-6.300" lon="106.711" version="1"/>
+ <node id="4" lat="-6.301" lon="106.711" version="1"/>
+ <node id="5" lat="-6.301" lon="106.710" version="1"/>
+ <node id="6" lat="-6.310" lon="106.720" version="1"/>
+ <node id="7" lat="-6.320" lon="106.730" version="1"/>
+ <node id="8" lat="-6.302" lon="106.712" version="1"/>
+ <node id="9" lat="-6.302" lon="106.713" version="1"/>
+ <node id="10" lat="-6.303" lon="106.713" version="1"/>
+ <node id="11" lat="-6.303" lon="106.712" version="1"/>
+ <node id="16" lat="-6.290" lon="106.705" version="1"/>
+ <node id="17" lat="-6.290" lon="106.706" version="1"/>
+ <node id="18" lat="-6.291" lon="106.706" version="1"/>
+ <node id="19" lat="-6.310" lon="106.690" version="1"/>
+ <node id="20" lat="-6.315" lon="106.695" version="1"/>
+'''
+
+BUILDINGS = '''
+ <way id="100" version="1"><nd ref="2"/><nd ref="3"/><nd ref="4"/><nd ref="5"/><nd ref="2"/>
+  <tag k="building" v="yes"/><tag k="amenity" v="school"/><tag k="name" v="SD 1"/></way>
+ <way id="103" version="1"><nd ref="8"/><nd ref="9"/><nd ref="10"/><nd ref="11"/><nd ref="8"/></way>
+ <way id="106" version="1"><nd ref="16"/><nd ref="17"/><nd ref="18"/><nd ref="16"/><tag k="building" v="house"/></way>
+ <relation id="200" version="1"><member type="way" ref="103" role="outer"/>
+  <tag k="type" v="multipolygon"/><tag k="building" v="house"/></relation>
+'''
+
+MAIN_ROADS = '''
+ <way id="111" version="1"><nd ref="6"/><nd ref="7"/><tag k="highway" v="residential"/><tag k="name" v="Jl A"/></way>
+ <way id="112" version="1"><nd ref="6"/><nd ref="7"/><tag k="highway" v="footway"/></way>
+ <way id="114" version="1"><nd ref="6"/><nd ref="7"/><tag k="highway" v="service"/><tag k="service" v="parking_aisle"/></way>
+'''
+
+SIDE_ROAD = '''
+ <way id="117" version="1"><nd ref="19"/><nd ref="20"/><tag k="highway" v="tertiary"/></way>
+'''
+
+# Moved road node, deleted and new building, new shop, moved relation member
+CHANGES = '''
+<modify><node id="6" lat="-6.311" lon="106.720" version="2"/></modify>
+<delete><way id="100" version="2"/></delete>
+<create>
+ <node id="12" lat="-6.305" lon="106.700" version="1"><tag k="shop" v="bakery"/><tag k="name" v="Roti"/></node>
+ <node id="13" lat="-6.300" lon="106.716" version="1"/>
+ <node id="14" lat="-6.300" lon="106.717" version="1"/>
+ <node id="15" lat="-6.301" lon="106.717" version="1"/>
+ <way id="105" version="1"><nd ref="13"/><nd ref="14"/><nd ref="15"/><nd ref="13"/><tag k="building" v="yes"/></way>
+</create>
+<modify><node id="9" lat="-6.302" lon="106.7135" version="2"/></modify>
+'''
+
+FIRST_ROAD = '''
+<create><way id="118" version="1"><nd ref="19"/><nd ref="20"/><tag k="highway" v="primary"/></way></create>
+'''
+
+LAST_ROAD_DELETED = '''
+<delete><way id="117" version="2"/></delete>
+'''
+
+# (extract, changes); the extract lists objects in ID order, as a PBF must
+CASES = {
+    'mixed': (NODES + BUILDINGS.replace(' <relation', MAIN_ROADS + SIDE_ROAD + ' <relation'), CHANGES),
+    'no_previous_roads': (NODES + BUILDINGS, FIRST_ROAD),
+    'last_road_deleted': (NODES + BUILDINGS.replace(' <relation', SIDE_ROAD + ' <relation'), LAST_ROAD_DELETED),
+}
+
+REGION = REGIONS['tangsel']
+
+
+def copy_extract(config_path, input_pbf):
+    """Stand-in for `osmium extract -c`: every extract is the whole input"""
+    config = json.loads(config_path.read_text())
+    for extract in config['extracts']:
+        shutil.copy(input_pbf, osm.OUTPUT_DIR / extract['output'])
+    return subprocess.CompletedProcess([], 0, '', '')
+
+
+def write_pbf(xml, tmp_path):
+    source = tmp_path / 'source.osm'
+    source.write_text(f'<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">{xml}</osm>\n')
+    writer = osmium.SimpleWriter(str(osm.OUTPUT_DIR / f'{REGION.key}.osm.pbf'))
+
+    class Copy(osmium.SimpleHandler):
+        def node(self, n):
+            writer.add_node(n)
+
+        def way(self, w):
+            writer.add_way(w)
+
+        def relation(self, r):
+            writer.add_relation(r)
+
+    Copy().apply_file(str(source))
+    writer.close()
+
+
+def read_outputs():
+    """Stored layers sorted by object; roads None when there is no file"""
+    key = REGION.key
+    layers = {
+        'business': gpd.read_file(osm.OUTPUT_DIR / f'osm_business_{key}.geojson'),
+        'buildings': gpd.read_file(osm.OUTPUT_DIR / f'osm_buildings_{key}.geojson'),
+        'store': osm.read_building_store(osm.OUTPUT_DIR / f'osm_buildings_{key}.parquet'),
+    }
+    roads_path = osm.OUTPUT_DIR / f'osm_roads_{key}.geojson'
+    layers['roads'] = gpd.read_file(roads_path) if roads_path.exists() else None
+    for name, frame in layers.items():
+        if frame is not None:
+            layers[name] = frame.sort_values(['osm_type', 'id']).reset_index(drop=True)
+    return layers
+
+
+def assert_same_layer(left, right, check_dtype=True):
+    assert (left is None) == (right is None)
+    if left is None:
+        return
+    assert list(left.columns) == list(right.columns)
+    for column in left.columns:
+        if column == 'geometry':
+            assert left.geometry.geom_equals_exact(right.geometry, 1e-9).all()
+        elif left[column].dtype == object and len(left) and isinstance(left[column].iloc[0], np.ndarray):
+            assert all(np.array_equal(a, b) for a, b in zip(left[column], right[column]))
+        elif check_dtype:
+            pd.testing.assert_series_equal(left[column], right[column])
+        else:
+            assert left[column].astype(object).where(left[column].notna(), None).tolist() == \
+                right[column].astype(object).where(right[column].notna(), None).tolist()
+
+
+def rows(frame, osm_type, osm_id):
+    return frame[(frame['osm_type'] == osm_type) & (frame['id'] == osm_id)].reset_index(drop=True)
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    out = tmp_path / 'osm'
+    out.mkdir()
+    monkeypatch.setattr(osm, 'OUTPUT_DIR', out)
+    monkeypatch.setattr(osm, 'run_osmium_extract', copy_extract)
+    return out
+
+
+def run_update(case, tmp_path):
+    """Full extraction, --update with the case's changes, then a full re-extraction"""
+    base, changes = CASES[case]
+    write_pbf(base, tmp_path)
+    osm.process_region(REGION, tmp_path / 'indonesia.osm.pbf')
+    before = read_outputs()
+
+    osc_path = tmp_path / 'changes.osc'
+    osc_path.write_text(f'<?xml version="1.0"?>\n<osmChange version="0.6">{changes}</osmChange>\n')
+    region_pbf = osm.OUTPUT_DIR / f'{REGION.key}.osm.pbf'
+    osm.write_replication_state(region_pbf, 100, None)
+    osm.update_region(REGION, osc_path, 101, None)
+    updated = read_outputs()
+    cells = set(pd.read_csv(osm.OUTPUT_DIR / f'osm_changed_cells_{REGION.key}.csv')['grid_id'])
+
+    osm.process_region(REGION, tmp_path / 'indonesia.osm.pbf')
+    return before, updated, read_outputs(), cells
+
+
+@pytest.mark.parametrize('case', list(CASES))
+def test_update_matches_full_extraction(case, output_dir, tmp_path):
+    _, updated, full, _ = run_update(case, tmp_path)
+    assert osm.read_replication_state(output_dir / f'{REGION.key}.osm.pbf')[0] == 101
+    for name in full:
+        assert_same_layer(updated[name], full[name])
+
+
+def test_update_touches_changed_cells_only(output_dir, tmp_path):
+    before, updated, _, cells = run_update('mixed', tmp_path)
+
+    # Cells of removed and added buildings are reported
+    for store, osm_type, osm_id in ((before['store'], 'way', 100), (updated['store'], 'way', 105),
+                                    (updated['store'], 'relation', 200)):
+        assert set(rows(store, osm_type, osm_id)['cell_ids'].iloc[0]) <= cells
+
+    # Untouched building, POI and road: outside the reported cells, records unchanged
+    # (a column left all-null, like the store's `name`, may read back with another dtype)
+    untouched_cells = set(rows(before['store'], 'way', 106)['cell_ids'].iloc[0])
+    cafe = rows(before['business'], 'node', 1)
+    untouched_cells.add(str(lattice.lonlat_to_gid(cafe['lon'].to_numpy(), cafe['lat'].to_numpy())[0]))
+    assert not untouched_cells & cells
+    for name, osm_type, osm_id in (('store', 'way', 106), ('buildings', 'way', 106),
+                                   ('business', 'node', 1), ('roads', 'way', 117)):
+        assert_same_layer(rows(updated[name], osm_type, osm_id), rows(before[name], osm_type, osm_id),
+                          check_dtype=False)
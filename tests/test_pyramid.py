@@ -0,0 +1,57 @@
+"""phase4 grid_integration/pyramid.py: aggregation rules and row-group rollup"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common import lattice
+from grid_integration.pyramid import build_pyramid, build_pyramid_parquet
+
+
+def block_grid(n=30):
+    """n x n level-12 cells at the OKU corner"""
+    ix0, iy0 = lattice.lonlat_to_index(103.6, -3.9)
+    gx, gy = np.meshgrid(np.arange(ix0, ix0 + n), np.arange(iy0 - n, iy0))
+    gx, gy = gx.ravel(), gy.ravel()
+    lon, lat = lattice.index_to_center(gx, gy)
+    return pd.DataFrame({
+        'grid_id': lattice.index_to_gid(gx, gy),
+        'lon': lon,
+        'lat': lat,
+        'estimated_pop': 1.0,
+        'road_length_m': 10.0,
+        'road_length_primary_m': 4.0,
+        'poi_count': np.ones(len(gx), dtype='int64'),
+        'hazard_floods': 0.5,
+        'rtrw_zone': np.where(gx % 3 == 0, 'A', 'B'),
+    })
+
+
+def test_totals_are_summed_at_every_level():
+    grid = block_grid()
+    for level, frame in build_pyramid(grid, [11, 10, 9]).items():
+        assert frame['n_cells'].sum() == len(grid)
+        assert frame['road_length_m'].sum() == pytest.approx(10.0 * len(grid))
+        assert frame['road_length_primary_m'].sum() == pytest.approx(4.0 * len(grid))
+        assert frame['poi_count'].sum() == len(grid)
+        assert np.allclose(frame['hazard_floods'], 0.5)
+
+
+def test_numeric_column_without_rule_raises():
+    with pytest.raises(ValueError, match='total_area'):
+        build_pyramid(block_grid().assign(total_area=1.0), [10])
+
+
+def test_parquet_rollup_matches_in_memory(tmp_path):
+    grid = block_grid(40)
+    path = tmp_path / 'grid.parquet'
+    # Several row groups, each a strip of the grid (like tiles)
+    grid.to_parquet(path, index=False, row_group_size=170)
+
+    expected = build_pyramid(grid, [11, 9])
+    result = build_pyramid_parquet(path, [11, 9])
+    for level in expected:
+        pd.testing.assert_frame_equal(
+            result[level].sort_values('grid_id').reset_index(drop=True),
+            expected[level].sort_values('grid_id').reset_index(drop=True),
+        )
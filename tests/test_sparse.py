@@ -0,0 +1,72 @@
+"""common/sparse.py: round trip and admin columns of densified cells"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from common import lattice
+from common.admin import build_admin_index
+from common.sparse import read_sparse, write_sparse
+
+
+def admin_grid(n=40):
+    """n x n level-12 cells split into a west and an east kelurahan"""
+    ix0, iy0 = lattice.lonlat_to_index(106.7, -6.3)
+    gx, gy = np.meshgrid(np.arange(ix0, ix0 + n), np.arange(iy0, iy0 + n))
+    gx, gy = gx.ravel(), gy.ravel()
+    minx, miny, maxx, maxy = lattice.index_to_bounds(gx, gy)
+    mid = minx[gx == ix0 + n // 2][0]
+    admin = gpd.GeoDataFrame({
+        'kelurahan': ['BARAT', 'TIMUR'],
+        'geometry': [shapely.box(minx.min(), miny.min(), mid, maxy.max()),
+                     shapely.box(mid, miny.min(), maxx.max(), maxy.max())],
+    }, crs='EPSG:4326')
+
+    index = build_admin_index(admin, 'kelurahan')
+    codes, _ = index.assign(lattice.index_to_gid(gx, gy))
+    grid = pd.DataFrame({
+        'grid_id': lattice.index_to_gid(gx, gy),
+        'kelurahan': index.name_of(codes),
+        'admin_code': codes.astype('int64'),
+        'estimated_pop': np.where((gx + gy) % 7 == 0, 3.0, 0.0),
+        'lon': minx,
+        'lat': miny,
+    })
+    return grid, index
+
+
+def test_dense_round_trip_restores_admin_columns(tmp_path):
+    grid, index = admin_grid()
+    path = tmp_path / 'pop_grid.sparse.parquet'
+    n_rows = write_sparse(grid, path, ['estimated_pop'])
+    assert n_rows < len(grid)
+
+    dense = read_sparse(path, dense=True, derive=index.derived_columns())
+    dense = dense.set_index('grid_id').loc[grid['grid_id']].reset_index()
+    assert dense['kelurahan'].tolist() == grid['kelurahan'].tolist()
+    assert (dense['admin_code'].to_numpy() == grid['admin_code'].to_numpy()).all()
+    assert np.allclose(dense['estimated_pop'], grid['estimated_pop'])
+    assert np.allclose(dense['lon'], grid['lon'])
+
+
+def test_dense_without_derive_leaves_labels_missing(tmp_path):
+    grid, _ = admin_grid()
+    path = tmp_path / 'pop_grid.sparse.parquet'
+    write_sparse(grid, path, ['estimated_pop'])
+
+    dense = read_sparse(path, dense=True)
+    empty = dense['estimated_pop'] == 0
+    assert dense.loc[empty, 'kelurahan'].isna().all()
+    assert dense.loc[~empty, 'kelurahan'].notna().all()
+
+
+def test_dense_read_matches_dense_frame(tmp_path):
+    grid, index = admin_grid()
+    grid['pop_density_km2'] = grid['estimated_pop'] / 0.0025
+    path = tmp_path / 'pop_grid.sparse.parquet'
+    write_sparse(grid, path, ['estimated_pop', 'pop_density_km2'])
+
+    dense = read_sparse(path, dense=True, derive=index.derived_columns())
+    dense = dense.set_index('grid_id').loc[grid['grid_id']].reset_index()
+    pd.testing.assert_frame_equal(dense, grid)